@@ -0,0 +1,97 @@
+"""
+Benchmarks of the recommender on generated networks of increasing size.
+
+Classes follow asv conventions: `params` are network sizes, `setup` builds
+the data and `time_*` methods are timed (see `run.py`).
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from orangecontrib.example.generate import generate_network
+from orangecontrib.example.readwrite import \
+    read_feature_pajek, write_feature_pajek
+from orangecontrib.example.recommend import Recommender, TWO_HOP
+from orangecontrib.example.snapshot import save_snapshot, load_snapshot
+
+SIZES = [1000, 10000, 100000]
+
+_networks = {}
+
+
+def network(n_nodes):
+    # Generated networks are shared between benchmarks
+    if n_nodes not in _networks:
+        _networks[n_nodes] = generate_network(n_nodes, seed=42)
+    return _networks[n_nodes]
+
+
+class Loading:
+    params = SIZES
+    param_names = ["n_nodes"]
+
+    def setup(self, n_nodes):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "network.net")
+        write_feature_pajek(self.filename, network(n_nodes))
+        save_snapshot(os.path.join(self.directory, "snapshot"),
+                      network(n_nodes))
+
+    def teardown(self, n_nodes):
+        shutil.rmtree(self.directory)
+
+    def time_read_pajek(self, n_nodes):
+        read_feature_pajek(self.filename, packed=True)
+
+    def time_load_snapshot(self, n_nodes):
+        Recommender.from_feature_network(
+            load_snapshot(os.path.join(self.directory, "snapshot")))
+
+
+class Lookup:
+    params = SIZES
+    param_names = ["n_nodes"]
+
+    def setup(self, n_nodes):
+        self.recommender = Recommender.from_feature_network(network(n_nodes))
+        self.nodes = np.random.default_rng(0).integers(n_nodes, size=100)
+
+    def time_friends(self, n_nodes):
+        for node in self.nodes:
+            self.recommender.friends(node)
+
+
+class SingleNode:
+    params = SIZES
+    param_names = ["n_nodes"]
+
+    def setup(self, n_nodes):
+        # No caching, so that each call computes the recommendations
+        self.recommender = Recommender.from_feature_network(
+            network(n_nodes), cache_size=0)
+        self.recommender.scoring_matrix(TWO_HOP)
+        self.nodes = np.random.default_rng(0).integers(n_nodes, size=100)
+
+    def time_recommend(self, n_nodes):
+        for node in self.nodes:
+            self.recommender.recommend_with_recommenders(node)
+
+    def time_recommend_two_hop(self, n_nodes):
+        for node in self.nodes:
+            self.recommender.recommend_with_recommenders(node, mode=TWO_HOP)
+
+
+class Batch:
+    params = SIZES
+    param_names = ["n_nodes"]
+
+    def setup(self, n_nodes):
+        self.recommender = Recommender.from_feature_network(network(n_nodes))
+
+    def time_recommend_all(self, n_nodes):
+        self.recommender.recommend_all()
+
+    def time_recommend_all_two_hop(self, n_nodes):
+        self.recommender.recommend_all(mode=TWO_HOP)
@@ -0,0 +1,36 @@
+"""Latency of the Recommendation widget's update after changing the node."""
+import numpy as np
+
+from bench_recommend import SIZES, network
+
+from orangecontrib.example.readwrite import to_network
+
+
+class WidgetUpdate:
+    params = SIZES
+    param_names = ["n_nodes"]
+
+    def setup(self, n_nodes):
+        from AnyQt.QtWidgets import QApplication
+        from orangecontrib.example.widgets.owRecommendNew import \
+            Recommendation
+
+        self.app = QApplication.instance() or QApplication([])
+        self.widget = Recommendation()
+        self.widget.set_network(to_network(network(n_nodes)))
+        self.wait()
+        self.nodes = np.random.default_rng(0).integers(n_nodes, size=10)
+
+    def teardown(self, n_nodes):
+        self.widget.onDeleteWidget()
+
+    def wait(self):
+        while self.widget.task is not None:
+            self.app.processEvents()
+
+    def time_update(self, n_nodes):
+        widget = self.widget
+        for node in self.nodes:
+            widget.selected_node = widget.nodes_model[node]
+            widget.on_node_changed()
+            self.wait()
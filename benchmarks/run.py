@@ -0,0 +1,149 @@
+"""
+Run benchmarks and compare them with a stored baseline.
+
+Benchmarks are classes in `bench_*.py` modules in this directory, written
+in the style of asv: an optional list of `params` (network sizes), optional
+`setup` and `teardown` methods, and methods whose names start with `time_`.
+Each benchmark is timed `--repeat` times; the median time is reported.
+
+Usage:
+
+    python benchmarks/run.py                     # run and compare
+    python benchmarks/run.py --quick             # only the smallest sizes
+    python benchmarks/run.py -k Batch            # benchmarks matching regex
+    python benchmarks/run.py --update-baseline   # store results as baseline
+
+The exit code is 1 if any benchmark is slower than the baseline by more than
+`--threshold` (a factor, 1.5 by default).
+"""
+import argparse
+import importlib
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(DIRECTORY, "baseline.json")
+
+
+def discover(pattern=None, quick=False):
+    """Yield names and callables (setup, benchmark, teardown)."""
+    sys.path.insert(0, DIRECTORY)
+    for filename in sorted(os.listdir(DIRECTORY)):
+        if not (filename.startswith("bench_") and filename.endswith(".py")):
+            continue
+        module = importlib.import_module(filename[:-3])
+        for cls_name, cls in sorted(vars(module).items()):
+            if not isinstance(cls, type) or cls.__module__ != module.__name__:
+                continue
+            params = getattr(cls, "params", [None])
+            if quick:
+                params = params[:1]
+            for method in sorted(name for name in vars(cls)
+                                 if name.startswith("time_")):
+                for param in params:
+                    name = f"{module.__name__}.{cls_name}.{method}"
+                    if param is not None:
+                        name += f"({param})"
+                    if pattern and not re.search(pattern, name):
+                        continue
+                    yield name, cls, method, param
+
+
+def measure(cls, method, param, repeat):
+    args = () if param is None else (param, )
+    bench = cls()
+    if hasattr(bench, "setup"):
+        bench.setup(*args)
+    try:
+        func = getattr(bench, method)
+        func(*args)  # warm-up
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(*args)
+            times.append(time.perf_counter() - start)
+    finally:
+        if hasattr(bench, "teardown"):
+            bench.teardown(*args)
+    return statistics.median(times)
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=DIRECTORY,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Return names of benchmarks slower than baseline by `threshold`."""
+    regressions = []
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = seconds / base
+        mark = ""
+        if ratio > threshold:
+            mark = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / threshold:
+            mark = "  improved"
+        print(f"{name:70} {base * 1000:10.2f} -> {seconds * 1000:10.2f} ms"
+              f"  x{ratio:.2f}{mark}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run benchmarks.")
+    parser.add_argument("-k", "--filter", help="regular expression for names")
+    parser.add_argument("--quick", action="store_true",
+                        help="run only with the first parameter")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=1.5)
+    parser.add_argument("--save", help="file for results")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store the results into the baseline")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    results = {}
+    for name, cls, method, param in discover(args.filter, args.quick):
+        results[name] = measure(cls, method, param, args.repeat)
+        print(f"{name:70} {results[name] * 1000:10.2f} ms", flush=True)
+
+    output = {"commit": commit(), "results": results}
+    if args.save:
+        with open(args.save, "wt") as f:
+            json.dump(output, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "wt") as f:
+            json.dump({"commit": output["commit"], "results": baseline}, f,
+                      indent=2, sort_keys=True)
+        return 0
+
+    print("\nComparison with baseline:")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than baseline by more "
+              f"than x{args.threshold}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import numpy as np
+import scipy.sparse as sp
+
+__all__ = ("BitMatrix", "popcount")
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)],
+                           dtype=np.uint8)
+
+
+def popcount(a):
+    """Return the number of set bits in each element of an unsigned array."""
+    a = np.asarray(a)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(a)
+    counts = _POPCOUNT_TABLE[a.view(np.uint8)]
+    return counts.reshape(a.shape + (a.itemsize, )).sum(axis=-1, dtype=np.uint8)
+
+
+class BitMatrix:
+    """
+    A binary matrix with one bit per cell.
+
+    Each row is packed into bytes with `np.packbits` (the first column is the
+    most significant bit of the first byte) and padded to a multiple of
+    8 bytes, so rows can also be viewed as `uint64` words (`words`).
+    Nonzero values are stored as 1.
+
+    Indexing with rows (`m[rows]`) unpacks the selected rows into a dense
+    uint8 array; `m[rows, col]` returns a single column for those rows.
+
+    Args:
+        bits: array of packed rows (n_rows x n_bytes, uint8)
+        n_cols: the number of columns
+    """
+    def __init__(self, bits, n_cols):
+        if bits.shape[1] % 8 or bits.shape[1] * 8 < n_cols:
+            raise ValueError("invalid size of packed rows")
+        self.bits = bits
+        self.n_cols = n_cols
+
+    @classmethod
+    def zeros(cls, n_rows, n_cols):
+        return cls(np.zeros((n_rows, cls._n_bytes(n_cols)), dtype=np.uint8),
+                   n_cols)
+
+    @classmethod
+    def from_dense(cls, matrix):
+        if sp.issparse(matrix):
+            matrix = matrix.toarray()
+        matrix = np.asarray(matrix) != 0
+        n_rows, n_cols = matrix.shape
+        bits = cls.zeros(n_rows, n_cols).bits
+        packed = np.packbits(matrix, axis=1)
+        bits[:, :packed.shape[1]] = packed
+        return cls(bits, n_cols)
+
+    @staticmethod
+    def _n_bytes(n_cols):
+        return (n_cols + 63) // 64 * 8
+
+    @property
+    def shape(self):
+        return self.bits.shape[0], self.n_cols
+
+    def __len__(self):
+        return self.bits.shape[0]
+
+    @property
+    def words(self):
+        return self.bits.view(np.uint64)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            rows, col = index
+            return self.column(col, rows)
+        return np.unpackbits(self.bits[index], axis=-1, count=self.n_cols)
+
+    def toarray(self):
+        return self[:]
+
+    def column(self, col, rows=slice(None)):
+        """Return the given column (for the given rows) as uint8."""
+        return (self.bits[rows, col >> 3] >> (7 - (col & 7))) & 1
+
+    def set(self, row, col, value):
+        mask = np.uint8(1 << (7 - (col & 7)))
+        if value:
+            self.bits[row, col >> 3] |= mask
+        else:
+            self.bits[row, col >> 3] &= ~mask
+
+    def nonzero_columns(self, row):
+        """Return indices of set columns in the row."""
+        return np.flatnonzero(self[row])
+
+    def row_counts(self, rows=slice(None)):
+        """Return the number of set bits in each row."""
+        return popcount(self.words[rows]).sum(axis=-1, dtype=np.int64)
+
+    def intersection_counts(self, row, rows=slice(None)):
+        """
+        Return the number of columns set in the `row` and in each of `rows`.
+        """
+        return popcount(self.words[rows] & self.words[row]) \
+            .sum(axis=-1, dtype=np.int64)
+
+    def column_counts(self, rows=slice(None), weights=None):
+        """
+        Return the number of set bits in each column over the given rows, or,
+        if `weights` are given, the weighted sum of the rows.
+
+        Counting works on packed bytes: each of 8 passes extracts one bit
+        position from all bytes of the selected rows.
+        """
+        packed = self.bits[rows]
+        if packed.ndim == 1:
+            packed = packed[None, :]
+        counts = np.empty(packed.shape[1] * 8)
+        for bit in range(8):
+            column_bits = (packed >> (7 - bit)) & 1
+            if weights is None:
+                counts[bit::8] = column_bits.sum(axis=0)
+            else:
+                counts[bit::8] = weights @ column_bits
+        return counts[:self.n_cols]
+
+    def rmatmul(self, matrix, block_size=4096):
+        """
+        Return `matrix @ self` as a dense array, for a dense or sparse
+        `matrix`. Only rows (of this matrix) that are used by `matrix` are
+        unpacked, in blocks of `block_size` rows.
+        """
+        result = np.zeros((matrix.shape[0], self.n_cols))
+        if sp.issparse(matrix):
+            matrix = sp.csc_matrix(matrix)
+            used = np.flatnonzero(np.diff(matrix.indptr))
+        else:
+            used = np.flatnonzero(np.any(matrix != 0, axis=0))
+        for start in range(0, len(used), block_size):
+            block = used[start:start + block_size]
+            result += matrix[:, block] @ self[block]
+        return result
@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    """
+    A dictionary-like cache that keeps at most `maxsize` most recently used
+    items, and counts hits and misses. The cache can be shared between
+    threads; values are computed outside the lock.
+
+    Args:
+        maxsize: maximal number of items; 0 disables caching
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, compute):
+        """
+        Return the item for the `key`; if it is not cached, compute it by
+        calling `compute()` and store it.
+        """
+        with self._lock:
+            if key in self._items:
+                self.hits += 1
+                self._items.move_to_end(key)
+                return self._items[key]
+            self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        """Store the value (if the key is cached, replace it)."""
+        if self.maxsize > 0:
+            with self._lock:
+                self._items[key] = value
+                self._items.move_to_end(key)
+                if len(self._items) > self.maxsize:
+                    self._items.popitem(last=False)
+
+    def items(self):
+        """Return a list of cached (key, value) pairs."""
+        with self._lock:
+            return list(self._items.items())
+
+    def discard(self, predicate):
+        """Remove items whose keys satisfy the `predicate`."""
+        with self._lock:
+            for key in [key for key in self._items if predicate(key)]:
+                del self._items[key]
+
+    def clear(self):
+        """Remove all items; counters are kept."""
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        return {"size": len(self._items), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,243 @@
+"""
+Compute recommendations for all nodes of a network without the GUI.
+
+The network is saved as a memory-mapped snapshot (see `save_snapshot`),
+which is shared by worker processes; each worker computes recommendations
+for a range of nodes, and chunks are written to the output in order of
+nodes as they are finished.
+
+Example:
+
+    orange-recommend network.net --table nodes.xlsx -k 5 -o recommended.csv
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from orangecontrib.example.index import RecommendationIndex
+from orangecontrib.example.readwrite import FeatureNetwork, read_feature_pajek
+from orangecontrib.example.recommend import \
+    Recommender, MODES, COUNT, SIMILAR
+from orangecontrib.example.snapshot import \
+    save_snapshot, load_snapshot, save_matrix, load_matrix
+
+__all__ = ("main", "load_network", "recommend_chunks")
+
+COLUMNS = ("node", "rank", "feature", "score")
+
+# Recommender of a worker process; set by `_init_worker`
+_recommender = None
+
+
+def load_network(filename, table=None, name_column=None) -> FeatureNetwork:
+    """
+    Load the network from a snapshot directory, a Pajek file with features
+    in vertex labels or, if `table` is given, a Pajek file and a table with
+    node features (as `main` in `owRecommendNew`). Node names are taken
+    from `name_column` or from the first string meta attribute of the table.
+    """
+    if os.path.isdir(filename):
+        return load_snapshot(filename)
+    if table is None:
+        return read_feature_pajek(filename, packed=True)
+
+    from Orange.data import Table, StringVariable
+    from orangecontrib.network.network.readwrite import read_pajek
+
+    network = read_pajek(filename)
+    network.nodes = Table(table)
+    domain = network.nodes.domain
+    if name_column is None:
+        name_column = next((var for var in domain.metas
+                            if isinstance(var, StringVariable)), None)
+    node_names = None if name_column is None \
+        else network.nodes.get_column(name_column)
+    rec = Recommender.from_network(network)
+    return FeatureNetwork(rec.adjacency, rec.features, node_names,
+                          [var.name for var in domain.attributes],
+                          rec.directed)
+
+
+def _init_worker(directory, decay, alpha, similarities=None):
+    # Workers compute only rows of scoring matrices for their nodes (see
+    # `Recommender.recommend_nodes`); similarities are shared by the parent
+    global _recommender
+    _recommender = Recommender.from_feature_network(
+        load_snapshot(directory), decay=decay, alpha=alpha)
+    if similarities is not None:
+        _recommender.set_similarities(load_matrix(similarities, "similar"))
+
+
+def _recommend_range(task):
+    start, end, k, mode, with_recommenders = task
+    nodes = np.arange(start, end)
+    features, scores = _recommender.recommend_nodes(nodes, k, mode)
+    if not with_recommenders:
+        return start, features, scores
+    offsets, recommenders = \
+        _recommender.batch_recommenders(nodes, features, mode)
+    return start, features, scores, offsets, recommenders.astype(np.int32)
+
+
+def recommend_chunks(directory, k=5, mode=COUNT, decay=0.5, alpha=0.85,
+                     workers=None, chunk_size=1024, recommenders=False):
+    """
+    Compute recommendations for all nodes of the snapshot in `directory`.
+
+    Ranges of `chunk_size` nodes are distributed among `workers` processes
+    (if `workers` is 1, recommendations are computed in this process).
+
+    Yields tuples `(start, features, scores)` in order of nodes, as
+    `Recommender.iter_recommend_all`; if `recommenders` is set, tuples also
+    contain offsets and recommenders, as `Recommender.batch_recommenders`,
+    and can be assembled by `RecommendationIndex.from_chunks`.
+    """
+    n_nodes = load_snapshot(directory).adjacency.shape[0]
+    tasks = [(start, min(start + chunk_size, n_nodes), k, mode, recommenders)
+             for start in range(0, n_nodes, chunk_size)]
+    if workers == 1:
+        _init_worker(directory, decay, alpha)
+        yield from map(_recommend_range, tasks)
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        similarities = None
+        if mode == SIMILAR:
+            # Similar nodes are found once and memory mapped by workers
+            save_matrix(tmp_dir, "similar",
+                        Recommender.from_feature_network(
+                            load_snapshot(directory)).scoring_matrix(SIMILAR))
+            similarities = tmp_dir
+        with ProcessPoolExecutor(
+                workers, initializer=_init_worker,
+                initargs=(directory, decay, alpha, similarities)) \
+                as executor:
+            yield from executor.map(_recommend_range, tasks)
+
+
+class CSVWriter:
+    def __init__(self, f):
+        self.writer = csv.writer(f)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, columns):
+        self.writer.writerows(zip(*columns))
+
+    def close(self):
+        pass
+
+
+class ParquetWriter:
+    def __init__(self, filename):
+        import pyarrow.parquet
+
+        self.pyarrow = pyarrow
+        self.filename = filename
+        self.writer = None
+
+    def write(self, columns):
+        # Each chunk is written as a row group
+        table = self.pyarrow.table(dict(zip(COLUMNS, columns)))
+        if self.writer is None:
+            self.writer = self.pyarrow.parquet.ParquetWriter(
+                self.filename, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _chunk_columns(data, start, features, scores):
+    # Returns columns of output rows for a chunk; padding is skipped
+    rows, ranks = np.nonzero(features != -1)
+    nodes, features = start + rows, features[rows, ranks]
+    if data.node_names is not None:
+        nodes = np.asarray(data.node_names[nodes], dtype=object)
+    if data.feature_names is not None:
+        features = np.asarray(data.feature_names, dtype=object)[features]
+    return nodes.tolist(), (ranks + 1).tolist(), features.tolist(), \
+        scores[rows, ranks].tolist()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compute recommendations for all nodes of a network.")
+    parser.add_argument(
+        "network",
+        help="Pajek file or a directory with a snapshot of the network")
+    parser.add_argument("--table", help="file with node features")
+    parser.add_argument("--name-column", help="attribute with node names")
+    parser.add_argument("-k", type=int, default=5,
+                        help="number of recommendations per node")
+    parser.add_argument("--mode", choices=MODES, default=COUNT)
+    parser.add_argument("--decay", type=float, default=0.5)
+    parser.add_argument("--alpha", type=float, default=0.85)
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument(
+        "--snapshot",
+        help="directory in which to save the snapshot for workers "
+             "(default: a temporary directory)")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--format", choices=("csv", "parquet"), default=None,
+                        help="output format (default: from file extension)")
+    parser.add_argument(
+        "--index",
+        help="directory in which to save the index of recommendations, "
+             "which can be loaded by the service")
+    args = parser.parse_args(argv)
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "parquet" if args.output and args.output.endswith(".parquet") \
+            else "csv"
+    if fmt == "parquet" and not args.output:
+        parser.error("parquet output requires --output")
+
+    data = load_network(args.network, args.table, args.name_column)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directory = args.network if os.path.isdir(args.network) \
+            else args.snapshot or tmp_dir
+        if directory != args.network:
+            save_snapshot(directory, data)
+            data = load_snapshot(directory)
+
+        if fmt == "parquet":
+            try:
+                writer = ParquetWriter(args.output)
+            except ImportError:
+                parser.error("parquet output requires pyarrow")
+            f = None
+        else:
+            f = open(args.output, "wt", newline="", encoding="utf-8") \
+                if args.output else sys.stdout
+            writer = CSVWriter(f)
+        index_chunks = []
+        try:
+            for chunk in recommend_chunks(
+                    directory, args.k, args.mode, args.decay, args.alpha,
+                    args.workers, args.chunk_size, args.index is not None):
+                writer.write(_chunk_columns(data, *chunk[:3]))
+                if args.index is not None:
+                    index_chunks.append(chunk)
+        finally:
+            writer.close()
+            if f is not None and f is not sys.stdout:
+                f.close()
+
+        if args.index is not None:
+            recommender = Recommender.from_feature_network(
+                data, decay=args.decay, alpha=args.alpha)
+            RecommendationIndex.from_chunks(
+                index_chunks, recommender.n_nodes, args.k, args.mode,
+                recommender.mode_params(args.mode)).save(args.index)
+
+
+if __name__ == "__main__":
+    main()
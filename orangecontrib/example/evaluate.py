@@ -0,0 +1,229 @@
+"""
+Evaluate quality and cost of recommendations by hiding features.
+
+In each fold, a fraction of features of each node is hidden, recommendations
+for all nodes are computed from the remaining features, and hidden features
+are treated as relevant recommendations, from which precision@k, recall@k
+and NDCG@k are computed. Folds of all scoring modes are distributed among
+worker processes, which share the network through a memory-mapped snapshot,
+as in `cli`. For each mode, the result also includes wall and CPU time and
+peak memory allocated while recommending, averaged over folds; memory is
+measured in a separate pass, since tracing allocations distorts timings.
+
+Example:
+
+    orange-recommend-evaluate real_names_real_cartoons.net \\
+        --table kids_cartoons_new_real_names_real_cartoons.xlsx -k 3
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.example.cli import load_network
+from orangecontrib.example.readwrite import FeatureNetwork
+from orangecontrib.example.recommend import Recommender, MODES
+from orangecontrib.example.similarity import _feature_csr
+from orangecontrib.example.snapshot import save_snapshot, load_snapshot
+
+__all__ = ("split_features", "ranking_metrics", "evaluate_fold", "evaluate",
+           "main")
+
+METRICS = ("precision", "recall", "ndcg")
+COSTS = ("wall_time", "cpu_time", "memory")
+
+# Network of a worker process; set by `_init_worker`
+_data = None
+
+
+def split_features(features, fraction=0.2, seed=None):
+    """
+    Hide a random `fraction` of features of each node that has at least
+    two features; at least one feature is hidden and at least one is kept.
+
+    Returns:
+        (tuple of sp.csr_matrix, np.ndarray): remaining features and sorted
+            keys `node * n_features + feature` of hidden features
+    """
+    features = _feature_csr(features)
+    features.data = np.ones_like(features.data)
+    n_nodes, n_features = features.shape
+    counts = np.diff(features.indptr)
+    n_hidden = np.where(
+        counts > 1,
+        np.clip(np.round(fraction * counts), 1, counts - 1), 0).astype(int)
+    rows = np.repeat(np.arange(n_nodes), counts)
+    # Position of each feature within its row, in random order
+    order = np.lexsort((np.random.default_rng(seed).random(len(rows)), rows))
+    position = np.empty(len(rows), dtype=int)
+    position[order] = np.arange(len(rows)) - features.indptr[rows[order]]
+    hidden = position < n_hidden[rows]
+    keys = rows[hidden].astype(np.int64) * n_features \
+        + features.indices[hidden]
+    remaining = sp.csr_matrix(
+        (features.data[~hidden], (rows[~hidden], features.indices[~hidden])),
+        shape=features.shape)
+    return remaining, np.sort(keys)
+
+
+def ranking_metrics(nodes, recommended, hidden_keys, n_features):
+    """
+    Return sums of precision, recall and NDCG over nodes with hidden
+    features, and the number of such nodes.
+
+    `recommended` is an array of shape (len(nodes), k), as returned by
+    `Recommender.recommend_nodes`; relevance of recommendations is binary.
+    """
+    nodes = np.asarray(nodes)
+    k = recommended.shape[1]
+    n_hidden = np.searchsorted(hidden_keys, (nodes + 1) * n_features) \
+        - np.searchsorted(hidden_keys, nodes * n_features)
+    keys = nodes[:, None].astype(np.int64) * n_features + recommended
+    hits = (recommended != -1) \
+        & np.isin(keys, hidden_keys).reshape(recommended.shape)
+    evaluated = n_hidden > 0
+    hits, n_hidden = hits[evaluated], n_hidden[evaluated]
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    ideal = np.cumsum(discounts)[np.minimum(n_hidden, k) - 1]
+    n_hits = hits.sum(axis=1)
+    return {"precision": (n_hits / k).sum(),
+            "recall": (n_hits / n_hidden).sum(),
+            "ndcg": ((hits @ discounts) / ideal).sum()}, len(n_hidden)
+
+
+def evaluate_fold(data: FeatureNetwork, mode, k=5, fraction=0.2, seed=None,
+                  decay=0.5, alpha=0.85, chunk_size=1024):
+    """
+    Evaluate the `mode` on a single fold; see `evaluate` for arguments and
+    description of the result, whose metrics are here given for the fold.
+    """
+    features, hidden_keys = split_features(data.features, fraction, seed)
+
+    def recommend():
+        sums, n_evaluated = dict.fromkeys(METRICS, 0.), 0
+        recommender = Recommender(data.adjacency, features, data.directed,
+                                  decay=decay, alpha=alpha)
+        for start, recommended, _ in recommender.iter_recommend_all(
+                k, mode, chunk_size):
+            nodes = np.arange(start, start + len(recommended))
+            fold_sums, n = ranking_metrics(
+                nodes, recommended, hidden_keys, features.shape[1])
+            for metric in METRICS:
+                sums[metric] += fold_sums[metric]
+            n_evaluated += n
+        return sums, n_evaluated
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    sums, n_evaluated = recommend()
+    wall_time = time.perf_counter() - wall_start
+    cpu_time = time.process_time() - cpu_start
+    # Tracing allocations slows down modes unevenly, so memory is measured
+    # in a separate, untimed pass
+    tracemalloc.start()
+    recommend()
+    _, memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {metric: float(sums[metric]) / max(n_evaluated, 1)
+              for metric in METRICS}
+    result.update(wall_time=wall_time, cpu_time=cpu_time, memory=memory)
+    return result
+
+
+def _init_worker(directory):
+    global _data
+    _data = load_snapshot(directory)
+
+
+def _evaluate_task(task):
+    return evaluate_fold(_data, *task)
+
+
+def evaluate(data: FeatureNetwork, modes=MODES, k=5, fraction=0.2, folds=5,
+             seed=0, decay=0.5, alpha=0.85, workers=None, chunk_size=1024):
+    """
+    Evaluate scoring modes with `folds` random splits of features.
+
+    Folds of all modes are distributed among `workers` processes (if
+    `workers` is 1, they are evaluated in this process). Unless `seed` is
+    `None`, each fold uses the same split for all modes.
+
+    Returns:
+        (dict): for each mode, a dictionary with `precision`, `recall` and
+            `ndcg` averaged over nodes with hidden features and over folds,
+            and `wall_time` and `cpu_time` (in seconds) and `memory` (peak
+            allocated bytes) of recommending, averaged over folds
+    """
+    tasks = [(mode, k, fraction, seed if seed is None else (seed, fold),
+              decay, alpha, chunk_size)
+             for mode in modes for fold in range(folds)]
+    if workers == 1:
+        results = [evaluate_fold(data, *task) for task in tasks]
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            save_snapshot(directory, data)
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(directory, )) as executor:
+                results = list(executor.map(_evaluate_task, tasks))
+    return {mode: {key: float(np.mean([result[key] for result in
+                                       results[i * folds:(i + 1) * folds]]))
+                   for key in METRICS + COSTS}
+            for i, mode in enumerate(modes)}
+
+
+def _format_results(results, k):
+    lines = [f"{'mode':10}{f'P@{k}':>8}{f'R@{k}':>8}{f'NDCG@{k}':>9}"
+             f"{'wall s':>9}{'CPU s':>9}{'MB':>9}{'NDCG/CPU s':>12}"]
+    for mode, result in results.items():
+        per_cpu = result["ndcg"] / max(result["cpu_time"], 1e-9)
+        lines.append(
+            f"{mode:10}{result['precision']:8.3f}{result['recall']:8.3f}"
+            f"{result['ndcg']:9.3f}{result['wall_time']:9.3f}"
+            f"{result['cpu_time']:9.3f}{result['memory'] / 2 ** 20:9.1f}"
+            f"{per_cpu:12.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Evaluate recommendations by hiding node features.")
+    parser.add_argument(
+        "network",
+        help="Pajek file or a directory with a snapshot of the network")
+    parser.add_argument("--table", help="file with node features")
+    parser.add_argument("--name-column", help="attribute with node names")
+    parser.add_argument("-k", type=int, default=5,
+                        help="number of recommendations per node")
+    parser.add_argument("--mode", choices=MODES, action="append",
+                        help="scoring mode (default: all)")
+    parser.add_argument("--fraction", type=float, default=0.2,
+                        help="fraction of hidden features of each node")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--decay", type=float, default=0.5)
+    parser.add_argument("--alpha", type=float, default=0.85)
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of processes (default: all cores)")
+    parser.add_argument("--json", action="store_true",
+                        help="output results as JSON")
+    args = parser.parse_args(argv)
+
+    data = load_network(args.network, args.table, args.name_column)
+    results = evaluate(data, args.mode or MODES, args.k, args.fraction,
+                       args.folds, args.seed, args.decay, args.alpha,
+                       args.workers)
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print(_format_results(results, args.k))
+
+
+if __name__ == "__main__":
+    main()
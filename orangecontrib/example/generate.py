@@ -0,0 +1,186 @@
+"""
+Generate synthetic networks with node features for testing at scale.
+
+Nodes belong to clusters; each cluster has a center, a set of `set_size`
+features, and each node has `set_size` features, of which a part is taken
+from the center of its cluster and the rest from other features. The number
+of shared features is chosen so that the Jaccard similarity between the
+node and the center is as close as possible to a similarity drawn for the
+cluster, so clusters can be weakly or strongly connected (as children in
+`kids_cartoons.py`). Edges connect nodes mostly within clusters.
+
+Example:
+
+    python -m orangecontrib.example.generate 1000000 network.net
+"""
+import argparse
+
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.example.bitset import BitMatrix
+from orangecontrib.example.readwrite import \
+    FeatureNetwork, write_feature_pajek
+
+__all__ = ("generate_features", "generate_edges", "generate_network")
+
+
+def _sample_distinct(rng, n_rows, n_values, k):
+    # Returns k distinct integers from range(n_values) for each row
+    return np.argpartition(rng.random((n_rows, n_values)), k - 1,
+                           axis=1)[:, :k]
+
+
+def generate_features(n_nodes, n_features=40, set_size=5, n_clusters=10,
+                      clusters=None, similarity=(0.2, 0.8), seed=None,
+                      block_size=None):
+    """
+    Generate binary node features.
+
+    Args:
+        n_nodes: the number of nodes
+        n_features: the number of features
+        set_size: the number of features of each node
+        n_clusters: the number of clusters (ignored if `clusters` are given)
+        clusters: cluster of each node; by default, clusters are random
+        similarity: a range `(low, high)` from which the Jaccard similarity
+            between nodes and centers of their clusters is drawn for each
+            cluster, or an array of ranges, one for each cluster
+        seed: random seed
+        block_size: the number of nodes generated at once; by default, it
+            is chosen so that blocks take about 16 MB
+
+    Returns:
+        (tuple of BitMatrix, np.ndarray): features and clusters of nodes
+    """
+    if 2 * set_size > n_features:
+        raise ValueError("'set_size' must be at most a half of 'n_features'")
+    rng = np.random.default_rng(seed)
+    if clusters is None:
+        clusters = rng.integers(n_clusters, size=n_nodes)
+    else:
+        clusters = np.asarray(clusters, dtype=int)
+        n_clusters = clusters.max() + 1 if len(clusters) else 0
+    similarity = np.broadcast_to(np.asarray(similarity, dtype=float),
+                                 (n_clusters, 2))
+    cluster_similarity = rng.uniform(similarity[:, 0], similarity[:, 1])
+    # Jaccard with the center for s shared features is s / (2 set_size - s)
+    shared = np.round(2 * set_size * cluster_similarity
+                      / (1 + cluster_similarity)).astype(int)[clusters]
+    centers = np.sort(_sample_distinct(rng, n_clusters, n_features, set_size),
+                      axis=1)
+    # Other features are drawn from range(n_features - set_size) and
+    # shifted over the center's features
+    shifts = centers - np.arange(set_size)
+
+    if block_size is None:
+        block_size = max(1, (1 << 24) // n_features)
+    features = BitMatrix.zeros(n_nodes, n_features)
+    for start in range(0, n_nodes, block_size):
+        nodes = np.arange(start, min(start + block_size, n_nodes))
+        node_clusters = clusters[nodes]
+        from_center = np.take_along_axis(
+            centers[node_clusters],
+            np.argsort(rng.random((len(nodes), set_size)), axis=1), axis=1)
+        other = _sample_distinct(rng, len(nodes), n_features - set_size,
+                                 set_size)
+        other += (other[:, :, None]
+                  >= shifts[node_clusters][:, None, :]).sum(axis=2)
+        chosen = np.where(
+            np.arange(set_size) < shared[nodes, None], from_center, other)
+        block = np.zeros((len(nodes), n_features), dtype=bool)
+        block[np.arange(len(nodes))[:, None], chosen] = True
+        packed = np.packbits(block, axis=1)
+        features.bits[nodes, :packed.shape[1]] = packed
+    return features, clusters
+
+
+def generate_edges(clusters, degree=5, within=0.8, directed=False,
+                   seed=None):
+    """
+    Generate edges with random weights from (0, 1].
+
+    Each node gets `degree` edges to random nodes; the probability that the
+    other node is from the same cluster is `within`. Multiple edges between
+    the same nodes and loops are removed, so degrees can be smaller.
+
+    Returns:
+        (sp.csr_matrix): adjacency matrix (symmetric if not `directed`)
+    """
+    rng = np.random.default_rng(seed)
+    clusters = np.asarray(clusters)
+    n = len(clusters)
+    sources = np.repeat(np.arange(n), degree)
+    targets = rng.integers(n, size=len(sources))
+    local = np.flatnonzero(rng.random(len(sources)) < within)
+    members = np.argsort(clusters, kind="stable")
+    n_clusters = clusters.max() + 1 if n else 0
+    starts = np.searchsorted(clusters[members], np.arange(n_clusters))
+    sizes = np.bincount(clusters, minlength=n_clusters)
+    local_clusters = clusters[sources[local]]
+    targets[local] = members[
+        starts[local_clusters]
+        + (rng.random(len(local)) * sizes[local_clusters]).astype(int)]
+
+    if not directed:
+        sources, targets = \
+            np.minimum(sources, targets), np.maximum(sources, targets)
+    keys = np.unique(sources[sources != targets].astype(np.int64) * n
+                     + targets[sources != targets])
+    sources, targets = keys // n, keys % n
+    weights = 1 - rng.random(len(keys))
+    adjacency = sp.csr_matrix((weights, (sources, targets)), shape=(n, n))
+    if not directed:
+        adjacency = (adjacency + adjacency.T).tocsr()
+    return adjacency
+
+
+def generate_network(n_nodes, n_features=40, set_size=5, n_clusters=None,
+                     similarity=(0.2, 0.8), degree=5, within=0.8,
+                     directed=False, seed=None) -> FeatureNetwork:
+    """
+    Generate a network with node features; see `generate_features` and
+    `generate_edges` for arguments. By default, clusters have 20 nodes on
+    average. Nodes and features have no names.
+    """
+    rng = np.random.default_rng(seed)
+    if n_clusters is None:
+        n_clusters = max(1, n_nodes // 20)
+    features, clusters = generate_features(
+        n_nodes, n_features, set_size, n_clusters, similarity=similarity,
+        seed=rng)
+    adjacency = generate_edges(clusters, degree, within, directed, seed=rng)
+    return FeatureNetwork(adjacency, features, None, None, directed)
+
+
+def main(argv=None):
+    from orangecontrib.example.snapshot import save_snapshot
+
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic network with node features.")
+    parser.add_argument("n_nodes", type=int)
+    parser.add_argument(
+        "output",
+        help="Pajek file (.net) or a directory for a binary snapshot")
+    parser.add_argument("--features", type=int, default=40)
+    parser.add_argument("--set-size", type=int, default=5)
+    parser.add_argument("--clusters", type=int, default=None)
+    parser.add_argument("--similarity", type=float, nargs=2,
+                        default=(0.2, 0.8), metavar=("LOW", "HIGH"))
+    parser.add_argument("--degree", type=int, default=5)
+    parser.add_argument("--within", type=float, default=0.8)
+    parser.add_argument("--directed", action="store_true")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    data = generate_network(
+        args.n_nodes, args.features, args.set_size, args.clusters,
+        args.similarity, args.degree, args.within, args.directed, args.seed)
+    if args.output.endswith(".net"):
+        write_feature_pajek(args.output, data)
+    else:
+        save_snapshot(args.output, data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import json
+import os
+
+import numpy as np
+
+from orangecontrib.example.recommend import Recommender, COUNT, splice_rows
+from orangecontrib.example.tracing import stage, INDEX_BUILD
+
+__all__ = ("RecommendationIndex", )
+
+FORMAT_VERSION = 1
+
+
+class RecommendationIndex:
+    """
+    Precomputed recommendations and recommenders for all nodes.
+
+    Row `i` of `features` and `scores` contains the top `k` features for
+    node `i` (padded with -1 and `-inf`). Recommenders of the feature in
+    slot `j` of node `i` are
+    `recommenders[offsets[i * k + j]:offsets[i * k + j + 1]]`.
+    Lookups only slice these arrays, which can be memory mapped.
+
+    Scores are stored in double precision, so lookups return the same
+    features and scores (up to rounding of sums) as
+    `Recommender.recommend`. The exception are ties after `update`: nodes
+    that were not updated keep the order of tied features by their
+    popularity at the time they were computed.
+
+    Args:
+        features: int32 array (n_nodes x k) with recommended features
+        scores: float64 array (n_nodes x k) with their scores
+        offsets: int64 array (n_nodes * k + 1) with offsets of recommenders
+        recommenders: int32 array with recommenders of all slots
+        mode: scoring mode used to compute the index
+        params: parameter of the scoring mode (see
+            `Recommender.mode_params`)
+    """
+    def __init__(self, features, scores, offsets, recommenders, mode=COUNT,
+                 params=None):
+        self.features = features
+        self.scores = scores
+        self.offsets = offsets
+        self.recommenders = recommenders
+        self.mode = mode
+        self.params = params
+
+    @property
+    def n_nodes(self):
+        return self.features.shape[0]
+
+    @property
+    def k(self):
+        return self.features.shape[1]
+
+    @classmethod
+    def build(cls, recommender: Recommender, k=5, mode=COUNT,
+              chunk_size=1024, callback=None):
+        """
+        Compute the index for all nodes, in blocks of `chunk_size`;
+        `callback`, if given, is called with the proportion of processed
+        nodes after each block.
+        """
+        with stage(INDEX_BUILD):
+            return cls._build(recommender, k, mode, chunk_size, callback)
+
+    @classmethod
+    def _build(cls, recommender, k, mode, chunk_size, callback):
+        def chunks():
+            for start, features, scores \
+                    in recommender.iter_recommend_all(k, mode, chunk_size):
+                nodes = np.arange(start, start + len(features))
+                yield (start, features, scores,
+                       *recommender.batch_recommenders(nodes, features, mode))
+
+        return cls.from_chunks(chunks(), recommender.n_nodes, k, mode,
+                               recommender.mode_params(mode), callback)
+
+    @classmethod
+    def from_chunks(cls, chunks, n_nodes, k=5, mode=COUNT, params=None,
+                    callback=None):
+        """
+        Construct the index from chunks `(start, features, scores, offsets,
+        recommenders)` for consecutive ranges of nodes, where `offsets` and
+        `recommenders` are as returned by `Recommender.batch_recommenders`;
+        chunks may be computed, for instance, in other processes.
+        """
+        features = np.empty((n_nodes, k), dtype=np.int32)
+        scores = np.empty((n_nodes, k))
+        counts = np.empty(n_nodes * k, dtype=np.int64)
+        recommenders = []
+        for start, chunk_features, chunk_scores, chunk_offsets, \
+                chunk_recommenders in chunks:
+            end = start + len(chunk_features)
+            features[start:end] = chunk_features
+            scores[start:end] = chunk_scores
+            counts[start * k:end * k] = np.diff(chunk_offsets)
+            recommenders.append(chunk_recommenders.astype(np.int32))
+            if callback is not None:
+                callback(end / n_nodes)
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        recommenders = np.concatenate(recommenders) if recommenders \
+            else np.empty(0, dtype=np.int32)
+        return cls(features, scores, offsets, recommenders, mode, params)
+
+    def recommend(self, node, k=None):
+        """Return features and scores for the node, as `Recommender`."""
+        features = self.features[node, :k]
+        valid = features != -1
+        return (np.asarray(features[valid], dtype=int),
+                np.asarray(self.scores[node, :k][valid], dtype=float))
+
+    def lookup(self, node, k=None):
+        """
+        Return features, scores and a list of arrays of recommenders for the
+        node, as `Recommender.recommend_with_recommenders`.
+        """
+        features, scores = self.recommend(node, k)
+        first = node * self.k
+        recommenders = [
+            np.asarray(self.recommenders[self.offsets[slot]:
+                                         self.offsets[slot + 1]], dtype=int)
+            for slot in range(first, first + len(features))]
+        return features, scores, recommenders
+
+    def update(self, recommender: Recommender, nodes):
+        """
+        Recompute the index for the given nodes, for instance after their
+        neighbourhoods changed; other nodes are not rescored, so changes of
+        feature popularity do not affect their tie-breaking.
+        """
+        nodes = np.unique(np.asarray(nodes, dtype=int))
+        k = self.k
+        features, scores = recommender.recommend_nodes(nodes, k, self.mode)
+        new_offsets, new_recommenders = \
+            recommender.batch_recommenders(nodes, features, self.mode)
+
+        # Memory-mapped arrays may be read-only
+        if not self.features.flags.writeable:
+            self.features = np.array(self.features)
+        if not self.scores.flags.writeable:
+            self.scores = np.array(self.scores)
+        self.features[nodes] = features
+        self.scores[nodes] = scores
+
+        # Slots of a node are consecutive, so its recommenders are replaced
+        # as a single range
+        counts = np.diff(self.offsets)
+        counts[(nodes[:, None] * k + np.arange(k)).ravel()] = \
+            np.diff(new_offsets)
+        _, (self.recommenders, ) = splice_rows(
+            self.offsets[::k], (self.recommenders, ), nodes,
+            new_offsets[::k], (new_recommenders, ))
+        self.offsets = np.zeros(len(self.offsets), dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+
+    def save(self, directory):
+        """Save the index as `.npy` files and `meta.json` in the directory."""
+        os.makedirs(directory, exist_ok=True)
+        for name in ("features", "scores", "offsets", "recommenders"):
+            np.save(os.path.join(directory, name + ".npy"),
+                    getattr(self, name))
+        with open(os.path.join(directory, "meta.json"), "wt") as f:
+            json.dump({"format": FORMAT_VERSION, "mode": self.mode,
+                       "params": self.params}, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        """Load the index saved by `save`, memory mapped by default."""
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(
+                f"unsupported index format: {meta.get('format')}")
+        arrays = [np.load(os.path.join(directory, name + ".npy"),
+                          mmap_mode=mmap_mode)
+                  for name in ("features", "scores", "offsets",
+                               "recommenders")]
+        return cls(*arrays, meta["mode"], meta["params"])
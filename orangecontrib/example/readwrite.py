@@ -0,0 +1,259 @@
+import re
+from collections import namedtuple
+from itertools import islice
+
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.network import Network
+from orangecontrib.network.network.base import DirectedEdges, UndirectedEdges
+
+from orangecontrib.example.bitset import BitMatrix
+
+__all__ = ("FeatureNetwork", "read_feature_pajek", "write_feature_pajek",
+           "to_network")
+
+#: Inputs of a recommender: adjacency (CSR, row=from, column=to; symmetric
+#: for undirected networks), node feature matrix, node names, feature names
+#: (or `None`) and whether the network is directed
+FeatureNetwork = namedtuple(
+    "FeatureNetwork",
+    ("adjacency", "features", "node_names", "feature_names", "directed"))
+
+# 1 "[0, 1, 0] {name}" or 1 "name" or 1
+RE_VERTEX = re.compile(
+    r'\s*(\S+)(?:\s+"(?:\[([^\]]*)\]\s*(?:\{(.*)\})?|([^"]*))")?')
+
+
+def read_feature_pajek(filename, chunk_size=1 << 20, packed=False):
+    """
+    Read a Pajek file whose vertex labels contain node features, as in
+    `"[0, 0, 1, ...] {name}"`.
+
+    The file is read line by line. Features are parsed directly into a
+    preallocated uint8 matrix and edges are parsed in blocks of `chunk_size`
+    lines into numeric arrays, so memory use is bounded by the size of the
+    resulting matrices. If `packed` is set, features are packed into a
+    `BitMatrix` with one bit per feature while reading.
+
+    Vertices must be numbered from 1 to n in order. Sections `*Edges`
+    (undirected) and `*Arcs` (directed) may be combined; if any arcs are
+    present, the network is directed and undirected edges are stored in
+    both directions.
+
+    Returns:
+        (FeatureNetwork)
+    """
+    features = node_names = None
+    rows, cols, weights = [], [], []
+    directed = False
+    with open(filename, encoding="utf-8") as f:
+        line = _next_section(f)
+        while line:
+            section, *args = line.split()
+            section = section.lower()
+            if section == "*vertices":
+                if node_names is not None:
+                    raise ValueError(
+                        "Pajek files with multiple sets of vertices are not "
+                        "supported")
+                features, node_names = \
+                    _read_vertices(f, int(args[0]), packed)
+                line = _next_section(f)
+            elif section in ("*edges", "*arcs"):
+                if node_names is None:
+                    raise ValueError(
+                        "Vertices must be defined before edges or arcs")
+                directed |= section == "*arcs"
+                line = _read_edges(f, len(node_names), section == "*edges",
+                                   chunk_size, rows, cols, weights)
+            else:
+                line = _next_section(f)
+    if node_names is None:
+        raise ValueError("file contains no vertices")
+
+    n = len(node_names)
+    if rows:
+        rows, cols, weights = map(np.concatenate, (rows, cols, weights))
+    else:
+        rows = cols = np.empty(0, dtype=np.int32)
+        weights = np.empty(0)
+    adjacency = sp.csr_matrix((weights, (rows, cols)), shape=(n, n))
+    adjacency.sum_duplicates()
+    return FeatureNetwork(adjacency, features, node_names, None, directed)
+
+
+def _next_section(f):
+    # Skips to the next section header and returns it, or "" at the end
+    for line in f:
+        if line.startswith("*"):
+            return line.strip()
+    return ""
+
+
+def _read_vertices(f, n, packed):
+    features = None
+    node_names = np.empty(n, dtype=object)
+    read = 0
+    for read, line in enumerate(islice(f, n), start=1):
+        match = RE_VERTEX.match(line)
+        node_id, vector, name, label = match.groups()
+        if node_id != str(read):
+            raise ValueError("vertices must be numbered from 1 to n in order")
+        if vector is not None:
+            row = np.fromstring(vector, dtype=np.uint8, sep=",")
+            if features is None:
+                features = BitMatrix.zeros(n, len(row)) if packed \
+                    else np.zeros((n, len(row)), dtype=np.uint8)
+            if packed:
+                packed_row = np.packbits(row != 0)
+                features.bits[read - 1, :len(packed_row)] = packed_row
+            else:
+                features[read - 1] = row
+        node_names[read - 1] = name or label or node_id
+    if read != n:
+        raise ValueError("file contains fewer vertices than declared")
+    if features is None:
+        features = BitMatrix.zeros(n, 0) if packed \
+            else np.zeros((n, 0), dtype=np.uint8)
+    return features, node_names
+
+
+def _read_edges(f, n, both_ways, chunk_size, rows, cols, weights):
+    # Reads edges until the next section; returns the section's header or ""
+    next_line = ""
+    while True:
+        block = []
+        consumed = 0
+        for consumed, line in enumerate(islice(f, chunk_size), start=1):
+            line = line.strip()
+            if not line or line.startswith("%"):
+                continue
+            if line.startswith("*"):
+                next_line = line
+                break
+            block.append(line)
+        if block:
+            block_rows, block_cols, block_weights = _parse_edges(block)
+            if block_rows.size and (
+                    min(block_rows.min(), block_cols.min()) < 1
+                    or max(block_rows.max(), block_cols.max()) > n):
+                raise ValueError("edge refers to an unknown vertex")
+            block_rows -= 1
+            block_cols -= 1
+            rows.append(block_rows)
+            cols.append(block_cols)
+            weights.append(block_weights)
+            if both_ways:
+                rows.append(block_cols)
+                cols.append(block_rows)
+                weights.append(block_weights)
+        if next_line or consumed < chunk_size:
+            return next_line
+
+
+def _parse_edges(block):
+    ncols = len(block[0].split())
+    try:
+        values = np.fromstring(" ".join(block), sep=" ")
+    except ValueError:  # non-numeric data, e.g. edge colors
+        values = np.empty(0)
+    if ncols in (2, 3) and values.size == ncols * len(block):
+        values = values.reshape(-1, ncols)
+        fr, to = values[:, 0].astype(np.int32), values[:, 1].astype(np.int32)
+        if ncols == 3:
+            return fr, to, np.abs(values[:, 2])
+        return fr, to, np.ones(len(block))
+    # Irregular block (missing weights or additional attributes)
+    parsed = np.array([(line.split() + ["1"])[:3] for line in block],
+                      dtype=float)
+    return (parsed[:, 0].astype(np.int32), parsed[:, 1].astype(np.int32),
+            np.abs(parsed[:, 2]))
+
+
+def write_feature_pajek(filename, data: FeatureNetwork, chunk_size=1 << 16):
+    """
+    Write the network to a Pajek file in the format read by
+    `read_feature_pajek`, with node features in vertex labels.
+
+    Vertices and edges are written in chunks of `chunk_size`; labels of
+    binary features are formatted from byte arrays instead of joining
+    strings. Undirected networks are written as `*Edges` (from the upper
+    triangle of the adjacency matrix) and directed as `*Arcs`.
+    """
+    features = data.features
+    n, n_features = features.shape
+    adjacency = sp.csr_matrix(data.adjacency)
+    with open(filename, "wt", encoding="utf-8") as f:
+        f.write(f"*Vertices {n}\n")
+        for start in range(0, n, chunk_size):
+            end = min(start + chunk_size, n)
+            block = features[start:end]
+            if sp.issparse(block):
+                block = block.toarray()
+            block = np.asarray(block)
+            names = None if data.node_names is None \
+                else data.node_names[start:end]
+            f.writelines(
+                f'{start + i + 1} "[{label}]'
+                + ("" if names is None else f" {{{names[i]}}}") + '"\n'
+                for i, label in enumerate(_feature_labels(block)))
+        if data.directed:
+            f.write("*Arcs\n")
+        else:
+            f.write("*Edges\n")
+            adjacency = sp.triu(adjacency).tocsr()
+        adjacency = adjacency.tocoo()
+        for start in range(0, adjacency.nnz, chunk_size):
+            end = start + chunk_size
+            np.savetxt(f, np.column_stack(
+                (adjacency.row[start:end] + 1, adjacency.col[start:end] + 1,
+                 adjacency.data[start:end])), fmt="%d %d %.17g")
+
+
+def _feature_labels(block):
+    # Returns "0, 1, 0, ..." for each row of the block
+    if not block.shape[1]:
+        return [""] * len(block)
+    if np.all((block == 0) | (block == 1)):
+        # digits, separated by ", "
+        chars = np.full((len(block), 3 * block.shape[1] - 2), ord(" "),
+                        dtype=np.uint8)
+        chars[:, 1::3] = ord(",")
+        chars[:, ::3] = block.astype(np.uint8) + ord("0")
+        return [row.tobytes().decode("ascii") for row in chars]
+    return [", ".join(f"{x:g}" for x in row) for row in block]
+
+
+def to_network(data: FeatureNetwork) -> Network:
+    """
+    Return a `Network` whose nodes are a `Table` with node features as
+    attributes and node names (or numbers, if names are missing) as a meta
+    attribute.
+    """
+    from Orange.data import Table, Domain, ContinuousVariable, StringVariable
+
+    feature_names = data.feature_names
+    if feature_names is None:
+        feature_names = [f"Feature {i}"
+                         for i in range(1, data.features.shape[1] + 1)]
+    domain = Domain([ContinuousVariable(str(name)) for name in feature_names],
+                    metas=[StringVariable("name")])
+    features = data.features
+    if isinstance(features, BitMatrix):
+        features = features.toarray()
+    if sp.issparse(features):
+        features = sp.csr_matrix(features, dtype=float)
+    else:
+        features = np.asarray(features, dtype=float)
+    node_names = data.node_names
+    if node_names is None:
+        node_names = np.arange(1, features.shape[0] + 1).astype(str)
+    nodes = Table.from_numpy(
+        domain, features,
+        metas=np.asarray(node_names, dtype=object)[:, None])
+    if data.directed:
+        edges = DirectedEdges(data.adjacency)
+    else:
+        edges = UndirectedEdges(sp.triu(data.adjacency))
+    return Network(nodes, [edges])
@@ -0,0 +1,956 @@
+import warnings
+
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.network import Network
+
+from orangecontrib.example.bitset import BitMatrix
+from orangecontrib.example.cache import LRUCache
+from orangecontrib.example.similarity import SimilarityIndex
+from orangecontrib.example.topk import top_k, top_k_rows
+from orangecontrib.example.tracing import \
+    stage, count, NEIGHBOURS, SCORING, TOP_K
+
+# Scoring modes
+COUNT = "count"  # number of neighbours with the feature
+WEIGHTED = "weighted"  # sum of weights of edges to neighbours with the feature
+TWO_HOP = "two-hop"  # weighted, plus friends of friends with decayed weights
+PAGERANK = "pagerank"  # visit probabilities of random walks with restart
+SIMILAR = "similar"  # nodes with similar features, weighted by similarity
+MODES = (COUNT, WEIGHTED, TWO_HOP, PAGERANK, SIMILAR)
+
+
+def combine_layers(layers, weights=None):
+    """
+    Return the weighted sum of adjacency matrices of edge layers (e.g.
+    friendship and classmates) as a CSR matrix; layers with zero weights
+    are skipped and weights default to 1.
+    """
+    if weights is None:
+        weights = np.ones(len(layers))
+    if len(weights) != len(layers):
+        raise ValueError("the number of weights does not match the number "
+                         "of layers")
+    if np.any(np.asarray(weights) < 0):
+        raise ValueError("layer weights must be non-negative")
+    used = [(layer, weight) for layer, weight in zip(layers, weights)
+            if weight != 0]
+    if len(used) == 1 and used[0][1] == 1:
+        return sp.csr_matrix(used[0][0], dtype=float)
+    combined = sp.csr_matrix(layers[0].shape, dtype=float)
+    for layer, weight in used:
+        combined = combined + weight * sp.csr_matrix(layer, dtype=float)
+    combined = sp.csr_matrix(combined)
+    combined.eliminate_zeros()
+    combined.sort_indices()
+    return combined
+
+
+def personalized_pagerank(transition, sources, alpha=0.85, tol=1e-8,
+                          max_iter=100):
+    """
+    Compute visit probabilities of random walks with restart by power
+    iteration, for a block of source nodes at once.
+
+    Args:
+        transition: row-stochastic transition matrix (row=from, column=to);
+            walks from nodes with zero rows (dangling nodes) restart
+        sources: indices of source nodes
+        alpha: probability of continuing the walk (1 - restart probability)
+        tol: the iteration stops when the L1 change of every column is
+            below `tol`
+        max_iter: maximal number of iterations
+
+    Returns:
+        dense array of shape (n_nodes, len(sources)) whose columns are visit
+        probabilities for walks from the corresponding sources
+    """
+    n = transition.shape[0]
+    sources = np.asarray(sources, dtype=int)
+    backward = sp.csr_matrix(transition.T)
+    dangling = np.flatnonzero(np.asarray(transition.sum(axis=1)).ravel() == 0)
+    restart = np.zeros((n, len(sources)))
+    restart[sources, np.arange(len(sources))] = 1
+    visits = restart
+    for _ in range(max_iter):
+        lost = alpha * visits[dangling].sum(axis=0)
+        new_visits = alpha * (backward @ visits) + (1 - alpha + lost) * restart
+        converged = np.abs(new_visits - visits).sum(axis=0).max() < tol
+        visits = new_visits
+        if converged:
+            break
+    return visits
+
+
+def splice_rows(indptr, arrays, rows, new_indptr, new_arrays):
+    """
+    Replace rows of a compressed structure, such as a CSR matrix.
+
+    Row `i` of each array in `arrays` is `array[indptr[i]:indptr[i + 1]]`.
+    Rows `rows` (sorted and unique) are replaced by consecutive rows of
+    `new_arrays`, described by `new_indptr`. Other rows are copied in
+    slices between replaced rows, so the cost is that of copying the arrays
+    rather than of rebuilding the structure.
+
+    Returns:
+        (tuple of np.ndarray, list of np.ndarray): `indptr` and arrays
+    """
+    counts = np.diff(indptr)
+    counts[rows] = np.diff(new_indptr)
+    total = counts.sum()
+    dtype = indptr.dtype if total <= np.iinfo(indptr.dtype).max \
+        else np.int64
+    spliced_indptr = np.zeros(len(indptr), dtype=dtype)
+    np.cumsum(counts, out=spliced_indptr[1:])
+
+    kept = list(zip(np.concatenate(([0], indptr[rows + 1])),
+                    np.concatenate((indptr[rows], [indptr[-1]]))))
+    spliced = []
+    for array, new_array in zip(arrays, new_arrays):
+        pieces = []
+        for i, (fr, to) in enumerate(kept):
+            pieces.append(array[fr:to])
+            if i < len(rows):
+                pieces.append(new_array[new_indptr[i]:new_indptr[i + 1]])
+        spliced.append(np.concatenate(pieces, dtype=array.dtype))
+    return spliced_indptr, spliced
+
+
+def _replace_rows(matrix, rows, replacement):
+    # Returns a CSR matrix (or CSC, for columns) in which `rows` are replaced
+    # by rows of `replacement` in the same format
+    indptr, (indices, data) = splice_rows(
+        matrix.indptr, (matrix.indices, matrix.data), rows,
+        replacement.indptr, (replacement.indices, replacement.data))
+    return type(matrix)((data, indices, indptr), shape=matrix.shape)
+
+
+def _patched(matrix, delta):
+    # Returns `matrix + delta` (both CSR or both CSC), in which only rows
+    # (columns) that `delta` changes are recomputed
+    major = np.flatnonzero(np.diff(delta.indptr))
+    if matrix.format == "csr":
+        changed = sp.csr_matrix(matrix[major] + delta[major])
+    else:
+        changed = sp.csc_matrix(matrix[:, major] + delta[:, major])
+    changed.eliminate_zeros()
+    changed.sort_indices()
+    return _replace_rows(matrix, major, changed)
+
+
+def _remove_diagonal(matrix):
+    # Removes diagonal elements of a CSR matrix in place
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    matrix.data[matrix.indices == rows] = 0
+    matrix.eliminate_zeros()
+
+
+class Recommender:
+    """
+    Recommend features to nodes based on the features of their neighbours.
+
+    The recommender keeps the adjacency matrix (in CSR format) and the node
+    feature matrix resident, so that queries only slice the node's row of
+    the scoring matrix (see `scoring_matrix`) and sum the features of its
+    neighbours.
+
+    Args:
+        adjacency: square matrix with edge weights; row=from, column=to
+        features: node feature matrix (nodes x features); a dense array,
+            a sparse matrix (kept in CSR format) or, for binary features,
+            a `BitMatrix`
+        directed: if `False`, `adjacency` is assumed to be symmetric
+        decay: the factor for friends of friends in `TWO_HOP` mode
+        alpha: probability of continuing the walk in `PAGERANK` mode
+        n_similar: the number of most similar nodes in `SIMILAR` mode
+        cache_size: the number of per-node results kept in `cache`
+    """
+    #: maximal number of sources in a block of batched PageRank iteration
+    pagerank_block = 64
+    #: memory (in bytes) for dense arrays of a block of PageRank iteration,
+    #: which limits the block size in large networks
+    pagerank_memory = 256 * 2 ** 20
+    #: visit probabilities below this are ignored in `PAGERANK` mode; since
+    #: visits of a walk sum to 1, each node then has at most
+    #: `1 / pagerank_epsilon` contributors
+    pagerank_epsilon = 1e-4
+
+    def __init__(self, adjacency, features, directed=True, decay=0.5,
+                 alpha=0.85, n_similar=10, cache_size=1024):
+        # Avoid copying, so that memory-mapped matrices remain shared
+        self.adjacency = sp.csr_matrix(adjacency, dtype=float)
+        if not self.adjacency.has_canonical_format:
+            self.adjacency = self.adjacency.copy()
+            self.adjacency.sum_duplicates()
+        if sp.issparse(features):
+            features = sp.csr_matrix(features)
+        elif not isinstance(features, BitMatrix):
+            features = np.asarray(features)
+        self.features = features
+        self.directed = directed
+        if self.adjacency.shape[0] != self.features.shape[0]:
+            raise ValueError("adjacency and features have different number "
+                             "of nodes")
+        self.decay = decay
+        self.alpha = alpha
+        self.n_similar = n_similar
+        self._matrices = {}
+        # Changes of the weighted matrix that are not yet applied to cached
+        # matrices; see `set_edges`
+        self._deltas = {}
+        self.cache = LRUCache(cache_size)
+        self.version = 0
+        self.index = None
+        # Edge layers of multiplex networks; see `from_layers`
+        self.layers = None
+        self.layer_weights = None
+        self._combined = LRUCache(8)
+
+    @classmethod
+    def from_layers(cls, layers, features, weights=None, directed=True,
+                    **kwargs):
+        """
+        Construct a recommender for a multiplex network, whose adjacency
+        matrix is the weighted sum of adjacency matrices of `layers`; see
+        `combine_layers` and `set_layer_weights`.
+        """
+        weights = tuple(np.ones(len(layers)) if weights is None else weights)
+        recommender = cls(combine_layers(layers, weights), features,
+                          directed, **kwargs)
+        recommender.layers = [sp.csr_matrix(layer) for layer in layers]
+        recommender.layer_weights = weights
+        recommender._combined.put(
+            weights, (recommender.adjacency, recommender.in_adjacency,
+                      recommender.neighbourhood))
+        return recommender
+
+    @classmethod
+    def from_network(cls, network: Network, features=None,
+                     layer_weights=None):
+        """
+        Construct a recommender from all edge types of the network, which
+        are combined with `layer_weights` (by default, all weights are 1).
+        The network is treated as directed if any edge type is directed.
+
+        If `features` are not given, the network's nodes must be a `Table`,
+        whose `X` is used as the feature matrix.
+        """
+        if features is None:
+            features = network.nodes.X
+        n = network.number_of_nodes()
+        if not network.edges:
+            return cls(sp.csr_matrix((n, n)), features)
+        layers = [edges.edges if edges.directed else edges.twoway_edges
+                  for edges in network.edges]
+        directed = any(edges.directed for edges in network.edges)
+        return cls.from_layers(layers, features, layer_weights, directed)
+
+    def set_layer_weights(self, weights):
+        """
+        Change weights of edge layers and discard all cached results.
+
+        Combined matrices for the last few weightings are cached, so that
+        switching between weightings does not recompute sums. The adjacency
+        matrix is recombined from layers, so edges changed by `set_edges`
+        are lost.
+        """
+        if self.layers is None:
+            raise ValueError("the recommender was not constructed from layers")
+        weights = tuple(weights)
+        if weights == self.layer_weights:
+            return
+        self.adjacency, in_adjacency, neighbourhood = self._combined.get(
+            weights,
+            lambda: self._adjacencies(combine_layers(self.layers, weights)))
+        self.layer_weights = weights
+        self.invalidate()
+        self._matrices["neighbourhood"] = neighbourhood
+        if self.directed:
+            self._matrices["in-adjacency"] = in_adjacency
+
+    def _adjacencies(self, adjacency):
+        # Returns the adjacency matrix and matrices derived from it
+        return (adjacency, adjacency.tocsc() if self.directed else None,
+                self._neighbourhood(adjacency, self.directed))
+
+    @property
+    def in_adjacency(self):
+        """
+        The adjacency matrix in CSC format, whose columns are incoming edges,
+        or `None` for undirected networks; computed when first needed.
+        """
+        if not self.directed:
+            return None
+        return self._cached("in-adjacency", self.adjacency.tocsc)
+
+    @property
+    def neighbourhood(self):
+        """
+        Binary CSR matrix of neighbours in any direction (as
+        `Network.neighbours`); computed when first needed.
+        """
+        return self._cached(
+            "neighbourhood",
+            lambda: self._neighbourhood(self.adjacency, self.directed))
+
+    @classmethod
+    def from_feature_network(cls, data, **kwargs):
+        """
+        Construct a recommender from a `FeatureNetwork`, as returned by
+        `read_feature_pajek` or `load_snapshot`.
+        """
+        return cls(data.adjacency, data.features, data.directed, **kwargs)
+
+    @staticmethod
+    def _neighbourhood(adjacency, directed, in_adjacency=None):
+        # Binary matrix of neighbours in any direction (as Network.neighbours);
+        # rows for a subset of nodes are given by their rows of `adjacency`
+        # and columns of `in_adjacency`
+        neighbourhood = adjacency.copy()
+        neighbourhood.data = np.ones_like(neighbourhood.data)
+        if directed:
+            incoming = neighbourhood.T if in_adjacency is None \
+                else in_adjacency.T.copy()
+            incoming.data = np.ones_like(incoming.data)
+            neighbourhood = neighbourhood + incoming
+            neighbourhood.data[:] = 1
+        neighbourhood = neighbourhood.tocsr()
+        neighbourhood.sort_indices()
+        return neighbourhood
+
+    def scoring_matrix(self, mode=COUNT):
+        """
+        Return the matrix whose row for a node gives the contributions of
+        other nodes' features to the node's scores.
+
+        Products and sums are cached, so switching between modes or changing
+        the `decay` does not recompute powers of the adjacency matrix.
+        In `SIMILAR` mode, rows contain Jaccard similarities of the most
+        similar nodes (see `SimilarityIndex`), regardless of edges.
+
+        `PAGERANK` mode has no such matrix; see `pagerank`.
+        """
+        if mode == COUNT:
+            return self.neighbourhood
+        if mode == WEIGHTED:
+            return self._cached("weighted", self._weighted)
+        if mode == TWO_HOP:
+            return self._cached(
+                ("two-hop", self.decay),
+                lambda: self._cached("weighted", self._weighted)
+                + self.decay * self._cached("square", self._square))
+        if mode == SIMILAR:
+            return self._cached(
+                ("similar", self.n_similar),
+                lambda: SimilarityIndex.build(
+                    self.features, self.n_similar).matrix)
+        raise ValueError(f"unknown scoring mode '{mode}'")
+
+    def pagerank(self, sources):
+        """
+        Return visit probabilities (n_nodes x len(sources)) of random walks
+        with restart at the given source nodes over the weighted network.
+        """
+        transition = self._cached("transition", self._transition)
+        return personalized_pagerank(transition, sources, self.alpha)
+
+    def _contributions(self, nodes, mode):
+        # Rows give contributions of nodes' features to scores of `nodes`;
+        # a sparse matrix in all modes
+        nodes = np.asarray(nodes, dtype=int)
+        if mode != PAGERANK:
+            key = {COUNT: "neighbourhood", WEIGHTED: "weighted",
+                   TWO_HOP: ("two-hop", self.decay)}.get(mode)
+            if key is None or key in self._matrices:
+                return self.scoring_matrix(mode)[nodes]
+            # Batches (e.g. in worker processes of `cli`) compute their rows
+            # instead of whole matrices, which can be much larger
+            return self._scoring_rows(nodes, mode)
+        blocks = [sp.csr_matrix((0, self.n_nodes))]
+        block_size = self._pagerank_block_size()
+        for start in range(0, len(nodes), block_size):
+            block = nodes[start:start + block_size]
+            visits = self.pagerank(block).T
+            # Walks start at the node; its own features are not
+            # recommendations
+            visits[np.arange(len(block)), block] = 0
+            visits[visits < self.pagerank_epsilon] = 0
+            blocks.append(sp.csr_matrix(visits))
+        return sp.vstack(blocks, format="csr")
+
+    def _scoring_rows(self, nodes, mode):
+        # Returns rows of `scoring_matrix(mode)` for `nodes` in `COUNT`,
+        # `WEIGHTED` or `TWO_HOP` mode, using only the adjacency matrix;
+        # incoming edges are a column slice if `in_adjacency` is not computed
+        adjacency = self.adjacency
+        incoming = None
+        if self.directed:
+            incoming = self._matrices.get("in-adjacency", adjacency)[:, nodes]
+        if mode == COUNT:
+            return self._neighbourhood(adjacency[nodes], self.directed, incoming)
+        weighted = adjacency[nodes]
+        if self.directed:
+            weighted = sp.csr_matrix(weighted + incoming.T)
+        if mode == WEIGHTED:
+            return weighted
+        square = self._times_weighted(weighted)
+        rows = np.repeat(np.arange(len(nodes)), np.diff(square.indptr))
+        square.data[square.indices == nodes[rows]] = 0
+        square.eliminate_zeros()
+        return sp.csr_matrix(weighted + self.decay * square)
+
+    def _pagerank_block_size(self):
+        # Iteration keeps about five dense float arrays of n_nodes x block
+        # (restart, visits, new visits and temporaries)
+        per_source = 5 * 8 * self.n_nodes
+        return int(np.clip(self.pagerank_memory // per_source,
+                           1, self.pagerank_block))
+
+    def invalidate(self):
+        """
+        Discard cached matrices and results, and detach the `index`; call
+        after changing `adjacency` or `features` in place.
+        """
+        self.index = None
+        self._matrices.clear()
+        self._deltas.clear()
+        self.cache.clear()
+        self.version += 1
+
+    # Incremental updates
+
+    def set_edges(self, sources, targets, weights=1):
+        """
+        Set weights of edges from `sources` to `targets`; zero weights remove
+        edges. In undirected networks, edges are set in both directions.
+
+        All changes are merged into the adjacency matrix at once, so a batch
+        of changes costs about as much as a single change. Only rows of
+        matrices that the changed edges affect are recomputed, and cached
+        products of the weighted matrix are updated by the change of
+        weights when they are next used. Cached results are discarded only
+        for nodes whose scores depend on the changed edges (in `PAGERANK`
+        mode, for all nodes), and the attached `index` is updated for these
+        nodes.
+        """
+        sources = np.atleast_1d(np.asarray(sources, dtype=int))
+        targets = np.atleast_1d(np.asarray(targets, dtype=int))
+        weights = np.broadcast_to(np.asarray(weights, dtype=float),
+                                  sources.shape)
+        if not self.directed:
+            sources, targets = (np.concatenate((sources, targets)),
+                                np.concatenate((targets, sources)))
+            weights = np.concatenate((weights, weights))
+        if not len(sources):
+            return
+        n = self.n_nodes
+        # If an edge is given multiple times, the last weight is used
+        _, last = np.unique((sources * n + targets)[::-1], return_index=True)
+        last = len(sources) - 1 - last
+        sources, targets, weights = sources[last], targets[last], weights[last]
+
+        old_weights = np.asarray(self.adjacency[sources, targets]).ravel()
+        delta = sp.csr_matrix((weights - old_weights, (sources, targets)),
+                              shape=(n, n))
+        delta.eliminate_zeros()
+        if not delta.nnz:
+            return
+
+        nodes = np.union1d(*delta.nonzero())
+        neighbourhood, in_adjacency = self.neighbourhood, self.in_adjacency
+        old_neighbours = neighbourhood[nodes].indices
+        self.adjacency = _patched(self.adjacency, delta)
+        if self.directed:
+            in_adjacency = _patched(in_adjacency, delta.tocsc())
+            self._matrices["in-adjacency"] = in_adjacency
+        self._matrices["neighbourhood"] = _replace_rows(
+            neighbourhood, nodes,
+            self._neighbourhood(
+                self.adjacency[nodes], self.directed,
+                in_adjacency[:, nodes] if self.directed else None))
+        # Matrices derived from the weighted matrix are updated when used,
+        # so a sequence of changes copies them only once
+        if self.directed:
+            delta = sp.csr_matrix(delta + delta.T)
+        for key in self._matrices:
+            if key in ("weighted", "square", "transition") \
+                    or key[0] == "two-hop":
+                pending = self._deltas.get(key)
+                self._deltas[key] = \
+                    delta if pending is None else pending + delta
+
+        # Friends of friends change for all neighbours of end points
+        two_hop = np.union1d(
+            nodes, np.union1d(old_neighbours, self.neighbourhood[nodes].indices))
+        affected = {COUNT: nodes, WEIGHTED: nodes, TWO_HOP: two_hop,
+                    SIMILAR: np.empty(0, dtype=int)}
+        affected_sets = {mode: set(nodes.tolist())
+                         for mode, nodes in affected.items()}
+        self.cache.discard(
+            lambda key: key[1] not in affected
+            or key[-1] in affected_sets[key[1]])
+        self._update_index(affected)
+
+    def _updated(self, key, delta):
+        # Returns the cached matrix derived from the weighted matrix, updated
+        # by `delta`, a change of the weighted matrix
+        matrix = self._matrices[key]
+        if key == "weighted":
+            return _patched(matrix, delta)
+        weighted = self._cached("weighted", self._weighted)
+        if key == "transition":
+            rows = np.flatnonzero(np.diff(delta.indptr))
+            return _replace_rows(
+                matrix, rows, self._normalized(weighted[rows]))
+        # W^2 - (W - D)^2 = W D + D W - D^2, where W D = (D W)^T because
+        # both matrices are symmetric
+        product = delta @ weighted
+        delta_square = sp.csr_matrix(product + product.T - delta @ delta)
+        _remove_diagonal(delta_square)
+        if key == "square":
+            return _patched(matrix, delta_square)
+        # Weighted plus decayed square in `TWO_HOP` mode
+        return _patched(matrix, sp.csr_matrix(delta + key[1] * delta_square))
+
+    def add_edge(self, source, target, weight=1):
+        """Add an edge or change its weight; see `set_edges`."""
+        self.set_edges([source], [target], weight)
+
+    def remove_edge(self, source, target):
+        """Remove an edge; see `set_edges`."""
+        self.set_edges([source], [target], 0)
+
+    def set_feature(self, node, feature, value=1):
+        """
+        Set the value of the node's feature.
+
+        Instead of being recomputed, cached scores of nodes to which the
+        `node` contributes are updated: only the score for the `feature` is
+        recomputed (from the node's neighbours' values of this feature), so
+        that rounding errors do not accumulate as with adding differences.
+        The attached `index` is updated for these nodes (except in
+        `PAGERANK` and `SIMILAR` mode, where it is detached). Similarities
+        for `SIMILAR` mode are recomputed when they are needed.
+        """
+        if isinstance(self.features, BitMatrix):
+            value = int(value != 0)
+        old = float(self._feature_value(node, feature))
+        value = float(value)
+        if value == old:
+            return
+        self._write_feature(node, feature, value)
+
+        popularity = self._matrices.get("popularity")
+        if popularity is not None and (old == 0) != (value == 0):
+            # copy, because callers may hold the previous array
+            popularity = popularity.copy()
+            popularity[feature] += 1 if old == 0 else -1
+            self._matrices["popularity"] = popularity
+        # Similarities are recomputed when needed
+        for key in list(self._matrices):
+            if key[0] == "similar":
+                del self._matrices[key]
+
+        self.cache.discard(
+            lambda key: key[1] == SIMILAR
+            or key[3] == "scores" and key[2] != self.mode_params(key[1]))
+        for key, scores in self.cache.items():
+            if key[0] != self.version or key[3] != "scores":
+                continue
+            indices, weights = self._row(key[-1], key[1])
+            if np.any(indices == node):
+                scores = scores.copy()
+                scores[feature] = \
+                    weights @ self._feature_column(indices, feature)
+                self.cache.put(key, scores)
+
+        if self.index is None:
+            return
+        # The node contributes to its neighbours (and, in `TWO_HOP` mode, to
+        # their neighbours); these are found without scoring matrices, which
+        # may not have been computed or may have pending changes
+        affected = np.union1d([node], self.neighbours(node))
+        if self.index.mode == TWO_HOP:
+            affected = np.union1d(
+                affected, self.neighbourhood[affected].indices)
+        self._update_index({mode: affected
+                            for mode in (COUNT, WEIGHTED, TWO_HOP)})
+
+    def _feature_column(self, nodes, feature):
+        features = self.features
+        if isinstance(features, BitMatrix):
+            return features.column(feature, nodes)
+        if sp.issparse(features):
+            return features[nodes, feature].toarray().ravel()
+        return features[nodes, feature]
+
+    def _feature_value(self, node, feature):
+        if isinstance(self.features, BitMatrix):
+            return self.features.column(feature, node)
+        return self.features[node, feature]
+
+    def _write_feature(self, node, feature, value):
+        # Memory-mapped features are copied on the first change
+        features = self.features
+        if isinstance(features, BitMatrix):
+            if not features.bits.flags.writeable:
+                features = self.features = \
+                    BitMatrix(np.array(features.bits), features.n_cols)
+            features.set(node, feature, value)
+        elif sp.issparse(features):
+            if not features.data.flags.writeable:
+                features = self.features = features.copy()
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", sp.SparseEfficiencyWarning)
+                features[node, feature] = value
+        else:
+            if not features.flags.writeable:
+                features = self.features = np.array(features)
+            features[node, feature] = value
+
+    def _update_index(self, affected):
+        # `affected` maps modes to nodes whose recommendations changed;
+        # indices for other modes, or computed with other parameters, are
+        # detached
+        index = self.index
+        if index is None:
+            return
+        if index.mode in affected \
+                and index.params == self.mode_params(index.mode):
+            if len(affected[index.mode]):
+                index.update(self, affected[index.mode])
+        else:
+            self.index = None
+
+    def mode_params(self, mode):
+        """Return the parameter that affects results in the given mode."""
+        return {TWO_HOP: self.decay, PAGERANK: self.alpha,
+                SIMILAR: self.n_similar}.get(mode)
+
+    def _cache_key(self, *args, mode):
+        return (self.version, mode, self.mode_params(mode)) + args
+
+    def _cached(self, key, compute):
+        if key not in self._matrices:
+            self._matrices[key] = compute()
+        elif key in self._deltas:
+            self._matrices[key] = self._updated(key, self._deltas.pop(key))
+        return self._matrices[key]
+
+    def _weighted(self):
+        weighted = self.adjacency
+        if self.directed:
+            weighted = weighted + weighted.T
+        return weighted.tocsr()
+
+    def _square(self):
+        square = self._times_weighted(self._cached("weighted", self._weighted))
+        # Paths that return to the node are not friends of friends
+        _remove_diagonal(square)
+        return square
+
+    def _times_weighted(self, rows):
+        # Returns `rows @ W` for rows of the weighted matrix W = A + A^T,
+        # computed from the adjacency A as `rows A + (A rows^T)^T`, so that
+        # `_scoring_rows` and whole matrices are summed in the same order
+        adjacency = self.adjacency
+        product = rows @ adjacency
+        if self.directed:
+            product = product + (adjacency @ rows.T).T
+        return sp.csr_matrix(product)
+
+    def _transition(self):
+        return self._normalized(self._cached("weighted", self._weighted))
+
+    @staticmethod
+    def _normalized(weighted):
+        # Divides rows by their sums
+        out_weights = np.asarray(weighted.sum(axis=1)).ravel()
+        out_weights[out_weights == 0] = 1
+        return sp.csr_matrix(sp.diags(1 / out_weights) @ weighted)
+
+    @property
+    def n_nodes(self):
+        return self.adjacency.shape[0]
+
+    @property
+    def n_features(self):
+        return self.features.shape[1]
+
+    @property
+    def popularity(self):
+        """The number of nodes that have each feature; breaks ties."""
+        return self._cached("popularity", self._popularity)
+
+    def _popularity(self):
+        features = self.features
+        if isinstance(features, BitMatrix):
+            return features.column_counts()
+        if sp.issparse(features):
+            return np.bincount(features.indices[features.data != 0],
+                               minlength=self.n_features)
+        return np.count_nonzero(features, axis=0)
+
+    def neighbours(self, node):
+        """Return sorted indices of nodes connected to `node`."""
+        matrix = self.neighbourhood
+        return matrix.indices[matrix.indptr[node]:matrix.indptr[node + 1]]
+
+    def friends(self, node, k=None):
+        """
+        Return targets of edges from `node` and the edge weights, sorted
+        by decreasing weights. If `k` is given, return only the first `k`.
+        """
+        with stage(NEIGHBOURS):
+            return self._by_weight(self.adjacency, node, k)
+
+    def followers(self, node, k=None):
+        """Like `friends`, but for edges that lead into the `node`."""
+        if not self.directed:
+            return self.friends(node, k)
+        with stage(NEIGHBOURS):
+            return self._by_weight(self.in_adjacency, node, k)
+
+    @staticmethod
+    def _by_weight(matrix, node, k):
+        fr, to = matrix.indptr[node], matrix.indptr[node + 1]
+        indices, weights = matrix.indices[fr:to], matrix.data[fr:to]
+        if k is not None and k < len(weights):
+            top = np.argpartition(-weights, k - 1)[:k]
+            indices, weights = indices[top], weights[top]
+        order = np.lexsort((indices, -weights))
+        return indices[order], weights[order]
+
+    def _row(self, node, mode):
+        return self.cache.get(self._cache_key("row", node, mode=mode),
+                              lambda: self._compute_row(node, mode))
+
+    def _compute_row(self, node, mode):
+        if mode == PAGERANK:
+            visits = self._contributions([node], mode)
+            return visits.indices, visits.data
+        matrix = self.scoring_matrix(mode)
+        fr, to = matrix.indptr[node], matrix.indptr[node + 1]
+        return matrix.indices[fr:to], matrix.data[fr:to]
+
+    def scores(self, node, mode=COUNT):
+        """
+        Return scores of features for the `node`; in `COUNT` mode, this is
+        the number of neighbours that have each feature.
+
+        Scores are cached in `cache`; `set_feature` updates cached scores
+        instead of discarding them.
+        """
+        return self.cache.get(self._cache_key("scores", node, mode=mode),
+                              lambda: self._compute_scores(node, mode))
+
+    def _compute_scores(self, node, mode):
+        indices, weights = self._row(node, mode)
+        return self._weighted_sum(indices, weights)
+
+    # Methods that access features of multiple nodes, which can be stored
+    # as a dense array, a CSR matrix or a BitMatrix
+
+    def _weighted_sum(self, indices, weights):
+        features = self.features
+        if isinstance(features, BitMatrix):
+            return features.column_counts(indices, weights)
+        if sp.issparse(features):
+            return np.asarray(features[indices].T @ weights).ravel()
+        return weights @ features[indices]
+
+    def _dot(self, matrix):
+        # Returns a dense (len(matrix) x n_features) matrix
+        features = self.features
+        if isinstance(features, BitMatrix):
+            return features.rmatmul(matrix)
+        product = matrix @ features
+        if sp.issparse(product):
+            product = product.toarray()
+        return np.asarray(product, dtype=float)
+
+    def _owned(self, nodes):
+        # Returns (row, column) indices of features that `nodes` have
+        if sp.issparse(self.features):
+            owned = self.features[nodes].tocoo()
+            mask = owned.data != 0
+            return owned.row[mask], owned.col[mask]
+        return np.nonzero(self.features[nodes])
+
+    def _has_feature(self, nodes, feature):
+        # `feature` is a single index or an array with an index for each node
+        if sp.issparse(self.features):
+            if not np.size(nodes):
+                # scipy returns a sparse matrix for empty fancy indices
+                return np.zeros(0, dtype=bool)
+            feature = np.broadcast_to(feature, np.shape(nodes))
+            return np.asarray(self.features[nodes, feature]).ravel() != 0
+        return self.features[nodes, feature] != 0
+
+    def recommend(self, node, k=5, mode=COUNT):
+        """
+        Return indices of the `k` best features for the `node` and their
+        scores, in decreasing order of scores. Features that the node
+        already has are excluded, and ties are broken by `popularity`.
+
+        Results are read from the attached `index` if it covers the mode
+        and `k`, and are otherwise computed from cached `scores`.
+        """
+        count("recommendations")
+        if self.use_index(k, mode):
+            count("index lookups")
+            return self.index.recommend(node, k)
+        with stage(SCORING):
+            scores = self.scores(node, mode)
+        with stage(TOP_K):
+            _, owned = self._owned([node])
+            return top_k(scores, k, owned, self.popularity)
+
+    def recommend_nodes(self, nodes, k=5, mode=COUNT):
+        """
+        Return the `k` best features for each of the given nodes, excluding
+        features that the node already has.
+
+        The result are two arrays of shape (len(nodes), k) with features and
+        their scores, sorted by decreasing scores in each row, with ties
+        broken as in `recommend`. Rows of nodes with fewer than `k` features
+        to recommend are padded with feature -1 and score `-inf`.
+        """
+        nodes = np.asarray(nodes, dtype=int)
+        count("recommendations", len(nodes))
+        with stage(SCORING):
+            scores = self._dot(self._contributions(nodes, mode))
+        with stage(TOP_K):
+            scores[self._owned(nodes)] = -np.inf
+            return top_k_rows(scores, k, self.popularity)
+
+    def iter_recommend_all(self, k=5, mode=COUNT, chunk_size=1024):
+        """
+        Compute recommendations for all nodes in blocks of `chunk_size`
+        nodes, so that at most `chunk_size` x n_features scores are kept in
+        memory at once.
+
+        Yields tuples `(start, features, scores)`, where `start` is the index
+        of the first node in the block and the other two elements are as in
+        `recommend_nodes`.
+        """
+        for start in range(0, self.n_nodes, chunk_size):
+            nodes = np.arange(start, min(start + chunk_size, self.n_nodes))
+            yield (start, *self.recommend_nodes(nodes, k, mode))
+
+    def recommend_all(self, k=5, mode=COUNT, chunk_size=1024):
+        """
+        Return recommendations for all nodes; see `recommend_nodes` for
+        description of the result.
+        """
+        features = np.empty((self.n_nodes, k), dtype=int)
+        scores = np.empty((self.n_nodes, k))
+        for start, chunk_features, chunk_scores \
+                in self.iter_recommend_all(k, mode, chunk_size):
+            end = start + len(chunk_features)
+            features[start:end] = chunk_features
+            scores[start:end] = chunk_scores
+        return features, scores
+
+    def batch_recommenders(self, nodes, features, mode=COUNT):
+        """
+        Return recommenders of the features recommended to the nodes.
+
+        `features` is an array of shape (len(nodes), k) as returned by
+        `recommend_nodes`. The result is a tuple `(offsets, recommenders)`:
+        recommenders of `features[i, j]` are
+        `recommenders[offsets[i * k + j]:offsets[i * k + j + 1]]`, sorted by
+        node indices.
+        """
+        nodes = np.asarray(nodes, dtype=int)
+        n_nodes, k = features.shape
+        contributions = self._contributions(nodes, mode).tocoo()
+        rows, cols = contributions.row, contributions.col
+        # Each contributing node is a candidate for all k slots of its row
+        slots = (rows[:, None] * k + np.arange(k)).ravel()
+        slot_features = features[rows].ravel()
+        candidates = np.repeat(cols, k)
+        valid = slot_features != -1
+        slots, slot_features, candidates = \
+            slots[valid], slot_features[valid], candidates[valid]
+        has = self._has_feature(candidates, slot_features)
+        slots, candidates = slots[has], candidates[has]
+        order = np.argsort(slots, kind="stable")
+        offsets = np.zeros(n_nodes * k + 1, dtype=np.int64)
+        np.cumsum(np.bincount(slots, minlength=n_nodes * k), out=offsets[1:])
+        return offsets, candidates[order]
+
+    def recommend_with_recommenders(self, node, k=5, mode=COUNT):
+        """
+        Return features and scores as `recommend`, and a list with an array
+        of recommenders for each feature.
+        """
+        if self.use_index(k, mode):
+            return self.index.lookup(node, k)
+        features, scores = self.recommend(node, k, mode)
+        with stage(NEIGHBOURS):
+            recommenders = [self.recommenders(node, feature, mode)
+                            for feature in features]
+        return features, scores, recommenders
+
+    def set_similarities(self, matrix):
+        """
+        Set the matrix of similarities for `SIMILAR` mode with the current
+        `n_similar`, e.g. one computed by another process and loaded with
+        `load_matrix`, instead of building a `SimilarityIndex`.
+        """
+        if matrix.shape != (self.n_nodes, self.n_nodes):
+            raise ValueError(
+                f"the matrix has shape {matrix.shape}, "
+                f"but the network has {self.n_nodes} nodes")
+        self._matrices[("similar", self.n_similar)] = sp.csr_matrix(matrix)
+
+    def set_index(self, index):
+        """
+        Set the precomputed index (e.g. loaded by `RecommendationIndex.load`),
+        which answers queries in its mode, if it was computed with the
+        current parameters of that mode.
+        """
+        if index is not None and index.n_nodes != self.n_nodes:
+            raise ValueError(
+                f"the index has {index.n_nodes} nodes, "
+                f"but the network has {self.n_nodes}")
+        self.index = index
+
+    def use_index(self, k, mode):
+        """
+        Tell whether the attached `index` answers queries for `k` features
+        in the given mode, that is, whether it covers `k` and was computed
+        with the current parameters of the mode.
+        """
+        index = self.index
+        return index is not None and index.mode == mode and k <= index.k \
+            and index.params == self.mode_params(mode)
+
+    def recommenders(self, node, feature, mode=COUNT):
+        """
+        Return nodes that contribute to the `node`'s score for the `feature`
+        in the given mode; in `COUNT` mode, these are neighbours that have
+        the feature.
+        """
+        indices, _ = self._row(node, mode)
+        return indices[self._has_feature(indices, feature)]
+
+    def sort_by_contribution(self, node, nodes, mode=COUNT):
+        """
+        Return `nodes` (e.g. `recommenders`) sorted by decreasing weights of
+        their contributions to the `node`'s scores, and by indices for ties;
+        nodes that do not contribute are put last.
+        """
+        nodes = np.asarray(nodes, dtype=int)
+        indices, weights = self._row(node, mode)
+        node_weights = np.full(len(nodes), -np.inf)
+        if len(indices):
+            order = np.argsort(indices)
+            indices, weights = indices[order], weights[order]
+            positions = np.searchsorted(indices, nodes).clip(
+                max=len(indices) - 1)
+            found = indices[positions] == nodes
+            node_weights[found] = weights[positions[found]]
+        return nodes[np.lexsort((nodes, -node_weights))]
@@ -0,0 +1,357 @@
+"""
+A local HTTP service with recommendations, based only on the standard
+library (asyncio).
+
+Endpoints:
+
+- `GET /recommend?node=...&k=...&mode=...`: recommendations for a node,
+  given by its index or name,
+- `POST /recommend` with a JSON body `{"nodes": [...], "k": ..., "mode": ...}`:
+  recommendations for multiple nodes,
+- `GET /stats`: the number of requests and batches, throughput and latency
+  percentiles.
+
+Requests that arrive within `window` seconds are coalesced into a single
+call of `Recommender.recommend_nodes`, which runs in a separate thread.
+If the recommender has an index for the requested mode (see `--index`),
+recommendations are looked up in the index instead.
+
+Example:
+
+    python -m orangecontrib.example.service network.net --port 8000
+
+    orange-recommend network.net --mode two-hop -o out.csv --index index
+    python -m orangecontrib.example.service network.net --index index
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from orangecontrib.example.index import RecommendationIndex
+from orangecontrib.example.recommend import Recommender, MODES, COUNT
+
+__all__ = ("RecommendationService", "LatencyStats", "main")
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LatencyStats:
+    """
+    Count requests and keep latencies of the last `size` requests, from
+    which percentiles are computed.
+    """
+    def __init__(self, size=10000):
+        self.latencies = deque(maxlen=size)
+        self.requests = 0
+        self.started = time.perf_counter()
+
+    def add(self, latency):
+        self.requests += 1
+        self.latencies.append(latency)
+
+    def percentile(self, q):
+        """Return the `q`-th percentile of latencies in milliseconds."""
+        if not self.latencies:
+            return None
+        return 1000 * float(np.percentile(self.latencies, q))
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return {"requests": self.requests,
+                "throughput": self.requests / elapsed if elapsed else 0,
+                "latency_p50_ms": self.percentile(50),
+                "latency_p99_ms": self.percentile(99)}
+
+
+class RecommendationService:
+    """
+    Serve recommendations of a recommender over HTTP.
+
+    Args:
+        recommender: recommender
+        node_names: names of nodes (optional); nodes can be given by names
+            and results contain names instead of indices
+        feature_names: names of features (optional)
+        mode: the default scoring mode
+        window: time (in seconds) for which requests are collected into
+            a batch
+        max_batch: the maximal number of nodes in a batch
+    """
+    def __init__(self, recommender: Recommender, node_names=None,
+                 feature_names=None, mode=COUNT, window=0.002,
+                 max_batch=1024):
+        self.recommender = recommender
+        self.node_names = node_names
+        self.feature_names = feature_names
+        self.node_index = None if node_names is None \
+            else {name: i for i, name in enumerate(node_names)}
+        self.mode = mode
+        self.window = window
+        self.max_batch = max_batch
+        self.stats = LatencyStats()
+        self.batches = self.batched_nodes = 0
+        self._pending = []
+        self._flush_handle = None
+        # The recommender is not thread-safe, so batches are computed
+        # one after another
+        self._executor = ThreadPoolExecutor(1)
+
+    async def start(self, host="127.0.0.1", port=8000):
+        """Start the server and return the `asyncio.Server`."""
+        return await asyncio.start_server(self._handle, host, port)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    async def recommend(self, node, k=5, mode=None):
+        """
+        Return recommendations for the node (given by index) as a dictionary
+        with keys `node`, `features`, `scores` and `recommenders`.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((node, k, mode or self.mode, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if pending:
+            asyncio.ensure_future(self._run_batch(pending))
+
+    async def _run_batch(self, pending):
+        loop = asyncio.get_running_loop()
+        by_mode = defaultdict(list)
+        for request in pending:
+            by_mode[request[2]].append(request)
+        for mode, requests in by_mode.items():
+            nodes = [node for node, *_ in requests]
+            k = max(k for _, k, *_ in requests)
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self._compute, nodes, k, mode)
+            except Exception as exc:  # pylint: disable=broad-except
+                for *_, future in requests:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.batched_nodes += len(nodes)
+            for (_, k, _, future), result in zip(requests, results):
+                if not future.done():
+                    future.set_result(
+                        {key: value[:k] if isinstance(value, list) else value
+                         for key, value in result.items()})
+
+    def _compute(self, nodes, k, mode):
+        rec = self.recommender
+        if rec.use_index(k, mode):
+            return [self._result(node, *rec.index.lookup(node, k))
+                    for node in nodes]
+        features, scores = rec.recommend_nodes(nodes, k, mode)
+        offsets, recommenders = rec.batch_recommenders(nodes, features, mode)
+        results = []
+        for i, node in enumerate(nodes):
+            valid = features[i] != -1
+            slots = i * k + np.flatnonzero(valid)
+            results.append(self._result(
+                node, features[i][valid], scores[i][valid],
+                [recommenders[offsets[slot]:offsets[slot + 1]]
+                 for slot in slots]))
+        return results
+
+    def _result(self, node, features, scores, recommenders):
+        return {
+            "node": self._name(self.node_names, node),
+            "features": [self._name(self.feature_names, feature)
+                         for feature in features],
+            "scores": scores.tolist(),
+            "recommenders": [[self._name(self.node_names, other)
+                              for other in nodes]
+                             for nodes in recommenders]}
+
+    @staticmethod
+    def _name(names, index):
+        return int(index) if names is None else str(names[index])
+
+    def _node(self, node):
+        if isinstance(node, str) and self.node_index is not None \
+                and node in self.node_index:
+            return self.node_index[node]
+        try:
+            node = int(node)
+        except (TypeError, ValueError):
+            raise RequestError(404, f"unknown node: {node}") from None
+        if not 0 <= node < self.recommender.n_nodes:
+            raise RequestError(404, f"unknown node: {node}")
+        return node
+
+    def _params(self, k, mode):
+        try:
+            k = int(k)
+        except (TypeError, ValueError):
+            raise RequestError(400, f"invalid k: {k}") from None
+        if k < 1:
+            raise RequestError(400, f"invalid k: {k}")
+        mode = mode or self.mode
+        if mode not in MODES:
+            raise RequestError(400, f"unknown mode: {mode}")
+        return k, mode
+
+    async def _dispatch(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == "/stats":
+            if method != "GET":
+                raise RequestError(405, "use GET")
+            return {**self.stats.summary(),
+                    "batches": self.batches,
+                    "batched_nodes": self.batched_nodes}
+        if url.path != "/recommend":
+            raise RequestError(404, f"unknown path: {url.path}")
+        if method == "GET":
+            query = {name: values[-1]
+                     for name, values in parse_qs(url.query).items()}
+            if "node" not in query:
+                raise RequestError(400, "missing parameter: node")
+            k, mode = self._params(query.get("k", 5), query.get("mode"))
+            return await self.recommend(self._node(query["node"]), k, mode)
+        if method == "POST":
+            try:
+                request = json.loads(body or b"{}")
+                nodes = request["nodes"]
+            except (ValueError, KeyError, TypeError):
+                raise RequestError(
+                    400, "body must be a JSON object with 'nodes'") from None
+            if not isinstance(nodes, list):
+                raise RequestError(400, "'nodes' must be a list")
+            k, mode = self._params(request.get("k", 5), request.get("mode"))
+            nodes = [self._node(node) for node in nodes]
+            results = await asyncio.gather(
+                *(self.recommend(node, k, mode) for node in nodes))
+            return {"results": list(results)}
+        raise RequestError(405, "use GET or POST")
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if not header.strip():
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(
+                    int(headers.get("content-length", 0)))
+
+                started = time.perf_counter()
+                try:
+                    method, target, _ = line.decode("latin-1").split()
+                    status, payload = \
+                        200, await self._dispatch(method, target, body)
+                except RequestError as exc:
+                    status, payload = exc.status, {"error": str(exc)}
+                except ValueError:
+                    status, payload = 400, {"error": "malformed request"}
+                except Exception as exc:  # pylint: disable=broad-except
+                    status, payload = 500, {"error": str(exc)}
+                self.stats.add(time.perf_counter() - started)
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                data = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                     "Content-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\n"
+                     + ("" if keep_alive else "Connection: close\r\n")
+                     + "\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def main(argv=None):
+    from orangecontrib.example.cli import load_network
+
+    parser = argparse.ArgumentParser(
+        description="Serve recommendations over HTTP.")
+    parser.add_argument(
+        "network",
+        help="Pajek file or a directory with a snapshot of the network")
+    parser.add_argument("--table", help="file with node features")
+    parser.add_argument("--name-column", help="attribute with node names")
+    parser.add_argument("--mode", choices=MODES, default=None,
+                        help="the default scoring mode (default: the mode "
+                             "of the index, if given, or count)")
+    parser.add_argument("--decay", type=float, default=0.5)
+    parser.add_argument("--alpha", type=float, default=0.85)
+    parser.add_argument(
+        "--index",
+        help="directory with the index of recommendations, saved by "
+             "orange-recommend --index")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--window", type=float, default=2,
+                        help="batching window in milliseconds")
+    args = parser.parse_args(argv)
+
+    data = load_network(args.network, args.table, args.name_column)
+    recommender = Recommender.from_feature_network(
+        data, decay=args.decay, alpha=args.alpha)
+    mode = args.mode
+    if args.index is not None:
+        index = RecommendationIndex.load(args.index)
+        try:
+            recommender.set_index(index)
+        except ValueError as exc:
+            parser.error(f"{args.index}: {exc}")
+        if index.params != recommender.mode_params(index.mode):
+            parser.error(f"{args.index}: the index was computed with "
+                         f"different parameters of mode {index.mode}")
+        mode = mode or index.mode
+    service = RecommendationService(
+        recommender, data.node_names, data.feature_names, mode or COUNT,
+        args.window / 1000)
+
+    async def serve():
+        server = await service.start(args.host, args.port)
+        print(f"Serving on http://{args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
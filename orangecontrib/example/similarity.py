@@ -0,0 +1,234 @@
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.example.bitset import BitMatrix
+from orangecontrib.example.topk import top_k_rows
+
+__all__ = ("SimilarityIndex", "minhash_signatures", "candidate_pairs",
+           "pair_similarities", "JACCARD", "COSINE")
+
+JACCARD = "jaccard"  # |A & B| / |A | B| of sets of nonzero features
+COSINE = "cosine"  # cosine of the angle between feature vectors
+METRICS = (JACCARD, COSINE)
+
+# Mersenne prime for universal hashing; products of values below it fit
+# into int64
+_PRIME = (1 << 31) - 1
+
+
+def _feature_csr(features, block_size=1 << 16):
+    # Returns features as CSR, unpacking BitMatrix in blocks of rows
+    if isinstance(features, BitMatrix):
+        return sp.vstack(
+            [sp.csr_matrix(features[start:start + block_size])
+             for start in range(0, max(len(features), 1), block_size)],
+            format="csr")
+    # Copy, so that pruning does not modify (possibly read-only) input
+    matrix = sp.csr_matrix(features, dtype=float, copy=True)
+    matrix.eliminate_zeros()
+    return matrix
+
+
+def minhash_signatures(features, n_hashes=96, seed=0, block_size=4096):
+    """
+    Return MinHash signatures (n_nodes x n_hashes) of sets of nonzero
+    features of nodes.
+
+    The probability that two nodes have the same value at a position of
+    the signature equals the Jaccard similarity of their sets. Rows without
+    features have the maximal value at all positions.
+    """
+    features = _feature_csr(features)
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, n_hashes)
+    b = rng.integers(0, _PRIME, n_hashes)
+    feature_hashes = \
+        (np.arange(features.shape[1])[:, None] * a + b) % _PRIME
+    signatures = np.full((features.shape[0], n_hashes), _PRIME,
+                         dtype=np.int64)
+    indptr = features.indptr
+    for start in range(0, features.shape[0], block_size):
+        end = min(start + block_size, features.shape[0])
+        nonempty = start + np.flatnonzero(np.diff(indptr[start:end + 1]))
+        if not len(nonempty):
+            continue
+        hashes = feature_hashes[features.indices[indptr[start]:indptr[end]]]
+        signatures[nonempty] = np.minimum.reduceat(
+            hashes, indptr[nonempty] - indptr[start], axis=0)
+    return signatures
+
+
+def candidate_pairs(signatures, bands=32, max_bucket=64):
+    """
+    Return pairs of nodes (as two arrays, with `first < second`) whose
+    signatures agree in all positions of at least one band.
+
+    Nodes in each band are sorted by the hash of the band; each node is
+    paired with the following `max_bucket - 1` nodes in the same bucket,
+    which bounds the number of pairs for large buckets. Nodes without
+    features are not paired.
+    """
+    n, n_hashes = signatures.shape
+    rows = n_hashes // bands
+    nonempty = np.flatnonzero(signatures[:, 0] != _PRIME)
+    multipliers = np.random.default_rng(0).integers(
+        1, 1 << 62, rows).astype(np.uint64)
+    # Pairs are merged after each band, so memory is proportional to the
+    # number of distinct pairs, not to the number of bands
+    found = np.empty(0, dtype=np.int64)
+    for band in range(bands):
+        pairs = []
+        keys = signatures[nonempty, band * rows:(band + 1) * rows]
+        bucket = (keys.astype(np.uint64) * multipliers).sum(
+            axis=1, dtype=np.uint64)
+        order = np.argsort(bucket, kind="stable")
+        bucket, nodes = bucket[order], nonempty[order]
+        for shift in range(1, min(max_bucket, len(nodes))):
+            same = np.flatnonzero(bucket[shift:] == bucket[:-shift])
+            if not len(same):
+                break
+            first, second = nodes[same], nodes[same + shift]
+            pairs.append(np.minimum(first, second).astype(np.int64) * n
+                         + np.maximum(first, second))
+        if pairs:
+            found = _sorted_unique(np.concatenate([found] + pairs))
+    return (found // n).astype(np.int32), (found % n).astype(np.int32)
+
+
+def _sorted_unique(values):
+    # Like np.unique, which is much slower for large arrays in some versions
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))]
+
+
+def pair_similarities(features, first, second, metric=JACCARD,
+                      block_size=1 << 20):
+    """Return similarities of pairs of nodes, computed in blocks of pairs."""
+    if metric not in METRICS:
+        raise ValueError(f"unknown metric '{metric}'")
+    features = _feature_csr(features)
+    if metric == JACCARD:
+        features.data = np.ones_like(features.data)
+        norms = np.diff(features.indptr).astype(float)
+    else:
+        norms = np.sqrt(np.asarray(
+            features.multiply(features).sum(axis=1)).ravel())
+    similarities = np.empty(len(first))
+    for start in range(0, len(first), block_size):
+        fr, to = first[start:start + block_size], \
+            second[start:start + block_size]
+        common = np.asarray(
+            features[fr].multiply(features[to]).sum(axis=1)).ravel()
+        if metric == JACCARD:
+            union = norms[fr] + norms[to] - common
+        else:
+            union = norms[fr] * norms[to]
+        union[union == 0] = 1
+        similarities[start:start + block_size] = common / union
+    return similarities
+
+
+class SimilarityIndex:
+    """
+    The `k` most similar nodes of each node, by similarity of their
+    features.
+
+    `matrix` is a CSR matrix whose row for a node contains similarities
+    of its most similar nodes; nodes are not similar to themselves and
+    similarities of zero are not stored.
+
+    Args:
+        matrix: sparse matrix with similarities
+        metric: similarity metric (`JACCARD` or `COSINE`)
+    """
+    def __init__(self, matrix, metric=JACCARD):
+        self.matrix = sp.csr_matrix(matrix)
+        self.metric = metric
+
+    @classmethod
+    def build(cls, features, k=10, metric=JACCARD, exact=False,
+              n_hashes=96, bands=32, max_bucket=64, seed=0,
+              block_size=1024):
+        """
+        Find the `k` most similar nodes for each node.
+
+        By default, candidates for similar nodes are pairs of nodes whose
+        MinHash signatures (`n_hashes` values) agree in at least one of the
+        `bands`, so time is sub-quadratic in the number of nodes and
+        similar nodes may be missed with a probability that decreases with
+        similarity. Similarities of candidates are then computed exactly.
+        Candidates for `COSINE` also come from MinHash of sets of nonzero
+        features.
+
+        If `exact` is set, similarities between all pairs are computed
+        from sparse products of blocks of `block_size` rows.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"unknown metric '{metric}'")
+        features = _feature_csr(features)
+        n = features.shape[0]
+        if exact:
+            return cls(cls._exact(features, k, metric, block_size), metric)
+
+        first, second = candidate_pairs(
+            minhash_signatures(features, n_hashes, seed), bands, max_bucket)
+        similarities = pair_similarities(features, first, second, metric)
+        nonzero = similarities > 0
+        first, second, similarities = \
+            first[nonzero], second[nonzero], similarities[nonzero]
+        rows = np.concatenate((first, second))
+        cols = np.concatenate((second, first))
+        del first, second
+        similarities = np.concatenate((similarities, similarities))
+
+        # Keep the k most similar for each node; ties by smaller index
+        order = np.lexsort((cols, -similarities, rows))
+        rows, cols, similarities = \
+            rows[order], cols[order], similarities[order]
+        starts = np.searchsorted(rows, np.arange(n))
+        keep = np.arange(len(rows)) - starts[rows] < k
+        return cls(sp.csr_matrix(
+            (similarities[keep], (rows[keep], cols[keep])), shape=(n, n)),
+            metric)
+
+    @staticmethod
+    def _exact(features, k, metric, block_size):
+        n = features.shape[0]
+        if metric == JACCARD:
+            features.data = np.ones_like(features.data)
+            norms = np.diff(features.indptr).astype(float)
+        else:
+            norms = np.sqrt(np.asarray(
+                features.multiply(features).sum(axis=1)).ravel())
+        transposed = features.T.tocsc()
+        rows, cols, data = [], [], []
+        for start in range(0, n, block_size):
+            nodes = np.arange(start, min(start + block_size, n))
+            common = np.asarray((features[nodes] @ transposed).todense())
+            if metric == JACCARD:
+                union = norms[nodes, None] + norms - common
+            else:
+                union = norms[nodes, None] * norms
+            union[union == 0] = 1
+            similarities = common / union
+            similarities[similarities == 0] = -np.inf
+            similarities[np.arange(len(nodes)), nodes] = -np.inf
+            indices, values = top_k_rows(similarities, k)
+            valid = indices != -1
+            rows.append(np.repeat(nodes, valid.sum(axis=1)))
+            cols.append(indices[valid])
+            data.append(values[valid])
+        rows, cols, data = (np.concatenate(x) if x else np.empty(0)
+                            for x in (rows, cols, data))
+        return sp.csr_matrix((data, (rows, cols)), shape=(n, n))
+
+    def similar(self, node):
+        """
+        Return nodes most similar to the `node` and their similarities,
+        sorted by decreasing similarity.
+        """
+        matrix = self.matrix
+        fr, to = matrix.indptr[node], matrix.indptr[node + 1]
+        nodes, similarities = matrix.indices[fr:to], matrix.data[fr:to]
+        order = np.lexsort((nodes, -similarities))
+        return nodes[order], similarities[order]
@@ -0,0 +1,164 @@
+import json
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.example.bitset import BitMatrix
+from orangecontrib.example.readwrite import FeatureNetwork
+
+__all__ = ("PackedStrings", "save_snapshot", "load_snapshot",
+           "save_matrix", "load_matrix")
+
+FORMAT_VERSION = 1
+
+
+class PackedStrings:
+    """
+    A read-only sequence of strings, stored as concatenated utf-8 bytes and
+    offsets into them (in the same way as CSR matrices store rows), so that
+    it can be memory mapped.
+
+    Indexing with an integer returns a string; indexing with a slice, mask
+    or an array of indices returns an array of objects.
+    """
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [str(s).encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _get(self, index):
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]]) \
+            .decode("utf-8")
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self._get(range(len(self))[index])
+        indices = np.arange(len(self))[index]
+        result = np.empty(len(indices), dtype=object)
+        result[:] = [self._get(i) for i in indices]
+        return result
+
+    def __iter__(self):
+        return (self._get(i) for i in range(len(self)))
+
+    def __array__(self, dtype=None, copy=None):
+        return self[:].astype(dtype or object)
+
+
+def save_snapshot(directory, data: FeatureNetwork):
+    """
+    Save the network as a directory of `.npy` files that can be opened by
+    `load_snapshot` with memory mapping.
+    """
+    os.makedirs(directory, exist_ok=True)
+    adjacency = sp.csr_matrix(data.adjacency)
+    adjacency.sum_duplicates()
+    arrays = {
+        "indptr": adjacency.indptr,
+        "indices": adjacency.indices,
+        "weights": adjacency.data}
+    features = data.features
+    if isinstance(features, BitMatrix):
+        feature_format = "bits"
+        arrays["feature_bits"] = features.bits
+    elif sp.issparse(features):
+        feature_format = "sparse"
+        features = sp.csr_matrix(features)
+        features.sum_duplicates()
+        arrays.update({"features_indptr": features.indptr,
+                       "features_indices": features.indices,
+                       "features_data": features.data})
+    else:
+        feature_format = "dense"
+        arrays["features"] = np.ascontiguousarray(features)
+    for name, strings in (("node_names", data.node_names),
+                          ("feature_names", data.feature_names)):
+        if strings is None:
+            continue
+        if not isinstance(strings, PackedStrings):
+            strings = PackedStrings.from_strings(strings)
+        arrays[name] = strings.data
+        arrays[name + "_offsets"] = strings.offsets
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, name + ".npy"), array)
+    with open(os.path.join(directory, "meta.json"), "wt") as f:
+        json.dump({"format": FORMAT_VERSION,
+                   "n_nodes": adjacency.shape[0],
+                   "n_features": features.shape[1],
+                   "feature_format": feature_format,
+                   "directed": bool(data.directed)}, f)
+
+
+def load_snapshot(directory, mmap_mode="r") -> FeatureNetwork:
+    """
+    Load the network saved by `save_snapshot`.
+
+    With the default `mmap_mode`, arrays are memory mapped read-only: the
+    network opens without reading the data, and processes that load the
+    same snapshot share the memory pages.
+    """
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT_VERSION:
+        raise ValueError(f"unsupported snapshot format: {meta.get('format')}")
+
+    def load(name):
+        path = os.path.join(directory, name + ".npy")
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode=mmap_mode)
+
+    def load_strings(name):
+        data = load(name)
+        return data if data is None \
+            else PackedStrings(data, load(name + "_offsets"))
+
+    n = meta["n_nodes"]
+    adjacency = sp.csr_matrix(
+        (load("weights"), load("indices"), load("indptr")), shape=(n, n))
+    if meta["feature_format"] == "bits":
+        features = BitMatrix(load("feature_bits"), meta["n_features"])
+    elif meta["feature_format"] == "sparse":
+        features = sp.csr_matrix(
+            (load("features_data"), load("features_indices"),
+             load("features_indptr")), shape=(n, meta["n_features"]))
+    else:
+        features = load("features")
+    return FeatureNetwork(adjacency, features,
+                          load_strings("node_names"),
+                          load_strings("feature_names"), meta["directed"])
+
+
+def save_matrix(directory, name, matrix):
+    """
+    Save a sparse matrix (e.g. a matrix derived from a snapshot's network)
+    as `.npy` files with prefix `name`, which `load_matrix` memory maps.
+    """
+    os.makedirs(directory, exist_ok=True)
+    matrix = sp.csr_matrix(matrix)
+    for part, array in (("indptr", matrix.indptr),
+                        ("indices", matrix.indices),
+                        ("data", matrix.data),
+                        ("shape", np.array(matrix.shape))):
+        np.save(os.path.join(directory, f"{name}_{part}.npy"), array)
+
+
+def load_matrix(directory, name, mmap_mode="r"):
+    """Load the CSR matrix saved by `save_matrix`."""
+    def load(part):
+        return np.load(os.path.join(directory, f"{name}_{part}.npy"),
+                       mmap_mode=mmap_mode)
+
+    return sp.csr_matrix((load("data"), load("indices"), load("indptr")),
+                         shape=tuple(load("shape")))
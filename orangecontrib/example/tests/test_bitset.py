@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.example.bitset import BitMatrix, popcount
+
+
+class TestBitMatrix(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.dense = (rng.random((10, 70)) < 0.3).astype(np.uint8)
+        self.bits = BitMatrix.from_dense(self.dense)
+
+    def test_popcount(self):
+        a = np.array([0, 1, 255, 2 ** 63 + 3], dtype=np.uint64)
+        np.testing.assert_equal(popcount(a), [0, 1, 8, 3])
+
+    def test_packing(self):
+        bits = self.bits
+        self.assertEqual(bits.shape, (10, 70))
+        self.assertEqual(bits.bits.shape, (10, 16))
+        self.assertEqual(bits.words.shape, (10, 2))
+        np.testing.assert_equal(bits.toarray(), self.dense)
+        np.testing.assert_equal(bits[[3, 1]], self.dense[[3, 1]])
+        np.testing.assert_equal(bits[[3, 1], 65], self.dense[[3, 1], 65])
+        np.testing.assert_equal(bits.nonzero_columns(2),
+                                np.flatnonzero(self.dense[2]))
+
+        np.testing.assert_equal(
+            BitMatrix.from_dense(sp.csr_matrix(self.dense)).bits, bits.bits)
+        self.assertRaises(ValueError, BitMatrix, bits.bits[:, :9], 70)
+
+    def test_set(self):
+        bits = self.bits
+        bits.set(4, 67, 1)
+        bits.set(4, 0, 0)
+        self.dense[4, 67] = 1
+        self.dense[4, 0] = 0
+        np.testing.assert_equal(bits.toarray(), self.dense)
+
+    def test_counts(self):
+        bits, dense = self.bits, self.dense
+        np.testing.assert_equal(bits.row_counts(), dense.sum(axis=1))
+        np.testing.assert_equal(
+            bits.intersection_counts(0, [1, 2]),
+            (dense[[1, 2]] & dense[0]).sum(axis=1))
+        np.testing.assert_equal(bits.column_counts(), dense.sum(axis=0))
+        np.testing.assert_equal(bits.column_counts([2, 5]),
+                                dense[[2, 5]].sum(axis=0))
+        np.testing.assert_almost_equal(
+            bits.column_counts([2, 5], np.array([0.5, 2])),
+            np.array([0.5, 2]) @ dense[[2, 5]])
+
+    def test_rmatmul(self):
+        matrix = sp.random(4, 10, density=0.3, format="csr", random_state=0)
+        np.testing.assert_almost_equal(
+            self.bits.rmatmul(matrix, block_size=3), matrix @ self.dense)
+        np.testing.assert_almost_equal(
+            self.bits.rmatmul(matrix.toarray()), matrix @ self.dense)
+
+
+if __name__ == "__main__":
+    unittest.main()
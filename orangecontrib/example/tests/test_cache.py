@@ -0,0 +1,49 @@
+import unittest
+
+from orangecontrib.example.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_get(self):
+        cache = LRUCache(2)
+        computed = []
+
+        def compute(x):
+            computed.append(x)
+            return 2 * x
+
+        self.assertEqual(cache.get(1, lambda: compute(1)), 2)
+        self.assertEqual(cache.get(2, lambda: compute(2)), 4)
+        self.assertEqual(cache.get(1, lambda: compute(1)), 2)
+        self.assertEqual(computed, [1, 2])
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+        # 2 is the least recently used
+        cache.get(3, lambda: compute(3))
+        self.assertIn(1, cache)
+        self.assertNotIn(2, cache)
+        self.assertEqual(len(cache), 2)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats(),
+                         {"size": 0, "maxsize": 2, "hits": 1, "misses": 3})
+
+    def test_put_discard(self):
+        cache = LRUCache(3)
+        for key in range(3):
+            cache.put(key, -key)
+        cache.put(0, 42)
+        self.assertEqual(cache.items(), [(1, -1), (2, -2), (0, 42)])
+        cache.discard(lambda key: key % 2 == 0)
+        self.assertEqual(cache.items(), [(1, -1)])
+
+    def test_disabled(self):
+        cache = LRUCache(0)
+        cache.get(1, lambda: 2)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.misses, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+from os.path import join, dirname
+
+import numpy as np
+
+from orangecontrib.example.cli import main, load_network, recommend_chunks
+from orangecontrib.example.index import RecommendationIndex
+from orangecontrib.example.recommend import Recommender, TWO_HOP, SIMILAR
+from orangecontrib.example.snapshot import save_snapshot
+
+NETWORKS = join(dirname(dirname(__file__)), "networks")
+NETWORK = join(NETWORKS, "node_features_weights.net")
+
+
+class TestCLI(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def read_output(self, filename):
+        with open(filename, encoding="utf-8") as f:
+            return list(csv.reader(f))
+
+    def test_recommend_chunks(self):
+        data = load_network(NETWORK)
+        save_snapshot(self.directory, data)
+        expected = Recommender.from_feature_network(data).recommend_all(
+            3, TWO_HOP)
+        for workers in (1, 2):
+            chunks = list(recommend_chunks(self.directory, 3, TWO_HOP,
+                                           workers=workers, chunk_size=5))
+            self.assertEqual([start for start, *_ in chunks],
+                             list(range(0, 23, 5)))
+            np.testing.assert_equal(
+                np.vstack([features for _, features, _ in chunks]),
+                expected[0])
+            np.testing.assert_almost_equal(
+                np.vstack([scores for *_, scores in chunks]), expected[1])
+
+    def test_recommend_chunks_similar(self):
+        data = load_network(NETWORK)
+        save_snapshot(self.directory, data)
+        expected = Recommender.from_feature_network(data).recommend_all(
+            3, SIMILAR)
+        chunks = list(recommend_chunks(self.directory, 3, SIMILAR,
+                                       workers=2, chunk_size=5))
+        np.testing.assert_equal(
+            np.vstack([features for _, features, _ in chunks]), expected[0])
+
+    def test_main(self):
+        output = join(self.directory, "out.csv")
+        main([NETWORK, "-k", "2", "-j", "2", "--chunk-size", "4",
+              "-o", output])
+        rows = self.read_output(output)
+        self.assertEqual(rows[0], ["node", "rank", "feature", "score"])
+        self.assertEqual(len(rows), 1 + 2 * 23)
+        features, scores = Recommender.from_feature_network(
+            load_network(NETWORK)).recommend_all(2)
+        self.assertEqual(rows[1], ["otrok 1", "1", str(features[0, 0]),
+                                   str(scores[0, 0])])
+        self.assertEqual(rows[4][:3], ["otrok 2", "2", str(features[1, 1])])
+
+    def test_table(self):
+        output = join(self.directory, "out.csv")
+        main([join(NETWORKS, "real_names_real_cartoons.net"),
+              "--table",
+              join(NETWORKS, "kids_cartoons_new_real_names_real_cartoons.xlsx"),
+              "-j", "1", "-o", output])
+        rows = self.read_output(output)
+        self.assertEqual(rows[1][:3], ["Ema Novak", "1", "Shrek"])
+
+    def test_snapshot_input(self):
+        save_snapshot(self.directory, load_network(NETWORK))
+        files = set(os.listdir(self.directory))
+        output = join(self.directory, "out.csv")
+        main([self.directory, "-k", "1", "-j", "1", "-o", output])
+        self.assertEqual(len(self.read_output(output)), 24)
+        # the snapshot is used as it is
+        self.assertEqual(set(os.listdir(self.directory)), files | {"out.csv"})
+
+    def test_index(self):
+        output = join(self.directory, "out.csv")
+        index_dir = join(self.directory, "index")
+        main([NETWORK, "-k", "3", "--mode", TWO_HOP, "--decay", "0.25",
+              "-j", "2", "--chunk-size", "4", "-o", output,
+              "--index", index_dir])
+        index = RecommendationIndex.load(index_dir)
+        rec = Recommender.from_feature_network(
+            load_network(NETWORK), decay=0.25)
+        expected = RecommendationIndex.build(rec, 3, TWO_HOP)
+        self.assertEqual((index.mode, index.params), (TWO_HOP, 0.25))
+        for name in ("features", "offsets", "recommenders"):
+            np.testing.assert_equal(getattr(index, name),
+                                    getattr(expected, name))
+        np.testing.assert_almost_equal(index.scores, expected.scores)
+
+    def test_parquet(self):
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        output = join(self.directory, "out.parquet")
+        main([NETWORK, "-k", "2", "-j", "1", "--chunk-size", "10",
+              "-o", output])
+        table = pyarrow.parquet.read_table(output)
+        self.assertEqual(table.num_rows, 46)
+        self.assertEqual(table.column_names,
+                         ["node", "rank", "feature", "score"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import tracemalloc
+import unittest
+from os.path import join, dirname
+from unittest.mock import patch
+
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.example.bitset import BitMatrix
+from orangecontrib.example.cli import load_network
+from orangecontrib.example.evaluate import \
+    split_features, ranking_metrics, evaluate_fold, evaluate, main
+from orangecontrib.example.readwrite import FeatureNetwork
+from orangecontrib.example.recommend import COUNT, TWO_HOP
+
+NETWORK = join(dirname(dirname(__file__)), "networks",
+               "node_features_weights.net")
+
+
+class TestEvaluate(unittest.TestCase):
+    def test_split_features(self):
+        features = np.zeros((4, 10), dtype=int)
+        features[0, :5] = features[1, :2] = features[2, 3] = 1
+        for matrix in (features, sp.csr_matrix(features),
+                       BitMatrix.from_dense(features)):
+            remaining, hidden = split_features(matrix, 0.4, seed=0)
+            remaining = remaining.toarray()
+            nodes, hidden_features = np.divmod(hidden, 10)
+            np.testing.assert_equal(nodes, [0, 0, 1])
+            self.assertTrue(np.all(features[nodes, hidden_features]))
+            self.assertFalse(np.any(remaining[nodes, hidden_features]))
+            remaining[nodes, hidden_features] = 1
+            np.testing.assert_equal(remaining, features)
+
+    def test_ranking_metrics(self):
+        # node 0 has hidden features 1 and 2, node 1 feature 4, node 2 none
+        hidden = np.array([1, 2, 9], dtype=np.int64)
+        recommended = np.array([[2, 3, 1], [0, 1, -1], [1, 2, 3]])
+        sums, n = ranking_metrics([0, 1, 2], recommended, hidden, 5)
+        self.assertEqual(n, 2)
+        self.assertAlmostEqual(sums["precision"], 2 / 3)
+        self.assertAlmostEqual(sums["recall"], 1)
+        ideal = 1 + 1 / np.log2(3)
+        self.assertAlmostEqual(sums["ndcg"], (1 + 0.5) / ideal)
+
+    def test_untraced_timing(self):
+        # allocations are traced only in the second, untimed pass
+        tracing = []
+
+        def metrics(*args):
+            tracing.append(tracemalloc.is_tracing())
+            return ranking_metrics(*args)
+
+        with patch("orangecontrib.example.evaluate.ranking_metrics",
+                   metrics):
+            evaluate_fold(load_network(NETWORK), COUNT, 3, chunk_size=10)
+        self.assertEqual(tracing, [False] * 3 + [True] * 3)
+
+    def test_evaluate(self):
+        data = load_network(NETWORK)
+        fold = evaluate_fold(data, COUNT, 3, seed=(0, 0))
+        self.assertTrue(0 <= fold["precision"] <= 1)
+        self.assertGreater(fold["memory"], 0)
+        single = evaluate(data, (COUNT, TWO_HOP), 3, folds=2, workers=1)
+        parallel = evaluate(data, (COUNT, TWO_HOP), 3, folds=2, workers=2)
+        self.assertEqual(list(single), [COUNT, TWO_HOP])
+        for mode in single:
+            for metric in ("precision", "recall", "ndcg"):
+                self.assertAlmostEqual(single[mode][metric],
+                                       parallel[mode][metric])
+        self.assertAlmostEqual(
+            single[COUNT]["ndcg"],
+            np.mean([evaluate_fold(data, COUNT, 3, seed=(0, fold))["ndcg"]
+                     for fold in range(2)]))
+
+    def test_sparse_features(self):
+        data = load_network(NETWORK)
+        sparse = FeatureNetwork(data.adjacency,
+                                sp.csr_matrix(data.features.toarray()),
+                                None, None, data.directed)
+        single = evaluate(data, (COUNT, ), 3, folds=1, workers=1)
+        parallel = evaluate(sparse, (COUNT, ), 3, folds=1, workers=2)
+        self.assertAlmostEqual(single[COUNT]["ndcg"], parallel[COUNT]["ndcg"])
+
+    def test_main(self):
+        with patch("builtins.print") as mock_print:
+            main([NETWORK, "-k", "2", "--folds", "1", "-j", "1",
+                  "--mode", COUNT])
+        lines = mock_print.call_args[0][0].splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(COUNT))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+from orangecontrib.example.generate import \
+    generate_features, generate_edges, generate_network
+from orangecontrib.example.recommend import Recommender
+
+
+class TestGenerate(unittest.TestCase):
+    def test_features(self):
+        clusters = np.arange(1000) % 4
+        features, returned = generate_features(
+            1000, 30, 6, clusters=clusters,
+            similarity=[(0, 0), (0.5, 0.5), (1, 1), (0.2, 0.6)],
+            seed=0, block_size=128)
+        np.testing.assert_equal(returned, clusters)
+        self.assertEqual(features.shape, (1000, 30))
+        np.testing.assert_equal(features.row_counts(), 6)
+
+        # Cluster 2 consists of identical nodes (equal to the center)
+        words = features.words
+        self.assertTrue(np.all(words[clusters == 2] == words[2]))
+        # Nodes of cluster 1 have 4 of 6 center features (the most common
+        # ones) and two others
+        rows = features[clusters == 1]
+        center = np.zeros(30, dtype=bool)
+        center[np.argsort(-rows.sum(axis=0), kind="stable")[:6]] = True
+        np.testing.assert_equal(rows[:, center].sum(axis=1), 4)
+
+    def test_features_seed(self):
+        first, clusters = generate_features(100, seed=42)
+        second, _ = generate_features(100, seed=42)
+        np.testing.assert_equal(first.bits, second.bits)
+        self.assertEqual(clusters.max(), 9)
+        self.assertRaises(ValueError, generate_features, 10, 8, 5)
+
+    def test_edges(self):
+        clusters = np.arange(500) % 10
+        adjacency = generate_edges(clusters, 4, within=1, seed=0)
+        self.assertEqual(abs(adjacency - adjacency.T).max(), 0)
+        self.assertEqual(adjacency.diagonal().sum(), 0)
+        rows, cols = adjacency.nonzero()
+        np.testing.assert_equal(clusters[rows], clusters[cols])
+        self.assertTrue(np.all((adjacency.data > 0) & (adjacency.data <= 1)))
+
+        adjacency = generate_edges(clusters, 4, within=0, directed=True,
+                                   seed=0)
+        self.assertGreater(abs(adjacency - adjacency.T).max(), 0)
+        self.assertLessEqual(adjacency.getnnz(axis=1).max(), 4)
+
+    def test_network(self):
+        data = generate_network(2000, seed=1)
+        self.assertEqual(data.adjacency.shape, (2000, 2000))
+        self.assertEqual(data.features.shape, (2000, 40))
+        self.assertFalse(data.directed)
+        rec = Recommender.from_feature_network(data)
+        features, _ = rec.recommend_all(3)
+        self.assertTrue(np.all(features[:, 0] != -1))
+
+
+if __name__ == "__main__":
+    unittest.main()
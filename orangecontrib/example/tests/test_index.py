@@ -0,0 +1,120 @@
+import shutil
+import tempfile
+import unittest
+from os.path import join, dirname
+
+import numpy as np
+
+from orangecontrib.example.index import RecommendationIndex
+from orangecontrib.example.readwrite import read_feature_pajek
+from orangecontrib.example.recommend import \
+    Recommender, COUNT, WEIGHTED, TWO_HOP, PAGERANK
+
+NETWORKS = join(dirname(dirname(__file__)), "networks")
+
+
+class TestRecommendationIndex(unittest.TestCase):
+    def setUp(self):
+        data = read_feature_pajek(join(NETWORKS, "node_features_weights.net"))
+        self.recommender = Recommender.from_feature_network(data)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def assert_matches(self, index, rec, mode, k=3):
+        for node in range(rec.n_nodes):
+            features, scores, recommenders = index.lookup(node, k)
+            exp_features, exp_scores, exp_recommenders = \
+                rec.recommend_with_recommenders(node, k, mode)
+            np.testing.assert_equal(features, exp_features)
+            np.testing.assert_almost_equal(scores, exp_scores)
+            self.assertEqual(len(recommenders), len(exp_recommenders))
+            for actual, expected in zip(recommenders, exp_recommenders):
+                np.testing.assert_equal(actual, expected)
+
+    def test_build(self):
+        rec = self.recommender
+        for mode in (COUNT, WEIGHTED, TWO_HOP, PAGERANK):
+            index = RecommendationIndex.build(rec, 3, mode, chunk_size=7)
+            self.assertEqual(index.k, 3)
+            self.assertEqual(index.n_nodes, rec.n_nodes)
+            self.assertEqual(index.params, rec.mode_params(mode))
+            self.assertEqual(index.offsets[-1], len(index.recommenders))
+            self.assert_matches(index, rec, mode)
+
+    def test_callback(self):
+        progress = []
+        RecommendationIndex.build(self.recommender, chunk_size=10,
+                                  callback=progress.append)
+        self.assertEqual(progress[-1], 1)
+        self.assertEqual(progress, sorted(progress))
+
+    def test_save_load(self):
+        rec = self.recommender
+        index = RecommendationIndex.build(rec, 3, TWO_HOP)
+        index.save(self.directory)
+        loaded = RecommendationIndex.load(self.directory)
+        self.assertIsInstance(loaded.recommenders, np.memmap)
+        self.assertEqual(loaded.mode, TWO_HOP)
+        self.assertEqual(loaded.params, rec.decay)
+        self.assert_matches(loaded, rec, TWO_HOP)
+
+    def test_update(self):
+        data = read_feature_pajek(join(NETWORKS, "node_features_weights.net"))
+        index = RecommendationIndex.build(
+            Recommender.from_feature_network(data), 3)
+        index.save(self.directory)
+        index = RecommendationIndex.load(self.directory)
+
+        # adding an edge changes neighbourhoods of its end points only
+        adjacency = data.adjacency.tolil()
+        adjacency[3, 17] = 1
+        rec = Recommender.from_feature_network(
+            data._replace(adjacency=adjacency.tocsr()))
+        index.update(rec, [17, 3])
+        self.assertEqual(index.offsets[-1], len(index.recommenders))
+        self.assert_matches(index, rec, COUNT)
+
+        # arrays that are not read-only are not copied
+        features, scores = index.features, index.scores
+        rec.add_edge(5, 17)
+        index.update(rec, [5, 17])
+        self.assertIs(index.features, features)
+        self.assertIs(index.scores, scores)
+        self.assert_matches(index, rec, COUNT)
+
+    def test_recommender_uses_index(self):
+        rec = self.recommender
+        rec.index = index = RecommendationIndex.build(rec, 3)
+        index.features = index.features.copy()
+        index.features[0, 0] = 39
+        self.assertEqual(rec.recommend(0, 2)[0][0], 39)
+        self.assertEqual(rec.recommend_with_recommenders(0, 3)[0][0], 39)
+        # a larger k, a different mode or different parameters are computed
+        self.assertNotEqual(rec.recommend(0, 5)[0][0], 39)
+        index.mode, index.params = TWO_HOP, rec.decay
+        self.assertEqual(rec.recommend(0, 3, TWO_HOP)[0][0], 39)
+        rec.decay = 0.25
+        self.assertNotEqual(rec.recommend(0, 3, TWO_HOP)[0][0], 39)
+
+        rec.invalidate()
+        self.assertIsNone(rec.index)
+
+    def test_set_index(self):
+        rec = self.recommender
+        index = RecommendationIndex.build(rec, 3)
+        rec.set_index(index)
+        self.assertIs(rec.index, index)
+        index.features = index.features[:-1]
+        self.assertRaises(ValueError, rec.set_index, index)
+        rec.set_index(None)
+        self.assertIsNone(rec.index)
+
+    def test_load_unsupported_format(self):
+        RecommendationIndex.build(self.recommender).save(self.directory)
+        with open(join(self.directory, "meta.json"), "wt") as f:
+            f.write('{"format": 42}')
+        self.assertRaises(ValueError, RecommendationIndex.load, self.directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
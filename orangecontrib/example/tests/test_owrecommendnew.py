@@ -0,0 +1,461 @@
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from os.path import join, dirname
+
+import numpy as np
+import scipy.sparse as sp
+
+from AnyQt.QtCore import QModelIndex
+from AnyQt.QtWidgets import QDoubleSpinBox
+
+from Orange.data import Table
+from Orange.widgets.tests.base import WidgetTest
+
+from orangecontrib.network.network.readwrite import read_pajek
+
+from orangecontrib.example import tracing
+from orangecontrib.example.index import RecommendationIndex
+from orangecontrib.example.readwrite import FeatureNetwork, to_network
+from orangecontrib.example.widgets.owRecommendNew import \
+    Recommendation, NodeListModel, PAGE_SIZE
+
+
+def kids_network():
+    path = join(dirname(dirname(__file__)), "networks")
+    network = read_pajek(join(path, "real_names_real_cartoons.net"))
+    network.nodes = Table(
+        join(path, "kids_cartoons_new_real_names_real_cartoons.xlsx"))
+    return network
+
+
+class TestNodeListModel(unittest.TestCase):
+    def test_lazy(self):
+        names = np.array([f"node {i}" for i in range(100000)], dtype=object)
+        model = NodeListModel(names, batch_size=100)
+        self.assertEqual(len(model), 100000)
+        self.assertEqual(model.rowCount(), 100)
+        self.assertTrue(model.canFetchMore(QModelIndex()))
+        model.fetchMore(QModelIndex())
+        self.assertEqual(model.rowCount(), 200)
+        self.assertEqual(model.data(model.index(150)), "node 150")
+
+        self.assertEqual(model.row_of("node 99999"), 99999)
+        self.assertEqual(model.indexOf("node 5000"), 5000)
+        self.assertEqual(model.rowCount(), 5001)
+        self.assertNotIn("node", model)
+        self.assertEqual(model.row_of(["unhashable"]), -1)
+
+    def test_duplicates(self):
+        model = NodeListModel(np.array(["a", "b", "a"], dtype=object))
+        self.assertEqual(model.row_of("a"), 0)
+
+    def test_filter(self):
+        names = np.array(["Ana", "Jan", "Janez", "Tilen", "Zala"],
+                         dtype=object)
+        model = NodeListModel(names)
+        model.set_filter("AN")
+        self.assertEqual(list(model), ["Ana", "Jan", "Janez"])
+        self.assertEqual(model.indexOf("Janez"), 2)
+        self.assertEqual(model.indexOf("Tilen"), -1)
+        self.assertEqual(model.row_of("Tilen"), 3)
+
+        # narrowing searches only the shown names
+        model._names = np.array(["Ana", "Jan", "Janez", "Janko", "Zala"],
+                                dtype=object)
+        model.set_filter("jan")
+        self.assertEqual(list(model), ["Jan", "Janez"])
+        model.set_filter("")
+        self.assertEqual(len(model), 5)
+
+        # searching does not change the model until matches are set
+        rows, complete = model.find("NEZ")
+        self.assertEqual(len(model), 5)
+        model.set_matches("NEZ", rows, complete)
+        self.assertEqual(list(model), ["Janez"])
+        self.assertEqual(model.row_at(0), 2)
+        self.assertEqual(model.position(2), 0)
+        self.assertEqual(model.position(1), -1)
+
+        model = NodeListModel(names, max_matches=1)
+        model.set_filter("a")
+        self.assertEqual(list(model), ["Ana"])
+        model.set_filter("al")
+        self.assertEqual(list(model), ["Zala"])
+
+
+class TestRecommendation(WidgetTest):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.network = kids_network()
+
+    def setUp(self):
+        self.widget = self.create_widget(Recommendation)
+
+    def test_recommendations(self):
+        widget = self.widget
+        self.send_signal(widget.Inputs.network, self.network)
+        self.wait_until_finished()
+        self.assertEqual(widget.selected_node, "Ema Novak")
+        self.assertEqual(
+            widget.friends_list_label.text(),
+            "Jan Horvat, Maja Čeh, Tim Bizjak, Zoja Leban, Tilen Novak")
+        # Ema already watched Hotel Transylvania and Moana
+        self.assertTrue(widget.rec.text().startswith(
+            "<dl><dt>Shrek</dt><dd> Lara Krajnc, Zoja Leban, Lana Kolar"))
+
+    def test_scoring_mode(self):
+        widget = self.widget
+        self.send_signal(widget.Inputs.network, self.network)
+        self.wait_until_finished()
+        self.assertFalse(widget.controls.decay.isEnabled())
+        count_text = widget.rec.text()
+        widget.controls.scoring.setCurrentIndex(2)
+        widget.controls.scoring.activated.emit(2)
+        self.wait_until_finished()
+        self.assertTrue(widget.controls.decay.isEnabled())
+        self.assertNotEqual(widget.rec.text(), count_text)
+
+        for index in (3, 4):
+            widget.controls.scoring.setCurrentIndex(index)
+            widget.controls.scoring.activated.emit(index)
+            self.wait_until_finished()
+            self.assertFalse(widget.controls.decay.isEnabled())
+            self.assertTrue(widget.rec.text().startswith("<dl><dt>"))
+
+    def test_sparse_features(self):
+        widget = self.widget
+        self.send_signal(widget.Inputs.network, self.network)
+        self.wait_until_finished()
+        features = widget.features_list_label.text()
+        recommendations = widget.rec.text()
+
+        network = kids_network()
+        network.nodes = network.nodes.to_sparse()
+        self.send_signal(widget.Inputs.network, network)
+        self.wait_until_finished()
+        self.assertTrue(sp.issparse(widget.recommender.features))
+        self.assertEqual(widget.features_list_label.text(), features)
+        self.assertEqual(widget.rec.text(), recommendations)
+
+    def test_precompute(self):
+        widget = self.widget
+        self.send_signal(widget.Inputs.network, self.network)
+        self.wait_until_finished()
+        recommendations = widget.rec.text()
+        self.assertIsNone(widget.recommender.index)
+
+        widget.controls.precompute.click()
+        self.wait_until_finished()
+        self.assertIsNotNone(widget.recommender.index)
+        self.assertEqual(widget.rec.text(), recommendations)
+
+    def test_load_index(self):
+        widget = self.widget
+        self.send_signal(widget.Inputs.network, self.network)
+        self.wait_until_finished()
+        recommendations = widget.rec.text()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        RecommendationIndex.build(widget.recommender, 5).save(directory)
+
+        widget.load_index(directory)
+        self.wait_until_finished()
+        index = widget.recommender.index
+        self.assertFalse(index.features.flags.writeable)
+        self.assertTrue(widget.recommender.use_index(5, index.mode))
+        self.assertEqual(widget.rec.text(), recommendations)
+        self.assertIsNone(widget.loaded_index)
+
+        widget.load_index(join(directory, "missing"))
+        self.assertTrue(widget.Error.index_load_failed.is_shown())
+        self.assertIs(widget.recommender.index, index)
+
+        # an index for a different network is not used
+        index = RecommendationIndex(*(getattr(index, name)[:3] for name in
+                                      ("features", "scores", "offsets")),
+                                    index.recommenders, index.mode,
+                                    index.params)
+        index.save(directory)
+        widget.load_index(directory)
+        self.wait_until_finished()
+        self.assertFalse(widget.Error.index_load_failed.is_shown())
+        self.assertTrue(widget.Error.computation_failed.is_shown())
+
+    def test_output(self):
+        widget = self.widget
+        self.send_signal(widget.Inputs.network, self.network)
+        self.wait_until_finished()
+        output = self.get_output(widget.Outputs.recommendations)
+        self.assertEqual(len(output), 5)
+        self.assertEqual(
+            [var.name for var in output.domain.variables + output.domain.metas],
+            ["Feature", "Score", "Recommenders", "Feature 1"])
+        self.assertEqual(output.domain["Feature"].str_val(output.X[0, 0]),
+                         "Shrek")
+        self.assertEqual(output.metas[0, 0], "Ema Novak")
+        _, _, recommenders = widget.recommender.recommend_with_recommenders(
+            widget.selected_node_index)
+        self.assertEqual(list(output.X[:, 2]), list(map(len, recommenders)))
+        self.assertTrue(np.all(np.diff(output.X[:, 1]) <= 0))
+
+        widget.controls.output_all.click()
+        self.wait_until_finished()
+        output = self.get_output(widget.Outputs.recommendations)
+        features, scores = widget.recommender.recommend_all(5)
+        valid = features != -1
+        self.assertEqual(len(output), valid.sum())
+        np.testing.assert_equal(output.X[:, 0], features[valid])
+        np.testing.assert_equal(output.X[:, 1], scores[valid])
+        self.assertEqual(output.metas[5, 0], widget.nodes_model[1])
+
+        # outputs from the precomputed index are the same
+        widget.controls.precompute.click()
+        self.wait_until_finished()
+        indexed = self.get_output(widget.Outputs.recommendations)
+        np.testing.assert_equal(indexed.X, output.X)
+        np.testing.assert_equal(indexed.metas, output.metas)
+
+        self.send_signal(widget.Inputs.network, None)
+        self.assertIsNone(self.get_output(widget.Outputs.recommendations))
+
+    def test_output_all_cached(self):
+        widget = self.widget
+        widget.output_all = True
+        self.send_signal(widget.Inputs.network, self.network)
+        self.wait_until_finished()
+        output = self.get_output(widget.Outputs.recommendations)
+
+        with patch("orangecontrib.example.widgets.owRecommendNew."
+                   "all_recommendations") as all_recommendations:
+            widget.controls.selected_node.setCurrentIndex(1)
+            widget.controls.selected_node.activated.emit(1)
+            self.wait_until_finished()
+            all_recommendations.assert_not_called()
+            self.assertIs(self.get_output(widget.Outputs.recommendations),
+                          output)
+
+        widget.scoring = 1
+        widget.on_scoring_changed()
+        self.wait_until_finished()
+        self.assertIsNot(self.get_output(widget.Outputs.recommendations),
+                         output)
+
+    def test_node_change(self):
+        widget = self.widget
+        self.send_signal(widget.Inputs.network, self.network)
+        self.wait_until_finished()
+        recommender = widget.recommender
+        text = widget.rec.text()
+
+        widget.controls.selected_node.setCurrentIndex(1)
+        widget.controls.selected_node.activated.emit(1)
+        self.wait_until_finished()
+        self.assertIs(widget.recommender, recommender)
+        self.assertNotEqual(widget.rec.text(), text)
+
+    def test_cancel_on_node_change(self):
+        widget = self.widget
+        self.send_signal(widget.Inputs.network, self.network)
+        for i in (1, 2):
+            widget.controls.selected_node.setCurrentIndex(i)
+            widget.controls.selected_node.activated.emit(i)
+        self.wait_until_finished()
+        self.assertEqual(widget.selected_node, widget.nodes_model[2])
+        friends = widget.recommender.friends(2)[0]
+        self.assertEqual(
+            widget.friends_list_label.text(),
+            ", ".join(widget.nodes_model[i] for i in friends))
+
+    def test_remove_network(self):
+        widget = self.widget
+        self.send_signal(widget.Inputs.network, self.network)
+        self.wait_until_finished()
+        self.send_signal(widget.Inputs.network, None)
+        self.wait_until_finished()
+        self.assertIsNone(widget.recommender)
+        self.assertEqual(widget.rec.text(), "No recommendations")
+        self.assertEqual(widget.friends_list_label.text(), "No friends")
+
+    def test_report(self):
+        widget = self.widget
+        widget.send_report()
+        self.send_signal(widget.Inputs.network, self.network)
+        self.wait_until_finished()
+        enabled = tracing.enabled()
+        try:
+            tracing.disable()
+            widget.send_report()
+            self.assertNotIn("Timings", widget.report_html)
+            tracing.enable()
+            tracing.registry.clear()
+            widget.controls.selected_node.setCurrentIndex(1)
+            widget.controls.selected_node.activated.emit(1)
+            self.wait_until_finished()
+            widget.report_html = ""
+            widget.send_report()
+            self.assertIn(widget.nodes_model[1], widget.report_html)
+            self.assertIn("rendering", widget.report_html)
+            self.assertIn("scoring", widget.report_html)
+        finally:
+            tracing.registry.enabled = enabled
+            tracing.registry.clear()
+
+    def search(self, text):
+        # Typing only (re)starts the timer; names are filtered on timeout
+        widget = self.widget
+        widget.controls.node_filter.setText(text)
+        self.assertTrue(widget._filter_timer.isActive())
+        widget._filter_timer.stop()
+        widget.on_node_filter_changed()
+        self.process_events(lambda: widget._filter_future is None)
+
+    def test_search(self):
+        widget = self.widget
+        self.send_signal(widget.Inputs.network, self.network)
+        self.wait_until_finished()
+        combo = widget.controls.selected_node
+        widget.controls.node_filter.setText("nov")
+        self.assertEqual(len(widget.nodes_model), len(widget.node_names))
+        self.search("novak")
+        self.wait_until_finished()
+        self.assertEqual(widget.selected_node, "Ema Novak")
+        self.assertTrue(all("Novak" in name for name in widget.nodes_model))
+
+        # the selected node is tracked by rows, not looked up by names
+        with patch.object(NodeListModel, "row_of", side_effect=ValueError):
+            self.search("tilen novak")
+            self.wait_until_finished()
+        self.assertEqual(list(widget.nodes_model), ["Tilen Novak"])
+        self.assertEqual(widget.selected_node, "Tilen Novak")
+        self.assertEqual(combo.currentText(), "Tilen Novak")
+        node = widget.selected_node_index
+        self.assertEqual(widget.node_names[node], "Tilen Novak")
+        self.assertEqual(
+            widget.friends_list_label.text(),
+            ", ".join(widget.node_names[i]
+                      for i in widget.recommender.friends(node)[0]))
+
+        self.search("")
+        self.assertEqual(combo.currentText(), "Tilen Novak")
+        self.assertEqual(len(widget.nodes_model), len(widget.node_names))
+
+        # results of earlier searches are not shown
+        widget.node_filter = "novak"
+        widget.on_node_filter_changed()
+        widget.node_filter = "tilen"
+        widget.on_node_filter_changed()
+        self.process_events(lambda: widget._filter_future is None)
+        self.assertEqual(list(widget.nodes_model), ["Tilen Novak"])
+
+    def test_paging(self):
+        # node 0 is connected to all others, which have feature 0
+        n = 2 * PAGE_SIZE + 5
+        adjacency = sp.csr_matrix(
+            (np.arange(1, n) / n, (np.zeros(n - 1, dtype=int),
+                                   np.arange(1, n))), shape=(n, n))
+        adjacency = (adjacency + adjacency.T).tocsr()
+        features = np.zeros((n, 2))
+        features[1:, 0] = 1
+        names = np.array([f"n{i}" for i in range(n)], dtype=object)
+        network = to_network(
+            FeatureNetwork(adjacency, features, names, ["a", "b"], False))
+        widget = self.widget
+        self.send_signal(widget.Inputs.network, network)
+        self.wait_until_finished()
+        label = widget.friends_list_label
+
+        # friends by decreasing weights
+        friends = [f"n{i}" for i in range(n - 1, 0, -1)]
+        self.assertEqual(
+            label.text(),
+            ", ".join(friends[:PAGE_SIZE])
+            + f' <a href="friends">and {n - 1 - PAGE_SIZE} more</a>')
+        label.linkActivated.emit("friends")
+        self.assertTrue(label.text().startswith(
+            ", ".join(friends[:2 * PAGE_SIZE]) + " <a"))
+        label.linkActivated.emit("friends")
+        self.assertEqual(label.text(), ", ".join(friends))
+
+        # recommenders of feature a for a node without features
+        widget.scoring = 1  # weighted
+        self.search("n0")
+        widget.on_scoring_changed()
+        self.wait_until_finished()
+        self.assertTrue(widget.rec.text().startswith(
+            f"<dl><dt>a</dt><dd> {', '.join(friends[:PAGE_SIZE])} "
+            f'<a href="feature-0">and {n - 1 - PAGE_SIZE} more</a></dd>'))
+        widget.rec.linkActivated.emit("feature-0")
+        self.assertIn(f"{friends[2 * PAGE_SIZE - 1]} <a", widget.rec.text())
+        self.assertIn(f">and {n - 1 - 2 * PAGE_SIZE} more<",
+                      widget.rec.text())
+
+        # changing the node resets paging
+        self.search("")
+        widget.controls.selected_node.setCurrentIndex(1)
+        widget.controls.selected_node.activated.emit(1)
+        widget.controls.selected_node.setCurrentIndex(0)
+        widget.controls.selected_node.activated.emit(0)
+        self.wait_until_finished()
+        self.assertIn(f">and {n - 1 - PAGE_SIZE} more<", label.text())
+
+    def test_edge_types(self):
+        widget = self.widget
+        self.send_signal(widget.Inputs.network, self.network)
+        self.wait_until_finished()
+        self.assertTrue(widget.layers_box.isHidden())
+
+        network = kids_network()
+        friends = network.edges[0]
+        # classmates: each kid with the next one
+        n = network.number_of_nodes()
+        classmates = sp.csr_matrix(
+            (np.ones(n - 1), (np.arange(n - 1), np.arange(1, n))),
+            shape=(n, n))
+        network.edges.append(type(friends)(classmates, name="classmates"))
+        self.send_signal(widget.Inputs.network, network)
+        self.wait_until_finished()
+        self.assertFalse(widget.layers_box.isHidden())
+        self.assertEqual(widget.recommender.layer_weights, (1, 1))
+        self.assertIn(1, widget.recommender.neighbours(0))
+
+        spins = widget.layers_box.findChildren(QDoubleSpinBox)
+        self.assertEqual(len(spins), 2)
+        spins[0].setValue(0)
+        self.wait_until_finished()
+        self.assertEqual(widget.recommender.layer_weights, (0, 1))
+        self.assertEqual(widget.friends_list_label.text(),
+                         widget.node_names[1])
+
+        widget.send_report()
+        self.assertIn("classmates: 1", widget.report_html)
+
+        self.send_signal(widget.Inputs.network, self.network)
+        self.wait_until_finished()
+        self.assertTrue(widget.layers_box.isHidden())
+        self.assertEqual(
+            len(widget.layers_box.findChildren(QDoubleSpinBox)), 1)
+
+    def test_exception(self):
+        widget = self.widget
+        self.send_signal(widget.Inputs.network, self.network)
+        self.wait_until_finished()
+        self.assertIsNotNone(self.get_output(widget.Outputs.recommendations))
+
+        with patch.object(widget.recommender, "recommend_with_recommenders",
+                          side_effect=ValueError("broken")):
+            widget.controls.selected_node.setCurrentIndex(1)
+            widget.controls.selected_node.activated.emit(1)
+            self.wait_until_finished()
+        self.assertTrue(widget.Error.computation_failed.is_shown())
+        self.assertIn("broken", str(widget.Error.computation_failed))
+        self.assertEqual(widget.rec.text(), "No recommendations")
+        self.assertEqual(widget.friends_list_label.text(), "No friends")
+        self.assertIsNone(self.get_output(widget.Outputs.recommendations))
+
+        widget.controls.selected_node.activated.emit(1)
+        self.wait_until_finished()
+        self.assertFalse(widget.Error.computation_failed.is_shown())
+        self.assertIsNotNone(self.get_output(widget.Outputs.recommendations))
@@ -0,0 +1,118 @@
+import os
+import unittest
+from os.path import join, dirname
+from tempfile import NamedTemporaryFile
+
+import numpy as np
+
+from orangecontrib.network.network.readwrite import read_pajek
+
+from orangecontrib.example.generate import generate_network
+from orangecontrib.example.readwrite import \
+    read_feature_pajek, write_feature_pajek, to_network
+
+NETWORKS = join(dirname(dirname(__file__)), "networks")
+
+
+class TestReadFeaturePajek(unittest.TestCase):
+    def _write(self, content):
+        with NamedTemporaryFile("wt", suffix=".net", delete=False,
+                                encoding="utf-8") as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+    def test_read_features(self):
+        filename = join(NETWORKS, "node_features_weights.net")
+        network = read_pajek(filename)
+        for chunk_size in (7, 1 << 20):
+            data = read_feature_pajek(filename, chunk_size)
+            self.assertTrue(data.directed)
+            self.assertEqual(data.features.dtype, np.uint8)
+            self.assertEqual(data.features.shape, (23, 40))
+            np.testing.assert_equal(
+                data.features[0],
+                [int(x) for x in network.nodes[0][1:].split("]")[0].split(",")])
+            self.assertEqual(data.node_names[22], "otrok 23")
+            self.assertEqual(
+                abs(data.adjacency - network.edges[0].edges).max(), 0)
+
+    def test_read_edges(self):
+        filename = join(NETWORKS, "kids_cartoons.net")
+        network = read_pajek(filename)
+        data = read_feature_pajek(filename, 10)
+        self.assertFalse(data.directed)
+        self.assertEqual(data.features.shape, (23, 0))
+        self.assertEqual(
+            abs(data.adjacency - network.edges[0].twoway_edges).max(), 0)
+
+    def test_mixed_sections(self):
+        filename = self._write(
+            '*Vertices 3\n'
+            '1 "[1, 0] {a}"\n'
+            '2 "[0, 1] {b}"\n'
+            '3\n'
+            '*Arcs\n'
+            '1 2 0.5\n'
+            '% comment\n'
+            '\n'
+            '*Edges\n'
+            '2 3\n'
+            '3 1 2 c Blue\n')
+        data = read_feature_pajek(filename, 2)
+        self.assertTrue(data.directed)
+        np.testing.assert_equal(data.node_names, ["a", "b", "3"])
+        np.testing.assert_equal(data.features, [[1, 0], [0, 1], [0, 0]])
+        np.testing.assert_equal(
+            data.adjacency.toarray(), [[0, 0.5, 2], [0, 0, 1], [2, 1, 0]])
+
+    def test_invalid(self):
+        filename = self._write('*Arcs\n1 2\n')
+        self.assertRaises(ValueError, read_feature_pajek, filename)
+        filename = self._write('*Vertices 2\n1 "a"\n2 "b"\n*Arcs\n1 3\n')
+        self.assertRaises(ValueError, read_feature_pajek, filename)
+        filename = self._write('*Vertices 2\n2 "a"\n1 "b"\n')
+        self.assertRaises(ValueError, read_feature_pajek, filename)
+        filename = self._write('*Vertices 3\n1 "a"\n2 "b"\n')
+        self.assertRaises(ValueError, read_feature_pajek, filename)
+
+    def test_to_network(self):
+        data = read_feature_pajek(join(NETWORKS, "node_features_weights.net"))
+        network = to_network(data)
+        np.testing.assert_equal(network.nodes.X, data.features)
+        self.assertEqual(network.nodes.domain.metas[0].name, "name")
+        self.assertEqual(network.nodes.metas[1, 0], "otrok 2")
+        self.assertTrue(network.edges[0].directed)
+
+        data = read_feature_pajek(join(NETWORKS, "kids_cartoons.net"))
+        network = to_network(data)
+        self.assertFalse(network.edges[0].directed)
+        self.assertEqual(
+            abs(network.edges[0].twoway_edges - data.adjacency).max(), 0)
+
+    def test_write(self):
+        filename = self._write("")
+        for name in ("node_features_weights.net", "kids_cartoons.net"):
+            data = read_feature_pajek(join(NETWORKS, name))
+            write_feature_pajek(filename, data, chunk_size=5)
+            written = read_feature_pajek(filename)
+            np.testing.assert_equal(written.features, data.features)
+            np.testing.assert_equal(written.node_names, data.node_names)
+            self.assertEqual(written.directed, data.directed)
+            self.assertEqual(abs(written.adjacency - data.adjacency).max(), 0)
+
+        data = generate_network(100, directed=True, seed=0)
+        write_feature_pajek(filename, data)
+        written = read_feature_pajek(filename, packed=True)
+        np.testing.assert_equal(written.features.bits, data.features.bits)
+        self.assertEqual(written.node_names[0], "1")
+        self.assertEqual(abs(written.adjacency - data.adjacency).max(), 0)
+
+        data = data._replace(features=np.array([[0.5, 2]] * 100))
+        write_feature_pajek(filename, data)
+        with open(filename) as f:
+            self.assertEqual(f.readlines()[1], '1 "[0.5, 2]"\n')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,457 @@
+import unittest
+from os.path import join, dirname
+
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.network import Network
+from orangecontrib.network.network.base import DirectedEdges, UndirectedEdges
+
+from orangecontrib.example.bitset import BitMatrix
+from orangecontrib.example.index import RecommendationIndex
+from orangecontrib.example.readwrite import read_feature_pajek
+from orangecontrib.example.recommend import \
+    Recommender, personalized_pagerank, combine_layers, splice_rows, \
+    COUNT, WEIGHTED, TWO_HOP, PAGERANK
+
+
+def small_network(directed=True):
+    #  0 -> 1, 0 -> 2, 3 -> 0, 2 -> 3
+    edges = sp.coo_matrix(
+        ([0.5, 0.25, 1, 0.75], ([0, 0, 3, 2], [1, 2, 0, 3])), shape=(4, 4))
+    edge_type = DirectedEdges if directed else UndirectedEdges
+    return Network(np.array(list("abcd")), [edge_type(edges)])
+
+
+FEATURES = np.array([[1, 0, 0, 0],
+                     [1, 1, 0, 0],
+                     [0, 1, 1, 0],
+                     [0, 1, 0, 1]], dtype=float)
+
+
+class TestRecommender(unittest.TestCase):
+    def setUp(self):
+        self.recommender = Recommender.from_network(small_network(), FEATURES)
+
+    def test_neighbours(self):
+        rec = self.recommender
+        np.testing.assert_equal(rec.neighbours(0), [1, 2, 3])
+        np.testing.assert_equal(rec.neighbours(1), [0])
+        np.testing.assert_equal(rec.neighbours(3), [0, 2])
+
+        rec = Recommender.from_network(small_network(False), FEATURES)
+        np.testing.assert_equal(rec.neighbours(0), [1, 2, 3])
+        np.testing.assert_equal(rec.neighbours(1), [0])
+
+    def test_friends(self):
+        rec = self.recommender
+        friends, weights = rec.friends(0)
+        np.testing.assert_equal(friends, [1, 2])
+        np.testing.assert_equal(weights, [0.5, 0.25])
+        np.testing.assert_equal(rec.friends(0, 1)[0], [1])
+        np.testing.assert_equal(rec.friends(1)[0], [])
+
+        friends, weights = rec.followers(0)
+        np.testing.assert_equal(friends, [3])
+        np.testing.assert_equal(weights, [1])
+
+        rec = Recommender.from_network(small_network(False), FEATURES)
+        np.testing.assert_equal(rec.friends(0)[0], [3, 1, 2])
+        np.testing.assert_equal(rec.followers(0)[0], [3, 1, 2])
+
+    def test_recommend(self):
+        rec = self.recommender
+        # 0 already has feature 0; features 2 and 3 are equally popular
+        features, scores = rec.recommend(0, 2)
+        np.testing.assert_equal(features, [1, 2])
+        np.testing.assert_equal(scores, [3, 1])
+
+        # feature 0 is more popular than feature 2
+        features, scores = rec.recommend(3, 5)
+        np.testing.assert_equal(features, [0, 2])
+        np.testing.assert_equal(scores, [1, 1])
+        np.testing.assert_equal(rec.popularity, [2, 3, 1, 1])
+
+    def test_recommend_nodes(self):
+        features, scores = self.recommender.recommend_nodes([0, 3], 2)
+        np.testing.assert_equal(features, [[1, 2], [0, 2]])
+        np.testing.assert_equal(scores, [[3, 1], [1, 1]])
+
+        features, scores = self.recommender.recommend_nodes([1], 5)
+        np.testing.assert_equal(features, [[2, 3, -1, -1, -1]])
+        np.testing.assert_equal(scores, [[0, 0] + [-np.inf] * 3])
+
+    def test_recommend_all(self):
+        rec = self.recommender
+        features, scores = rec.recommend_all(2, chunk_size=3)
+        exp_features, exp_scores = rec.recommend_nodes(np.arange(4), 2)
+        np.testing.assert_equal(features, exp_features)
+        np.testing.assert_equal(scores, exp_scores)
+
+        starts = [start for start, *_ in rec.iter_recommend_all(2, chunk_size=3)]
+        self.assertEqual(starts, [0, 3])
+
+    def test_scoring_modes(self):
+        rec = self.recommender
+        np.testing.assert_equal(rec.scores(0, COUNT), [1, 3, 1, 1])
+        np.testing.assert_equal(rec.scores(0, WEIGHTED), [0.5, 1.75, 0.25, 1])
+
+        # 0 reaches 3 through 2 (0.25 * 0.75) and 2 through 3 (1 * 0.75)
+        rec.decay = 0.5
+        np.testing.assert_almost_equal(
+            rec.scores(0, TWO_HOP),
+            [0.5, 1.75 + 0.5 * (0.1875 + 0.75), 0.25 + 0.5 * 0.75,
+             1 + 0.5 * 0.1875])
+        np.testing.assert_equal(rec.recommenders(1, 2, TWO_HOP), [2])
+        np.testing.assert_equal(rec.recommenders(1, 2, WEIGHTED), [])
+
+        square = rec._matrices["square"]
+        rec.decay = 1
+        rec.scores(0, TWO_HOP)
+        self.assertIs(rec._matrices["square"], square)
+
+        features, _ = rec.recommend_nodes([1], 1, TWO_HOP)
+        np.testing.assert_equal(features, [[3]])
+
+        self.assertRaises(ValueError, rec.scores, 0, "foo")
+
+    def test_scoring_rows(self):
+        # batches do not compute whole matrices, but give the same rows
+        data = read_feature_pajek(join(
+            dirname(dirname(__file__)), "networks",
+            "node_features_weights.net"))
+        symmetric = sp.csr_matrix(data.adjacency + data.adjacency.T)
+        for rec in (Recommender(data.adjacency, data.features),
+                    Recommender(symmetric, data.features, directed=False)):
+            nodes = np.arange(0, rec.n_nodes, 3)
+            for mode in (COUNT, WEIGHTED, TWO_HOP):
+                features, scores = rec.recommend_nodes(nodes, 3, mode)
+                self.assertEqual(set(rec._matrices), {"popularity"})
+                rows = rec._contributions(nodes, mode)
+                expected = rec.scoring_matrix(mode)[nodes]
+                self.assertEqual(abs(rows - expected).max(), 0)
+                exp_features, exp_scores = rec.recommend_nodes(nodes, 3, mode)
+                np.testing.assert_equal(features, exp_features)
+                np.testing.assert_equal(scores, exp_scores)
+                rec.invalidate()
+
+    def test_pagerank(self):
+        rec = self.recommender
+        visits = rec.pagerank([0, 1])
+        np.testing.assert_almost_equal(visits.sum(axis=0), [1, 1])
+        # 1 is connected only to 0
+        self.assertGreater(visits[0, 1], visits[2, 1])
+
+        rec.pagerank_block = 1
+        scores = rec.scores(1, PAGERANK)
+        np.testing.assert_almost_equal(
+            scores, visits[[0, 2, 3], 1] @ FEATURES[[0, 2, 3]])
+        features, _ = rec.recommend_nodes([0, 1], 1, PAGERANK)
+        np.testing.assert_equal(features[:, 0], [1, 3])
+
+    def test_pagerank_block_size(self):
+        rec = self.recommender
+        self.assertEqual(rec._pagerank_block_size(), rec.pagerank_block)
+        # dense arrays of 4 nodes need 5 * 8 * 4 bytes per source
+        rec.pagerank_memory = 3 * 5 * 8 * 4
+        self.assertEqual(rec._pagerank_block_size(), 3)
+        rec.pagerank_memory = 1
+        self.assertEqual(rec._pagerank_block_size(), 1)
+        visits = rec.pagerank([1])
+        np.testing.assert_almost_equal(
+            rec.scores(1, PAGERANK), visits[[0, 2, 3], 0] @ FEATURES[[0, 2, 3]])
+
+    def test_pagerank_epsilon(self):
+        rec = self.recommender
+        visits = rec.pagerank([1])[:, 0]
+        # walks from 1 visit 0 more often than 2 and 3
+        rec.pagerank_epsilon = (visits[0] + visits[[2, 3]].max()) / 2
+        np.testing.assert_almost_equal(
+            rec.scores(1, PAGERANK), visits[0] * FEATURES[0])
+        np.testing.assert_equal(rec.recommenders(1, 0, PAGERANK), [0])
+        # 2 has feature 2, but is visited too rarely
+        offsets, recommenders = rec.batch_recommenders(
+            [1], np.array([[0, 2]]), PAGERANK)
+        np.testing.assert_equal(offsets, [0, 1, 1])
+        np.testing.assert_equal(recommenders, [0])
+
+    def test_personalized_pagerank(self):
+        #  0 -> 1 -> 2, 2 is dangling
+        transition = sp.csr_matrix(([1., 1.], ([0, 1], [1, 2])), shape=(3, 3))
+        visits = personalized_pagerank(transition, [0, 2], alpha=0.5)
+        np.testing.assert_almost_equal(visits[:, 1], [0, 0, 1])
+        np.testing.assert_almost_equal(visits[:, 0], np.array([4, 2, 1]) / 7)
+
+        visits = personalized_pagerank(transition, [0], alpha=0.5,
+                                       max_iter=1)
+        np.testing.assert_almost_equal(visits[:, 0], [0.5, 0.5, 0])
+
+    def test_cache(self):
+        rec = self.recommender
+        rec.recommend(0, 2)
+        misses = rec.cache.misses
+        features, _ = rec.recommend(0, 2)
+        self.assertEqual(rec.cache.misses, misses)
+        self.assertEqual(rec.cache.hits, 1)
+
+        rec.recommend(0, 2, WEIGHTED)
+        self.assertGreater(rec.cache.misses, misses)
+
+        rec.features = FEATURES[::-1].copy()
+        rec.invalidate()
+        self.assertEqual(len(rec.cache), 0)
+        self.assertNotEqual(list(rec.recommend(0, 2)[0]), list(features))
+
+    def test_feature_storage(self):
+        rec = self.recommender
+        for features in (BitMatrix.from_dense(FEATURES),
+                         sp.csr_matrix(FEATURES), sp.csc_matrix(FEATURES)):
+            other = Recommender.from_network(small_network(), features)
+            for mode in (COUNT, WEIGHTED, TWO_HOP, PAGERANK):
+                np.testing.assert_almost_equal(
+                    other.scores(0, mode), rec.scores(0, mode))
+                np.testing.assert_almost_equal(
+                    other.recommend_all(2, mode), rec.recommend_all(2, mode))
+                np.testing.assert_equal(
+                    other.recommenders(0, 1, mode),
+                    rec.recommenders(0, 1, mode))
+
+    def test_recommenders(self):
+        np.testing.assert_equal(self.recommender.recommenders(0, 1), [1, 2, 3])
+        np.testing.assert_equal(self.recommender.recommenders(3, 0), [0])
+
+    def test_isolated_node_sparse(self):
+        # node 3 has no edges
+        adjacency = sp.csr_matrix(([1, 1], ([0, 1], [1, 2])), shape=(4, 4))
+        rec = Recommender(adjacency, sp.csr_matrix(FEATURES), directed=False)
+        np.testing.assert_equal(rec.recommenders(3, 1), [])
+        features, _, recommenders = rec.recommend_with_recommenders(3, 2)
+        self.assertTrue(all(len(nodes) == 0 for nodes in recommenders))
+        offsets, recommenders = rec.batch_recommenders(
+            [3], rec.recommend_nodes([3], 2)[0])
+        np.testing.assert_equal(offsets, 0)
+        self.assertEqual(len(recommenders), 0)
+        index = RecommendationIndex.build(rec, 2)
+        index.update(rec, [3])
+        np.testing.assert_equal(index.lookup(3)[0], features)
+
+    def test_sort_by_contribution(self):
+        rec = self.recommender
+        for mode in (COUNT, WEIGHTED, TWO_HOP):
+            row = rec.scoring_matrix(mode)[0].toarray().ravel()
+            nodes = rec.sort_by_contribution(0, [3, 0, 2, 1], mode)
+            contributing = np.flatnonzero(row)
+            np.testing.assert_equal(
+                nodes[:len(contributing)],
+                contributing[np.lexsort((contributing, -row[contributing]))])
+            self.assertEqual(set(nodes), {0, 1, 2, 3})
+        np.testing.assert_equal(
+            rec.sort_by_contribution(0, [2, 1], WEIGHTED), [1, 2])
+        self.assertEqual(len(rec.sort_by_contribution(0, [])), 0)
+
+    def test_no_edges(self):
+        network = Network(np.array(list("abcd")), [])
+        rec = Recommender.from_network(network, FEATURES)
+        np.testing.assert_equal(rec.neighbours(0), [])
+        np.testing.assert_equal(rec.scores(0), [0, 0, 0, 0])
+
+    def test_mismatched_shapes(self):
+        self.assertRaises(ValueError, Recommender, sp.csr_matrix((3, 3)),
+                          FEATURES)
+
+
+class TestMultiplex(unittest.TestCase):
+    def setUp(self):
+        #  friends: 0 -> 1, 1 -> 2; classmates: 0 - 2, 2 - 3
+        self.friends = sp.csr_matrix(
+            ([1, 0.5], ([0, 1], [1, 2])), shape=(4, 4))
+        self.classmates = sp.csr_matrix(
+            ([1, 1], ([0, 2], [2, 3])), shape=(4, 4))
+        self.network = Network(
+            np.array(list("abcd")),
+            [DirectedEdges(self.friends, name="friends"),
+             UndirectedEdges(self.classmates, name="classmates")])
+
+    def test_combine_layers(self):
+        combined = combine_layers([self.friends, self.classmates], (2, 0.5))
+        np.testing.assert_almost_equal(
+            combined.toarray(),
+            2 * self.friends.toarray() + 0.5 * self.classmates.toarray())
+        self.assertIs(combine_layers([self.friends], [1]).indptr,
+                      self.friends.indptr)
+        self.assertEqual(
+            combine_layers([self.friends, self.classmates], (0, 0)).nnz, 0)
+        self.assertRaises(ValueError, combine_layers, [self.friends], (1, 2))
+        self.assertRaises(ValueError, combine_layers, [self.friends], (-1, ))
+
+    def test_from_network(self):
+        rec = Recommender.from_network(self.network, FEATURES, (1, 2))
+        self.assertTrue(rec.directed)
+        classmates = self.classmates + self.classmates.T
+        expected = self.friends + 2 * classmates
+        np.testing.assert_almost_equal(rec.adjacency.toarray(),
+                                       expected.toarray())
+        single = Recommender(expected, FEATURES)
+        for mode in (COUNT, WEIGHTED, TWO_HOP, PAGERANK):
+            np.testing.assert_almost_equal(
+                rec.recommend_all(2, mode)[1], single.recommend_all(2, mode)[1])
+
+        rec = Recommender.from_network(self.network, FEATURES)
+        self.assertEqual(rec.layer_weights, (1, 1))
+        np.testing.assert_almost_equal(rec.adjacency.toarray(),
+                                       (self.friends + classmates).toarray())
+
+    def test_set_layer_weights(self):
+        rec = Recommender.from_network(self.network, FEATURES)
+        adjacency = rec.adjacency
+        scores = rec.scores(0, WEIGHTED)
+        rec.set_layer_weights((1, 0))
+        np.testing.assert_equal(rec.neighbours(0), [1])
+        np.testing.assert_almost_equal(
+            rec.scores(0, WEIGHTED),
+            Recommender(self.friends, FEATURES).scores(0, WEIGHTED))
+        self.assertIsNotNone(rec.in_adjacency)
+
+        # The combination is cached
+        rec.set_layer_weights((1, 1))
+        self.assertIs(rec.adjacency, adjacency)
+        np.testing.assert_almost_equal(rec.scores(0, WEIGHTED), scores)
+
+        self.assertRaises(ValueError, rec.set_layer_weights, (1, ))
+        self.assertRaises(ValueError,
+                          Recommender(self.friends, FEATURES).set_layer_weights,
+                          (1, ))
+
+
+class TestSpliceRows(unittest.TestCase):
+    def test_splice_rows(self):
+        # rows [1, 2], [], [3], [4, 5, 6]
+        indptr = np.array([0, 2, 2, 3, 6])
+        values = np.arange(1, 7)
+        new_indptr, (new_values, ) = splice_rows(
+            indptr, (values, ), np.array([0, 2]),
+            np.array([0, 0, 3]), (np.array([7, 8, 9]), ))
+        np.testing.assert_equal(new_indptr, [0, 0, 0, 3, 6])
+        np.testing.assert_equal(new_values, [7, 8, 9, 4, 5, 6])
+        self.assertEqual(new_values.dtype, values.dtype)
+
+        new_indptr, (new_values, ) = splice_rows(
+            indptr, (values, ), np.array([], dtype=int), np.array([0]),
+            (np.array([], dtype=int), ))
+        np.testing.assert_equal(new_indptr, indptr)
+        np.testing.assert_equal(new_values, values)
+
+
+class TestIncrementalUpdates(unittest.TestCase):
+    def setUp(self):
+        self.data = read_feature_pajek(join(
+            dirname(dirname(__file__)), "networks",
+            "node_features_weights.net"))
+
+    def assert_same(self, rec, expected):
+        for name in ("adjacency", "in_adjacency", "neighbourhood"):
+            self.assert_equal_matrices(
+                getattr(rec, name), getattr(expected, name))
+        for name in ("weighted", "square", "transition"):
+            self.assert_equal_matrices(
+                rec._cached(name, None),
+                expected._cached(name, getattr(expected, "_" + name)))
+        for mode in (COUNT, WEIGHTED, TWO_HOP, PAGERANK):
+            for node in range(rec.n_nodes):
+                np.testing.assert_almost_equal(
+                    rec.scores(node, mode), expected.scores(node, mode))
+                np.testing.assert_equal(
+                    rec.recommend(node, 3, mode)[0],
+                    expected.recommend(node, 3, mode)[0])
+
+    def assert_equal_matrices(self, matrix, expected):
+        if expected is None:
+            self.assertIsNone(matrix)
+            return
+        self.assertEqual(matrix.format, expected.format)
+        matrix, expected = matrix.sorted_indices(), expected.sorted_indices()
+        np.testing.assert_equal(matrix.indptr, expected.indptr)
+        np.testing.assert_equal(matrix.indices, expected.indices)
+        np.testing.assert_almost_equal(matrix.data, expected.data)
+
+    @staticmethod
+    def warm_up(rec):
+        for mode in (COUNT, WEIGHTED, TWO_HOP, PAGERANK):
+            for node in range(rec.n_nodes):
+                rec.recommend(node, 3, mode)
+
+    def test_edges(self):
+        data = self.data
+        for directed in (True, False):
+            adjacency = data.adjacency if directed \
+                else data.adjacency + data.adjacency.T
+            rec = Recommender(adjacency, data.features, directed)
+            self.warm_up(rec)
+            rec.index = RecommendationIndex.build(rec, 3, WEIGHTED)
+
+            fr, to = adjacency.nonzero()
+            rec.add_edge(3, 17, 2)
+            rec.remove_edge(fr[0], to[0])
+            rec.set_edges([5, 6, 5], [7, 8, 7], [1, 3, 0.5])
+
+            adjacency = adjacency.tolil()
+            adjacency[3, 17] = 2
+            adjacency[fr[0], to[0]] = 0
+            adjacency[5, 7], adjacency[6, 8] = 0.5, 3
+            if not directed:
+                adjacency[17, 3] = 2
+                adjacency[to[0], fr[0]] = 0
+                adjacency[7, 5], adjacency[8, 6] = 0.5, 3
+            expected = Recommender(adjacency, data.features, directed)
+            self.assertEqual(abs(rec.adjacency - expected.adjacency).max(), 0)
+            self.assert_same(rec, expected)
+            for node in range(rec.n_nodes):
+                np.testing.assert_equal(
+                    rec.index.recommend(node, 3)[0],
+                    expected.recommend(node, 3, WEIGHTED)[0])
+
+    def test_features(self):
+        data = self.data
+        read_only = data.features.copy()
+        read_only.flags.writeable = False
+        for features in (read_only, sp.csr_matrix(data.features),
+                         BitMatrix.from_dense(data.features)):
+            rec = Recommender(data.adjacency, features)
+            self.warm_up(rec)
+            rec.index = RecommendationIndex.build(rec, 3, TWO_HOP)
+            rec.set_feature(3, 0, 1)
+            rec.set_feature(3, 27, 0)
+            rec.set_feature(20, 5, 1)
+            rec.set_feature(20, 5, 1)
+
+            dense = data.features.copy()
+            dense[3, 0], dense[3, 27], dense[20, 5] = 1, 0, 1
+            expected = Recommender(data.adjacency, dense)
+            np.testing.assert_equal(rec.popularity, expected.popularity)
+            self.assertIsNotNone(rec.index)
+            # friends of friends of changed nodes are updated, too
+            changed = np.union1d(rec.neighbours(3), rec.neighbours(20))
+            for node in rec.neighbourhood[changed].indices:
+                np.testing.assert_equal(
+                    rec.index.recommend(node, 3)[0],
+                    expected.recommend(node, 3, TWO_HOP)[0])
+            # tie-breaking in the index is not updated for other nodes
+            rec.index = None
+            self.assert_same(rec, expected)
+        self.assertEqual(read_only[3, 0], 0)
+
+        rec.index = RecommendationIndex.build(rec, 3, PAGERANK)
+        rec.set_feature(3, 1, 1)
+        self.assertIsNone(rec.index)
+
+    def test_features_without_index(self):
+        # scoring matrices are not computed just to update an index
+        rec = Recommender(self.data.adjacency, self.data.features)
+        rec.recommend(3, 3)
+        rec.set_feature(3, 0, 1)
+        rec.set_feature(4, 0, 1)
+        self.assertEqual(set(rec._matrices), {"neighbourhood", "popularity"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import unittest
+from os.path import join, dirname
+
+import numpy as np
+
+from orangecontrib.example.index import RecommendationIndex
+from orangecontrib.example.readwrite import read_feature_pajek
+from orangecontrib.example.recommend import Recommender, TWO_HOP
+from orangecontrib.example.service import RecommendationService, LatencyStats
+
+NETWORK = join(dirname(dirname(__file__)), "networks",
+               "node_features_weights.net")
+
+
+class TestLatencyStats(unittest.TestCase):
+    def test_summary(self):
+        stats = LatencyStats(size=100)
+        self.assertIsNone(stats.percentile(50))
+        for latency in range(1, 201):
+            stats.add(latency / 1000)
+        summary = stats.summary()
+        self.assertEqual(summary["requests"], 200)
+        self.assertAlmostEqual(summary["latency_p50_ms"], 150.5)
+        self.assertAlmostEqual(summary["latency_p99_ms"], 199.01)
+
+
+class TestRecommendationService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        data = read_feature_pajek(NETWORK)
+        self.recommender = Recommender.from_feature_network(data)
+        self.service = RecommendationService(
+            self.recommender, data.node_names, window=0.01)
+        self.server = await self.service.start(port=0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.service.close()
+
+    async def request(self, method, target, body=None):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        body = b"" if body is None else json.dumps(body).encode()
+        writer.write(f"{method} {target} HTTP/1.1\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     "Connection: close\r\n\r\n".encode() + body)
+        response = await reader.read()
+        writer.close()
+        head, _, data = response.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(data)
+
+    async def test_recommend(self):
+        status, result = await self.request(
+            "GET", "/recommend?node=otrok%202&k=3")
+        self.assertEqual(status, 200)
+        features, scores, recommenders = \
+            self.recommender.recommend_with_recommenders(1, 3)
+        self.assertEqual(result["node"], "otrok 2")
+        self.assertEqual(result["features"], features.tolist())
+        self.assertEqual(result["scores"], scores.tolist())
+        self.assertEqual(
+            result["recommenders"],
+            [[f"otrok {i + 1}" for i in nodes] for nodes in recommenders])
+
+        status, other = await self.request("GET", "/recommend?node=1&k=3")
+        self.assertEqual(other, result)
+
+    async def test_batch(self):
+        status, result = await self.request(
+            "POST", "/recommend", {"nodes": [0, "otrok 5", 7], "k": 2,
+                                   "mode": TWO_HOP})
+        self.assertEqual(status, 200)
+        features, _ = self.recommender.recommend_nodes([0, 4, 7], 2, TWO_HOP)
+        self.assertEqual([r["features"] for r in result["results"]],
+                         features.tolist())
+        self.assertEqual(self.service.batches, 1)
+
+    async def test_index(self):
+        rec = self.recommender
+        rec.set_index(RecommendationIndex.build(rec, 3, TWO_HOP))
+        rec.index.features = rec.index.features.copy()
+        rec.index.features[1, 0] = 39
+        status, result = await self.request(
+            "GET", f"/recommend?node=1&k=2&mode={TWO_HOP}")
+        self.assertEqual(status, 200)
+        features, scores, recommenders = rec.index.lookup(1, 2)
+        self.assertEqual(result["features"], features.tolist())
+        self.assertEqual(result["features"][0], 39)
+        self.assertEqual(result["scores"], scores.tolist())
+        self.assertEqual(
+            result["recommenders"],
+            [[f"otrok {i + 1}" for i in nodes] for nodes in recommenders])
+
+        # other modes are computed
+        status, result = await self.request("GET", "/recommend?node=1&k=2")
+        self.assertEqual(result["features"],
+                         rec.recommend(1, 2)[0].tolist())
+
+    async def test_coalescing(self):
+        responses = await asyncio.gather(
+            *(self.request("GET", f"/recommend?node={node}&k={1 + node % 3}")
+              for node in range(20)))
+        for node, (status, result) in enumerate(responses):
+            self.assertEqual(status, 200)
+            np.testing.assert_equal(
+                result["features"],
+                self.recommender.recommend(node, 1 + node % 3)[0])
+        self.assertLess(self.service.batches, 20)
+        self.assertEqual(self.service.batched_nodes, 20)
+
+        status, stats = await self.request("GET", "/stats")
+        self.assertEqual(stats["requests"], 20)
+        self.assertEqual(stats["batches"], self.service.batches)
+        self.assertGreater(stats["latency_p99_ms"], 0)
+        self.assertGreater(stats["throughput"], 0)
+
+    async def test_errors(self):
+        for target, status in (("/recommend?node=otrok%2099", 404),
+                               ("/recommend?node=42", 404),
+                               ("/recommend", 400),
+                               ("/recommend?node=1&k=0", 400),
+                               ("/recommend?node=1&mode=magic", 400),
+                               ("/unknown", 404)):
+            self.assertEqual((await self.request("GET", target))[0], status)
+        self.assertEqual(
+            (await self.request("POST", "/recommend", {"node": 1}))[0], 400)
+        self.assertEqual(
+            await self.request("POST", "/recommend", {"nodes": 5}),
+            (400, {"error": "'nodes' must be a list"}))
+        self.assertEqual((await self.request("POST", "/stats"))[0], 405)
+
+    async def test_keep_alive(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        for node in (0, 1):
+            writer.write(f"GET /recommend?node={node} HTTP/1.1\r\n\r\n"
+                         .encode())
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+            result = json.loads(await reader.readexactly(length))
+            self.assertEqual(result["node"], f"otrok {node + 1}")
+        writer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
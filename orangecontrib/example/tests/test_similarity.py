@@ -0,0 +1,136 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.example.bitset import BitMatrix
+from orangecontrib.example.readwrite import FeatureNetwork
+from orangecontrib.example.recommend import Recommender, SIMILAR
+from orangecontrib.example.similarity import \
+    SimilarityIndex, minhash_signatures, candidate_pairs, pair_similarities, \
+    JACCARD, COSINE
+from orangecontrib.example.snapshot import save_snapshot, load_snapshot
+
+
+def clustered_features(n=600, n_features=300, n_clusters=30, seed=0):
+    # Each node has 12 of 16 features of its cluster, and two random ones
+    rng = np.random.default_rng(seed)
+    centers = [rng.choice(n_features, 16, replace=False)
+               for _ in range(n_clusters)]
+    features = np.zeros((n, n_features), dtype=np.uint8)
+    for node in range(n):
+        features[node, rng.choice(centers[node % n_clusters], 12,
+                                  replace=False)] = 1
+        features[node, rng.choice(n_features, 2)] = 1
+    return features
+
+
+def brute_force(features, metric):
+    features = features.astype(float)
+    common = features @ features.T
+    if metric == JACCARD:
+        counts = features.sum(axis=1)
+        union = counts[:, None] + counts - common
+    else:
+        norms = np.sqrt((features ** 2).sum(axis=1))
+        union = norms[:, None] * norms
+    union[union == 0] = 1
+    return common / union
+
+
+class TestSimilarity(unittest.TestCase):
+    def test_minhash_signatures(self):
+        features = clustered_features()
+        signatures = minhash_signatures(sp.csr_matrix(features), 256)
+        similarities = brute_force(features, JACCARD)
+        agreement = (signatures[:50, None] == signatures[:50]).mean(axis=2)
+        self.assertLess(np.abs(agreement - similarities[:50, :50]).max(),
+                        0.15)
+        np.testing.assert_equal(
+            minhash_signatures(BitMatrix.from_dense(features), 256),
+            signatures)
+
+    def test_candidate_pairs(self):
+        features = clustered_features()
+        first, second = candidate_pairs(minhash_signatures(features))
+        self.assertTrue(np.all(first < second))
+        similarities = brute_force(features, JACCARD)
+        # most pairs from the same cluster and fewer others
+        same = first % 30 == second % 30
+        self.assertGreater(same.sum(), 0.8 * 600 * 19 / 2)
+        self.assertLess((~same).sum(), same.sum() / 4)
+        np.testing.assert_almost_equal(
+            pair_similarities(features, first, second),
+            similarities[first, second])
+
+    def test_empty_rows(self):
+        features = np.zeros((4, 3))
+        features[[0, 1], 1] = 1
+        first, second = candidate_pairs(minhash_signatures(features))
+        np.testing.assert_equal(first, [0])
+        np.testing.assert_equal(second, [1])
+
+    def test_exact(self):
+        features = clustered_features(n=100)
+        for metric in (JACCARD, COSINE):
+            expected = brute_force(features, metric)
+            np.fill_diagonal(expected, 0)
+            index = SimilarityIndex.build(features, 5, metric, exact=True,
+                                          block_size=30)
+            for node in range(100):
+                nodes, similarities = index.similar(node)
+                self.assertEqual(len(nodes), 5)
+                np.testing.assert_almost_equal(
+                    similarities, np.sort(expected[node])[::-1][:5])
+                np.testing.assert_almost_equal(
+                    similarities, expected[node, nodes])
+
+    def test_minhash_index(self):
+        features = clustered_features()
+        exact = SimilarityIndex.build(features, 5, exact=True)
+        approximate = SimilarityIndex.build(features, 5)
+        self.assertEqual(approximate.matrix.shape, (600, 600))
+        self.assertEqual(approximate.matrix.diagonal().sum(), 0)
+        self.assertGreater(approximate.matrix.sum(), 0.95 * exact.matrix.sum())
+        self.assertTrue(np.all(np.diff(approximate.matrix.indptr) <= 5))
+        self.assertRaises(ValueError, SimilarityIndex.build, features,
+                          metric="euclidean")
+
+    def test_recommender(self):
+        features = clustered_features(n=100)
+        rec = Recommender(sp.csr_matrix((100, 100)), features, n_similar=5)
+        similar = rec.scoring_matrix(SIMILAR)
+        self.assertEqual(similar.shape, (100, 100))
+        nodes, similarities = SimilarityIndex.build(features, 5).similar(0)
+        np.testing.assert_almost_equal(
+            rec.scores(0, SIMILAR), similarities @ features[nodes])
+        recommended, _ = rec.recommend(0, 3, SIMILAR)
+        self.assertTrue(np.all(features[0, recommended] == 0))
+        self.assertTrue(np.all(np.isin(
+            rec.recommenders(0, recommended[0], SIMILAR), nodes)))
+
+        rec.set_feature(nodes[0], 0, 1 - features[nodes[0], 0])
+        self.assertIsNot(rec.scoring_matrix(SIMILAR), similar)
+        rec.add_edge(0, 1)
+        self.assertIs(rec.scoring_matrix(SIMILAR),
+                      rec.scoring_matrix(SIMILAR))
+
+    def test_input_not_modified(self):
+        features = sp.csr_matrix(clustered_features(n=100))
+        features.data[::7] = 0  # explicit zeros
+        data = features.data.copy()
+        SimilarityIndex.build(features, 5)
+        np.testing.assert_equal(features.data, data)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        save_snapshot(directory, FeatureNetwork(
+            sp.csr_matrix((100, 100)), features, None, None, False))
+        rec = Recommender.from_feature_network(load_snapshot(directory))
+        self.assertEqual(len(rec.recommend(0, 3, SIMILAR)[0]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import shutil
+import tempfile
+import unittest
+from os.path import join, dirname
+
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.example.readwrite import read_feature_pajek
+from orangecontrib.example.recommend import Recommender
+from orangecontrib.example.snapshot import \
+    PackedStrings, save_snapshot, load_snapshot, save_matrix, load_matrix
+
+NETWORKS = join(dirname(dirname(__file__)), "networks")
+
+
+class TestPackedStrings(unittest.TestCase):
+    def test_indexing(self):
+        strings = PackedStrings.from_strings(["a", "", "čšž", "bcd"])
+        self.assertEqual(len(strings), 4)
+        self.assertEqual(strings[2], "čšž")
+        self.assertEqual(strings[-1], "bcd")
+        self.assertEqual(strings[1], "")
+        np.testing.assert_equal(strings[[3, 0]], ["bcd", "a"])
+        np.testing.assert_equal(strings[1:3], ["", "čšž"])
+        np.testing.assert_equal(
+            strings[np.array([True, False, False, True])], ["a", "bcd"])
+        self.assertEqual(list(strings), ["a", "", "čšž", "bcd"])
+        self.assertEqual(np.asarray(strings).dtype, object)
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_save_load(self):
+        data = read_feature_pajek(join(NETWORKS, "node_features_weights.net"))
+        data = data._replace(feature_names=[f"f{i}" for i in range(40)])
+        save_snapshot(self.directory, data)
+        loaded = load_snapshot(self.directory)
+
+        self.assertIsInstance(loaded.features, np.memmap)
+        self.assertFalse(loaded.features.flags.writeable)
+        self.assertFalse(loaded.adjacency.data.flags.writeable)
+        np.testing.assert_equal(loaded.features, data.features)
+        self.assertEqual(abs(loaded.adjacency - data.adjacency).max(), 0)
+        np.testing.assert_equal(loaded.node_names[:], data.node_names)
+        self.assertEqual(loaded.feature_names[39], "f39")
+        self.assertTrue(loaded.directed)
+
+        rec = Recommender.from_feature_network(loaded)
+        self.assertTrue(
+            np.shares_memory(rec.adjacency.data, loaded.adjacency.data))
+        expected = Recommender.from_feature_network(data)
+        np.testing.assert_equal(rec.recommend_all(3), expected.recommend_all(3))
+
+    def test_matrix(self):
+        matrix = sp.random(7, 5, density=0.3, format="csr", random_state=0)
+        save_matrix(self.directory, "m", matrix)
+        loaded = load_matrix(self.directory, "m")
+        self.assertEqual(loaded.shape, (7, 5))
+        self.assertFalse(loaded.data.flags.writeable)
+        np.testing.assert_equal(loaded.toarray(), matrix.toarray())
+
+    def test_packed_features(self):
+        filename = join(NETWORKS, "node_features_weights.net")
+        data = read_feature_pajek(filename, packed=True)
+        np.testing.assert_equal(data.features.toarray(),
+                                read_feature_pajek(filename).features)
+        save_snapshot(self.directory, data)
+        loaded = load_snapshot(self.directory)
+        self.assertIsInstance(loaded.features.bits, np.memmap)
+        np.testing.assert_equal(loaded.features.toarray(),
+                                data.features.toarray())
+
+    def test_sparse_features(self):
+        data = read_feature_pajek(join(NETWORKS, "node_features_weights.net"))
+        data = data._replace(features=sp.csr_matrix(data.features))
+        save_snapshot(self.directory, data)
+        loaded = load_snapshot(self.directory)
+        self.assertTrue(sp.issparse(loaded.features))
+        self.assertFalse(loaded.features.data.flags.writeable)
+        np.testing.assert_equal(loaded.features.toarray(),
+                                data.features.toarray())
+
+    def test_no_feature_names(self):
+        data = read_feature_pajek(join(NETWORKS, "kids_cartoons.net"))
+        save_snapshot(self.directory, data)
+        loaded = load_snapshot(self.directory, mmap_mode=None)
+        self.assertIsNone(loaded.feature_names)
+        self.assertFalse(loaded.directed)
+        self.assertEqual(loaded.features.shape, (23, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+
+from orangecontrib.example.topk import top_k, top_k_rows
+
+
+class TestTopK(unittest.TestCase):
+    def test_top_k_rows(self):
+        scores = np.array([[1, 3, 3, 0, 3, -np.inf],
+                           [0, 0, 0, 0, 0, 0],
+                           [-np.inf] * 5 + [2]])
+        indices, values = top_k_rows(scores, 2)
+        np.testing.assert_equal(indices, [[1, 2], [0, 1], [5, -1]])
+        np.testing.assert_equal(values, [[3, 3], [0, 0], [2, -np.inf]])
+
+        indices, _ = top_k_rows(scores, 4, tiebreak=[0, 0, 1, 0, 5, 0])
+        np.testing.assert_equal(
+            indices, [[4, 2, 1, 0], [4, 2, 0, 1], [5, -1, -1, -1]])
+
+        indices, values = top_k_rows(scores, 8)
+        self.assertEqual(indices.shape, (3, 8))
+        np.testing.assert_equal(indices[0], [1, 2, 4, 0, 3, -1, -1, -1])
+        np.testing.assert_equal(values[2, 1:], [-np.inf] * 7)
+
+    def test_matches_sorting(self):
+        rng = np.random.default_rng(0)
+        scores = rng.integers(0, 5, (50, 30)).astype(float)
+        tiebreak = rng.integers(0, 3, 30)
+        indices, values = top_k_rows(scores, 7, tiebreak)
+        for row, row_indices, row_values in zip(scores, indices, values):
+            expected = np.lexsort((np.arange(30), -tiebreak, -row))[:7]
+            np.testing.assert_equal(row_indices, expected)
+            np.testing.assert_equal(row_values, row[expected])
+
+    def test_sparse_matches_sorting(self):
+        # mostly zeros and excluded columns, with many ties to break
+        rng = np.random.default_rng(0)
+        scores = rng.integers(1, 3, (50, 300)) \
+            * (rng.random((50, 300)) < 0.02)
+        scores = np.where(rng.random((50, 300)) < 0.3, -np.inf, scores)
+        tiebreak = rng.integers(0, 3, 300)
+        indices, values = top_k_rows(scores, 10, tiebreak)
+        for row, row_indices, row_values in zip(scores, indices, values):
+            expected = np.lexsort((np.arange(300), -tiebreak, -row))[:10]
+            np.testing.assert_equal(row_indices, expected)
+            np.testing.assert_equal(row_values, row[expected])
+
+    def test_empty(self):
+        indices, values = top_k_rows(np.zeros((3, 0)), 2)
+        np.testing.assert_equal(indices, np.full((3, 2), -1))
+        indices, values = top_k_rows(np.zeros((0, 4)), 2)
+        self.assertEqual(indices.shape, (0, 2))
+        indices, values = top_k_rows(np.zeros((3, 4)), 0)
+        self.assertEqual(indices.shape, (3, 0))
+
+    def test_top_k(self):
+        indices, values = top_k([5, 1, 5, 2], 3, exclude=[0])
+        np.testing.assert_equal(indices, [2, 3, 1])
+        np.testing.assert_equal(values, [5, 2, 1])
+
+        indices, values = top_k([5, 1], 3, exclude=[1])
+        np.testing.assert_equal(indices, [0])
+
+
+if __name__ == "__main__":
+    unittest.main()
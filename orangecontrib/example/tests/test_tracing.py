@@ -0,0 +1,64 @@
+import json
+import unittest
+
+import numpy as np
+import scipy.sparse as sp
+
+from orangecontrib.example import tracing
+from orangecontrib.example.index import RecommendationIndex
+from orangecontrib.example.recommend import Recommender
+from orangecontrib.example.tracing import \
+    Registry, stage, count, INDEX_BUILD, NEIGHBOURS, SCORING, TOP_K
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.enabled = tracing.enabled()
+        tracing.registry.clear()
+
+    def tearDown(self):
+        tracing.registry.enabled = self.enabled
+        tracing.registry.clear()
+
+    def test_registry(self):
+        registry = Registry()
+        registry.add_time("a", 0.5)
+        registry.add_time("a", 1.5)
+        registry.add_count("n")
+        registry.add_count("n", 2)
+        self.assertEqual(
+            json.loads(registry.to_json()),
+            {"timings": {"a": {"calls": 2, "total": 2, "max": 1.5}},
+             "counters": {"n": 3}})
+        self.assertEqual(
+            registry.report_items(),
+            [("a", "2000.0 ms in 2 calls (max 1500.0 ms)"), ("n", "3")])
+        registry.clear()
+        self.assertEqual(registry.snapshot(), {"timings": {}, "counters": {}})
+
+    def test_disabled(self):
+        tracing.disable()
+        with stage(SCORING):
+            count("x")
+        self.assertEqual(tracing.registry.snapshot(),
+                         {"timings": {}, "counters": {}})
+
+    def test_recommender(self):
+        tracing.enable()
+        adjacency = sp.csr_matrix(np.array([[0, 1, 1], [1, 0, 0], [1, 0, 0]]))
+        features = np.array([[1, 0, 0], [0, 1, 0], [0, 1, 1]])
+        rec = Recommender(adjacency, features)
+        rec.recommend_with_recommenders(0, 2)
+        rec.friends(0)
+        rec.index = RecommendationIndex.build(rec, 2)
+        rec.recommend(1, 2)
+        snapshot = tracing.registry.snapshot()
+        self.assertEqual(
+            {name: t["calls"] for name, t in snapshot["timings"].items()},
+            {SCORING: 2, TOP_K: 2, NEIGHBOURS: 2, INDEX_BUILD: 1})
+        self.assertEqual(snapshot["counters"],
+                         {"recommendations": 5, "index lookups": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
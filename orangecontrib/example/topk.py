@@ -0,0 +1,103 @@
+import numpy as np
+
+__all__ = ("top_k", "top_k_rows")
+
+
+def _take_preferred(cols, n, tiebreak):
+    # the `n` most preferred of `cols` (in increasing order), by larger
+    # `tiebreak` and then smaller index; linear in the number of `cols`
+    if tiebreak is None or len(cols) <= n:
+        return cols[:n]
+    values = tiebreak[cols]
+    # `n` is small, while partitioning is slow for many equal values
+    threshold = values.max()
+    while np.count_nonzero(values >= threshold) < n:
+        threshold = values[values < threshold].max()
+    better = cols[values > threshold]
+    equal = cols[values == threshold][:n - len(better)]
+    return np.union1d(better, equal)
+
+
+def top_k_rows(scores, k, tiebreak=None):
+    """
+    Return indices and values of the `k` largest scores in each row.
+
+    Ties are broken deterministically: by larger `tiebreak` (e.g. feature
+    popularity), if given, and then by smaller column index. Scores of
+    `-inf` denote excluded columns; if a row has fewer than `k` other
+    columns, its result is padded with index -1 and score `-inf`.
+
+    The selection uses `np.partition`; only the columns tied with the k-th
+    score are compared by `tiebreak`, so it takes O(n_cols) per row, and
+    only the selected `k` elements are sorted.
+
+    Args:
+        scores: 2d array of scores
+        k: the number of columns to select
+        tiebreak: 1d array with a value for each column; larger is better
+
+    Returns:
+        (tuple of np.ndarray, np.ndarray): arrays of shape (n_rows, k)
+        with column indices and scores, sorted by decreasing scores
+    """
+    scores = np.asarray(scores, dtype=float)
+    n_rows, n_cols = scores.shape
+    indices = np.full((n_rows, k), -1)
+    values = np.full((n_rows, k), -np.inf)
+    k_sel = min(k, n_cols)
+    if not (k_sel and n_rows):
+        return indices, values
+
+    if tiebreak is not None:
+        tiebreak = np.asarray(tiebreak)
+    # the k-th score is searched for only among scores above the lowest
+    # finite score of the row, because partitioning is slow for many equal
+    # values, like zeros and excluded columns of sparse scores
+    finite = scores > -np.inf
+    low = np.min(scores, axis=1, where=finite, initial=np.inf, keepdims=True)
+    above = scores > low
+    kth = np.where(finite.sum(axis=1, keepdims=True) >= k_sel, low, -np.inf)
+    n_above = above.sum(axis=1)
+    for row in np.flatnonzero(n_above >= k_sel):
+        candidates = scores[row, above[row]] \
+            if n_above[row] < n_cols // 2 else scores[row]
+        kth[row] = np.partition(candidates, len(candidates) - k_sel)[
+            len(candidates) - k_sel]
+    selected = scores > kth
+    missing = k_sel - selected.sum(axis=1)
+    # from columns tied with the k-th score, take the most preferred ones
+    ties = scores == kth
+    n_ties = ties.sum(axis=1)
+    selected[n_ties == missing] |= ties[n_ties == missing]
+    for row in np.flatnonzero(n_ties > missing):
+        cols = np.flatnonzero(ties[row])
+        selected[row, _take_preferred(cols, missing[row], tiebreak)] = True
+
+    rows, cols = np.nonzero(selected)
+    sel_values = scores[rows, cols]
+    if tiebreak is None:
+        sort = np.lexsort((cols, -sel_values, rows))
+    else:
+        sort = np.lexsort((cols, -tiebreak[cols], -sel_values, rows))
+    cols, sel_values = cols[sort].reshape(n_rows, k_sel), \
+        sel_values[sort].reshape(n_rows, k_sel)
+    cols[sel_values == -np.inf] = -1
+    indices[:, :k_sel] = cols
+    values[:, :k_sel] = sel_values
+    return indices, values
+
+
+def top_k(scores, k, exclude=None, tiebreak=None):
+    """
+    Return indices and values of the `k` largest scores, sorted by
+    decreasing scores, excluding indices in `exclude`.
+
+    Ties are broken as in `top_k_rows`. If there are fewer than `k`
+    non-excluded scores, the result is shorter.
+    """
+    scores = np.array(scores, dtype=float)
+    if exclude is not None:
+        scores[exclude] = -np.inf
+    indices, values = top_k_rows(scores[None, :], k, tiebreak)
+    valid = indices[0] != -1
+    return indices[0][valid], values[0][valid]
@@ -0,0 +1,131 @@
+"""
+Timings of stages of recommendation and event counters.
+
+Tracing is off by default; `stage` then returns a shared no-op context
+manager and `count` returns immediately, so instrumented code pays only
+for a function call and an attribute lookup. Enable it with `enable()` or
+by setting the environment variable `ORANGE_RECOMMEND_TRACE`.
+
+Example:
+
+    with stage("scoring"):
+        scores = compute_scores()
+    count("recommendations")
+    ...
+    print(registry.to_json())
+"""
+import json
+import os
+from contextlib import nullcontext
+from threading import Lock
+from time import perf_counter
+
+__all__ = ("Registry", "registry", "enable", "disable", "enabled",
+           "stage", "count")
+
+# Stage names
+INDEX_BUILD = "index build"
+NEIGHBOURS = "neighbour lookup"
+SCORING = "scoring"
+TOP_K = "top-k"
+RENDERING = "rendering"
+
+
+class Registry:
+    """
+    Aggregated timings of stages (the number of calls, total and maximal
+    time in seconds) and counters. The registry can be shared between
+    threads.
+    """
+    def __init__(self):
+        self.enabled = False
+        self._timings = {}
+        self._counters = {}
+        self._lock = Lock()
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            calls, total, longest = self._timings.get(name, (0, 0., 0.))
+            self._timings[name] = \
+                (calls + 1, total + seconds, max(longest, seconds))
+
+    def add_count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def clear(self):
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        """
+        Return a dictionary with `timings` (a dictionary of stages, each
+        with `calls`, `total` and `max`) and `counters`.
+        """
+        with self._lock:
+            return {
+                "timings": {
+                    name: {"calls": calls, "total": total, "max": longest}
+                    for name, (calls, total, longest)
+                    in self._timings.items()},
+                "counters": dict(self._counters)}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def report_items(self):
+        """Return a list of (name, text) pairs for widget reports."""
+        snapshot = self.snapshot()
+        items = [
+            (name, f"{t['total'] * 1000:.1f} ms in {t['calls']} calls "
+                   f"(max {t['max'] * 1000:.1f} ms)")
+            for name, t in snapshot["timings"].items()]
+        items += [(name, str(n)) for name, n in snapshot["counters"].items()]
+        return items
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.registry.add_time(self.name, perf_counter() - self.start)
+
+
+_NO_OP = nullcontext()
+
+registry = Registry()
+registry.enabled = bool(os.environ.get("ORANGE_RECOMMEND_TRACE"))
+
+
+def enable():
+    registry.enabled = True
+
+
+def disable():
+    registry.enabled = False
+
+
+def enabled():
+    return registry.enabled
+
+
+def stage(name):
+    """Return a context manager that times the stage if tracing is on."""
+    if registry.enabled:
+        return _Timer(registry, name)
+    return _NO_OP
+
+
+def count(name, n=1):
+    """Increase the counter if tracing is on."""
+    if registry.enabled:
+        registry.add_count(name, n)
@@ -1,5 +1,7 @@
 import sysconfig
 from orangecontrib.network import Network
+# Register network summaries first, so that `summarize_` below replaces them
+import orangecontrib.network.widgets
 from orangewidget.utils.signals import summarize, PartialSummary
 
 # Category metadata.
@@ -45,8 +47,8 @@ def summarize_(net: Network):
         direct = "–"
         details = f"<nobr>Network with {n} nodes"
         if net.edges:
-            details += " and {len(net.edges)} edge types:</nobr><ul>" + "".join(
-                f"<li>{len(edges)} edges, "
+            details += f" and {len(net.edges)} edge types:</nobr><ul>" + "".join(
+                f"<li>{edges.edges.nnz} edges, "
                 f"{['undirected', 'directed'][edges.directed]}</li>"
                 for edges in net.edges) + "."
 
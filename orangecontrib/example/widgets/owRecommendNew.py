@@ -1,31 +1,345 @@
 from collections import Counter
+from html import escape
+from itertools import islice
+from types import SimpleNamespace
 
 import numpy as np
+import scipy.sparse as sp
 
 
 
-from AnyQt.QtCore import Qt, QSize
-from AnyQt.QtWidgets import QGridLayout, QLabel
+from AnyQt.QtCore import Qt, QSize, QAbstractListModel, QModelIndex, QTimer
+from AnyQt.QtWidgets import QGridLayout, QLabel, QComboBox, QFileDialog
 from AnyQt.QtGui import QFontMetrics
 
+from orangewidget.gui import ControlledCallFront, ValueCallback
 from orangewidget.settings import Setting
-from orangewidget.utils.itemmodels import PyListModel
 
 import Orange
-from Orange.data import Table
-from Orange.widgets.widget import OWWidget, Input, Output
+from Orange.data import \
+    Table, Domain, DiscreteVariable, ContinuousVariable, StringVariable
+from Orange.widgets.widget import OWWidget, Input, Output, Msg
 from Orange.widgets import gui, settings
 from Orange.widgets.utils.itemmodels import DomainModel
+from Orange.widgets.utils.concurrent import \
+    TaskState, ConcurrentWidgetMixin, ThreadExecutor, FutureWatcher
 
 from orangecontrib.network import Network
 import orangecontrib.network.widgets
 
+from orangecontrib.example.index import RecommendationIndex
+from orangecontrib.example.recommend import \
+    Recommender, COUNT, WEIGHTED, TWO_HOP, PAGERANK, SIMILAR
+from orangecontrib.example import tracing
+from orangecontrib.example.tracing import stage, RENDERING
 
 
+#: the number of recommendations per node
+K = 5
 
+#: the number of friends or recommenders shown at once
+PAGE_SIZE = 20
 
+#: delay (in ms) after the last keystroke before node names are filtered
+FILTER_DELAY = 250
 
-class Recommendation(OWWidget):
+
+class CallFrontNodeCombo(ControlledCallFront):
+    # Sets the combo's index from the widget's `selected_row`, so that
+    # names need not be looked up
+    def __init__(self, control, widget):
+        super().__init__(control)
+        self.widget = widget
+
+    def action(self, value):
+        row = self.widget.selected_row
+        self.control.setCurrentIndex(
+            -1 if value is None or row is None
+            else self.widget.nodes_model.position(row))
+
+
+class ValueCallbackNodeCombo(ValueCallback):
+    # Sets the widget's `selected_row` and `selected_node` from the combo
+    def __call__(self, index):
+        if self.disabled:
+            return
+        model = self.widget.nodes_model
+        self.widget.selected_row = model.row_at(index)
+        return self.acyclic_setattr(model[index])
+
+
+class Results(SimpleNamespace):
+    recommender: Recommender = None
+    friends = None
+    recommended = None
+    recommenders = None
+    table: Table = None
+    # The key of recommendations for all nodes and the table with them
+    all_table = None
+
+
+class NodeListModel(QAbstractListModel):
+    """
+    A list model of node names for networks with millions of nodes.
+
+    Names are not copied; the model shows names from the given array,
+    optionally only those that contain the `filter` text. Rows are fetched
+    in batches of `batch_size`, so views do not iterate over all of them.
+    Views should refer to nodes by rows (`row_at`, `position`) rather than
+    by names, which are looked up by a scan.
+    """
+    def __init__(self, names=None, batch_size=1000, max_matches=10000):
+        super().__init__()
+        self.batch_size = batch_size
+        self.max_matches = max_matches
+        self._names = ()
+        self._rows = None  # visible rows, or None for all
+        self._n_fetched = 0
+        self._filter = ""
+        self._complete = True  # whether `_rows` contain all matches
+        if names is not None:
+            self.set_names(names)
+
+    def set_names(self, names):
+        self.beginResetModel()
+        self._names = () if names is None else names
+        self._set_rows(None, "", True)
+        self.endResetModel()
+
+    def _set_rows(self, rows, text, complete):
+        self._rows = rows
+        self._filter = text
+        self._complete = complete
+        self._n_fetched = min(len(self), self.batch_size)
+
+    @property
+    def filter(self):
+        return self._filter
+
+    def set_filter(self, text):
+        """
+        Show only names that contain the `text`, ignoring case; at most
+        `max_matches` names are shown. If the text extends the previous
+        one, only the names that are currently shown are searched.
+        """
+        if text.casefold() != self._filter:
+            self.set_matches(text, *self.find(text))
+
+    def find(self, text):
+        """
+        Return rows of names to show for the filter `text` (or `None` for
+        all) and whether they are all matches, as `set_filter`, without
+        changing the model. The search can run in another thread; its
+        result is then shown by `set_matches`.
+        """
+        text = text.casefold()
+        if not text:
+            return None, True
+        names, rows, filter_ = self._names, self._rows, self._filter
+        if rows is not None and self._complete and filter_ in text:
+            candidates = rows
+        else:
+            candidates = range(len(names))
+        matches = (row for row in candidates
+                   if text in str(names[row]).casefold())
+        rows = np.fromiter(islice(matches, self.max_matches + 1), dtype=int)
+        return rows[:self.max_matches], len(rows) <= self.max_matches
+
+    def set_matches(self, text, rows, complete):
+        """Show the `rows` found by `find` for the filter `text`."""
+        self.beginResetModel()
+        self._set_rows(rows, text.casefold(), complete)
+        self.endResetModel()
+
+    def __len__(self):
+        return len(self._names) if self._rows is None else len(self._rows)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, i):
+        return self._names[i if self._rows is None else self._rows[i]]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __contains__(self, name):
+        return self.indexOf(name) != -1
+
+    def row_of(self, name):
+        """
+        Return the (first) row of the node with the given name, or -1;
+        this compares all names.
+        """
+        value = np.empty((), dtype=object)
+        value[()] = name
+        rows = np.flatnonzero(np.asarray(self._names, dtype=object) == value)
+        return int(rows[0]) if len(rows) else -1
+
+    def row_at(self, i):
+        """Return the row of the node at position `i` of the shown list."""
+        return i if self._rows is None else int(self._rows[i])
+
+    def indexOf(self, name):
+        """
+        Return the position of the name in the shown (filtered) list, or -1,
+        and fetch rows up to this position.
+        """
+        return self.position(self.row_of(name))
+
+    def position(self, row):
+        """
+        Return the position of the node's `row` in the shown list, or -1,
+        and fetch rows up to this position.
+        """
+        if row == -1 or self._rows is None:
+            i = row
+        else:
+            i = np.searchsorted(self._rows, row)
+            i = int(i) if i < len(self._rows) and self._rows[i] == row else -1
+        if i >= self._n_fetched:
+            self._fetch(i + 1)
+        return i
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._n_fetched
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self._n_fetched < len(self)
+
+    def fetchMore(self, parent):
+        if not parent.isValid():
+            self._fetch(self._n_fetched + self.batch_size)
+
+    def _fetch(self, n):
+        n = min(n, len(self))
+        if n > self._n_fetched:
+            self.beginInsertRows(QModelIndex(), self._n_fetched, n - 1)
+            self._n_fetched = n
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role in (Qt.DisplayRole, Qt.EditRole) and index.isValid():
+            return str(self[index.row()])
+        return None
+
+
+def recommendations_table(nodes, features, scores, counts, feature_names,
+                          node_names, node_label="Node"):
+    """
+    Return a table with a row for each recommendation.
+
+    `features`, `scores` and `counts` (the number of recommenders) are
+    arrays of shape (len(nodes), k), where feature -1 denotes padding;
+    `node_names` are names of all nodes. Columns are built from these arrays
+    without constructing rows.
+    """
+    rows, ranks = np.nonzero(features != -1)
+    domain = Domain(
+        [DiscreteVariable("Feature", values=list(feature_names)),
+         ContinuousVariable("Score"),
+         ContinuousVariable("Recommenders", number_of_decimals=0)],
+        metas=[StringVariable(node_label)])
+    x = np.column_stack((features[rows, ranks], scores[rows, ranks],
+                         counts[rows, ranks])).astype(float)
+    metas = np.asarray(node_names, dtype=object)[nodes[rows]][:, None]
+    return Table.from_numpy(domain, x, metas=metas)
+
+
+def all_recommendations(recommender: Recommender, mode, callback):
+    """
+    Return features, scores and the number of recommenders for all nodes;
+    `callback` is called with the proportion of processed nodes.
+    """
+    if recommender.use_index(K, mode):
+        index = recommender.index
+        counts = np.diff(index.offsets).reshape(index.n_nodes, index.k)
+        return index.features[:, :K], index.scores[:, :K], counts[:, :K]
+    n = recommender.n_nodes
+    features = np.empty((n, K), dtype=int)
+    scores = np.empty((n, K))
+    counts = np.empty((n, K), dtype=int)
+    for start, chunk_features, chunk_scores \
+            in recommender.iter_recommend_all(K, mode):
+        nodes = np.arange(start, start + len(chunk_features))
+        offsets, _ = recommender.batch_recommenders(
+            nodes, chunk_features, mode)
+        features[nodes], scores[nodes] = chunk_features, chunk_scores
+        counts[nodes] = np.diff(offsets).reshape(len(nodes), K)
+        callback((nodes[-1] + 1) / n)
+    return features, scores, counts
+
+
+def run(recommender: Recommender, network: Network, node, mode, decay,
+        layer_weights, index, precompute, output_all, all_table, node_names,
+        node_label, state: TaskState) -> Results:
+    def interrupt():
+        if state.is_interruption_requested():
+            raise Exception
+
+    res = Results(recommender=recommender)
+    if recommender is None:
+        state.set_status("Indexing network...")
+        res.recommender = recommender = \
+            Recommender.from_network(network, layer_weights=layer_weights)
+    elif recommender.layers is not None:
+        state.set_status("Combining edge types...")
+        recommender.set_layer_weights(layer_weights)
+    recommender.decay = decay
+    if index is not None:
+        recommender.set_index(index)
+    if precompute and not recommender.use_index(K, mode):
+        state.set_status("Precomputing recommendations...")
+
+        def callback(progress):
+            interrupt()
+            state.set_progress_value(90 * progress)
+
+        recommender.index = RecommendationIndex.build(
+            recommender, k=K, mode=mode, callback=callback)
+
+    if node_names is None:
+        node_names = np.arange(recommender.n_nodes).astype(str)
+    feature_names = [attr.name for attr in network.nodes.domain.attributes]
+    if output_all:
+        # The table from the previous run is reused if recommendations
+        # for all nodes did not change (e.g. when only the node changed)
+        key = (recommender.version, mode, recommender.mode_params(mode),
+               layer_weights)
+        if all_table is None or all_table[0] != key:
+            state.set_status("Recommending for all nodes...")
+
+            def callback(progress):
+                interrupt()
+                state.set_progress_value(90 * progress)
+
+            all_table = key, recommendations_table(
+                np.arange(recommender.n_nodes),
+                *all_recommendations(recommender, mode, callback),
+                feature_names, node_names, node_label)
+        res.all_table = all_table
+        res.table = all_table[1]
+    if node is None:
+        return res
+    interrupt()
+
+    state.set_status("Recommending...")
+    res.friends, _ = recommender.friends(node)
+    interrupt()
+
+    res.recommended, scores, res.recommenders = \
+        recommender.recommend_with_recommenders(node, K, mode)
+    res.recommenders = [recommender.sort_by_contribution(node, nodes, mode)
+                        for nodes in res.recommenders]
+    if not output_all:
+        counts = np.array([len(nodes) for nodes in res.recommenders])
+        res.table = recommendations_table(
+            np.array([node]), res.recommended[None], scores[None],
+            counts[None], feature_names, node_names, node_label)
+    return res
+
+
+class Recommendation(OWWidget, ConcurrentWidgetMixin):
     name = "orange3-pumice"
     description = "Recommend feature based on selected node"
     icon = "icons/recommendation.png"
@@ -34,51 +348,141 @@ class Recommendation(OWWidget):
     class Inputs:
         network = Input("Network", Network, default=True)
 
+    class Outputs:
+        recommendations = Output("Recommendations", Table, default=True)
+
+    class Error(OWWidget.Error):
+        computation_failed = Msg("Recommendation failed: {}")
+        index_load_failed = Msg("Index could not be loaded: {}")
+
     settingsHandler = settings.DomainContextHandler()
     selected_node_hint = settings.ContextSetting(None)
     node_name = settings.ContextSetting(None)
+    scoring = Setting(0)
+    decay = Setting(0.5)
+    precompute = Setting(False)
+    index_directory = Setting("")
+    output_all = Setting(False)
     want_control_area = False
 
+    scoring_modes = [("Friends", COUNT),
+                     ("Friends, weighted", WEIGHTED),
+                     ("Friends and friends of friends", TWO_HOP),
+                     ("Random walk (personalized PageRank)", PAGERANK),
+                     ("Similar tastes", SIMILAR)]
+
     resizing_enabled = False
 
     def __init__(self):
-        super().__init__()
+        OWWidget.__init__(self)
+        ConcurrentWidgetMixin.__init__(self)
         self.node_name_id = None
         self.network: Network = None
-
+        self.recommender: Recommender = None
+        # Index loaded from disk, which is attached to the recommender by
+        # the next run
+        self.loaded_index: RecommendationIndex = None
+        self.node_names = None
+        # Output for all nodes from the last run; see `Results.all_table`
+        self.all_table = None
+
+        # The name of the selected node and its row; the row is kept, so
+        # that it is not looked up by the name
         self.selected_node = None
+        self.selected_row = None
 
         self.node_name_model = DomainModel(valid_types=Orange.data.StringVariable)
         gui.comboBox(
             self.mainArea, self, "node_name", label="Name column: ", box=True,
-            model=self.node_name_model, callback=self.set_value_list,
+            model=self.node_name_model, callback=self.on_node_name_changed,
             orientation=Qt.Horizontal)
 
         grid = QGridLayout()
         gui.widgetBox(self.mainArea, "Node", orientation=grid)
-        self.nodes_model = PyListModel()
-        combo = gui.comboBox(
-            None, self, "selected_node",
-            model=self.nodes_model, callback=self.on_node_changed)
+        self.node_filter = ""
+        # Filtering millions of names is too slow to repeat on each keystroke
+        # or to run in the GUI thread
+        self._filter_timer = QTimer(
+            self, singleShot=True, interval=FILTER_DELAY)
+        self._filter_timer.timeout.connect(self.on_node_filter_changed)
+        self._filter_executor = ThreadExecutor(self)
+        self._filter_future = None
+        search = gui.lineEdit(
+            None, self, "node_filter", placeholderText="Search...",
+            callback=self._filter_timer.start, callbackOnType=True)
+        # gui.comboBox binds only to PyListModel, which would copy all names
+        self.nodes_model = NodeListModel()
+        combo = QComboBox(
+            minimumContentsLength=20,
+            sizeAdjustPolicy=QComboBox.AdjustToMinimumContentsLengthWithIcon)
+        combo.setModel(self.nodes_model)
+        combo.view().setUniformItemSizes(True)
+        gui.connectControl(
+            self, "selected_node", self.on_node_changed, combo.activated[int],
+            CallFrontNodeCombo(combo, self),
+            ValueCallbackNodeCombo(self, "selected_node"))
 
         align_top = Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft
-        grid.addWidget(combo, 0, 0, 1, 2)
+        grid.addWidget(search, 0, 0)
+        grid.addWidget(combo, 0, 1)
         grid.addWidget(QLabel(self, text="<b>Features: </b"), 1, 0, alignment=align_top)
         self.features_list_label = QLabel(self, wordWrap=True)
         grid.addWidget(self.features_list_label, 1, 1)
         grid.addWidget(QLabel(self, text="<b>Friends: </b"), 2, 0, alignment=align_top)
-        self.friends_list_label = QLabel(self, wordWrap=True)
+        self.friends_list_label = QLabel(
+            self, wordWrap=True, textFormat=Qt.RichText)
+        self.friends_list_label.linkActivated.connect(self.on_show_more)
         grid.addWidget(self.friends_list_label, 2, 1)
+        self.friends = None
+        self.result: Results = None
+        # The number of shown friends, and recommenders for each feature
+        self.n_shown = {}
+
+        box = gui.hBox(self.mainArea, "Scoring")
+        gui.comboBox(
+            box, self, "scoring",
+            items=[name for name, _ in self.scoring_modes],
+            callback=self.on_scoring_changed)
+        gui.doubleSpin(
+            box, self, "decay", 0.05, 1, 0.05, label="Decay: ",
+            callback=self.on_scoring_changed)
+        self._update_decay_enabled()
+        self.layer_weights = []
+        self.layers_box = gui.vBox(self.mainArea, "Edge types")
+        self.layers_box.setHidden(True)
+        box = gui.vBox(self.mainArea, True)
+        gui.checkBox(
+            box, self, "precompute",
+            "Precompute recommendations for all nodes",
+            callback=self.update)
+        gui.button(box, self, "Load Index...", callback=self.browse_index,
+                   autoDefault=False)
+        gui.checkBox(
+            box, self, "output_all", "Output recommendations for all nodes",
+            callback=self.update)
 
         fm = QFontMetrics(self.font())
         box3 = gui.hBox(self.mainArea, "Recommendations")
         self.rec = gui.widgetLabel(box3, minimumSize=QSize(40 * fm.averageCharWidth(), 5 * fm.height()), wordWrap=True)
+        self.rec.setTextFormat(Qt.RichText)
+        self.rec.linkActivated.connect(self.on_show_more)
 
     @Inputs.network
     def set_network(self, network):
         self.closeContext()
+        self.cancel()
 
         self.network = network
+        self.recommender = None
+        self.loaded_index = None
+        self.set_layers()
+        if network is None:
+            self.node_name_model.set_domain(None)
+            self.node_name = None
+            self.set_value_list()
+            self.update()
+            return
+
         self.node_name_model.set_domain(network.nodes.domain)
 
         if self.node_name_model:
@@ -90,9 +494,6 @@ class Recommendation(OWWidget):
 
         #nastavi node name ime ali priimek in hint
         self.openContext(self.network.nodes)
-        if self.selected_node_hint \
-                and self.selected_node_hint in self.nodes_model:
-            self.selected_node = self.selected_node_hint
         self.set_value_list()
 
         #self.selected_node = (selected_node or
@@ -100,36 +501,189 @@ class Recommendation(OWWidget):
 
         self.update()
 
+    def set_layers(self):
+        # Spin boxes with weights of edge types, shown for multiplex networks
+        layout = self.layers_box.layout()
+        while layout.count():
+            layout.takeAt(0).widget().deleteLater()
+        edges = [] if self.network is None else self.network.edges
+        self.layer_weights = [1.] * len(edges)
+        for i, layer in enumerate(edges):
+            spin = gui.doubleSpin(
+                self.layers_box, None, None, 0, 10, 0.1,
+                label=f"{layer.name or f'Edge type {i + 1}'}: ",
+                orientation=Qt.Horizontal)
+            spin.setValue(1)
+            spin.valueChanged.connect(
+                lambda value, i=i: self.on_layer_weight_changed(i, value))
+        self.layers_box.setHidden(len(edges) < 2)
+
+    def browse_index(self):
+        directory = QFileDialog.getExistingDirectory(
+            self, "Load Index", self.index_directory)
+        if directory:
+            self.load_index(directory)
+
+    def load_index(self, directory):
+        """
+        Load the index saved by `RecommendationIndex.save` (e.g. by
+        `orange-recommend --index`), memory mapped, and use it for
+        recommendations in its mode.
+        """
+        self.Error.index_load_failed.clear()
+        try:
+            index = RecommendationIndex.load(directory)
+        except (OSError, ValueError, KeyError) as ex:
+            self.Error.index_load_failed(ex)
+            return
+        self.index_directory = directory
+        self.loaded_index = index
+        self.update()
+
+    def on_layer_weight_changed(self, layer, weight):
+        self.layer_weights[layer] = weight
+        self.update()
+
     def set_value_list(self):
+        self._filter_timer.stop()
+        self._filter_future = None
+        self.node_filter = ""
+        self.all_table = None
         if self.node_name is None:
-            self.nodes_model.clear()
+            self.node_names = None
+            self.nodes_model.set_names(None)
+            self.select_row(None)
         else:
-            self.nodes_model[:] = self.network.nodes.get_column(self.node_name)
-            self.selected_node = self.nodes_model[0]
+            self.node_names = self.network.nodes.get_column(self.node_name)
+            self.nodes_model.set_names(self.node_names)
+            row = -1 if self.selected_node_hint is None \
+                else self.nodes_model.row_of(self.selected_node_hint)
+            if row == -1:
+                row = 0 if self.nodes_model else None
+            self.select_row(row)
+
+    def select_row(self, row):
+        """Select the node in the given row of names, or none."""
+        self.selected_row = row
+        self.selected_node = None if row is None else self.node_names[row]
+
+    def on_node_name_changed(self):
+        self.set_value_list()
+        self.update()
+
+    def on_node_filter_changed(self):
+        # Names are searched in a thread; only the last search is shown
+        text = self.node_filter
+        self._filter_future = future = \
+            self._filter_executor.submit(self.nodes_model.find, text)
+        watcher = FutureWatcher(future, self)
+        watcher.done.connect(lambda f: self._on_filter_done(f, text))
+        watcher.done.connect(watcher.deleteLater)
+
+    def _on_filter_done(self, future, text):
+        if future is not self._filter_future:
+            return
+        self._filter_future = None
+        self.nodes_model.set_matches(text, *future.result())
+        if self.selected_row is not None \
+                and self.nodes_model.position(self.selected_row) != -1:
+            # Restore the combo's index after the model was reset
+            self.selected_node = self.selected_node
+        elif self.nodes_model:
+            self.select_row(self.nodes_model.row_at(0))
+            self.on_node_changed()
 
     @property
     def selected_node_index(self):
-        return self.nodes_model.indexOf(self.selected_node)
+        return self.selected_row
+
+    @property
+    def scoring_mode(self):
+        return self.scoring_modes[self.scoring][1]
+
+    def _update_decay_enabled(self):
+        self.controls.decay.setEnabled(self.scoring_mode == TWO_HOP)
+
+    def on_scoring_changed(self):
+        self._update_decay_enabled()
+        self.update()
 
     def on_node_changed(self):
         self.selected_node_hint = self.selected_node
         self.update()
 
     def update(self):
-        self.set_friends()
+        self.Error.computation_failed.clear()
         self.set_features()
-        self.set_recommendations()
-
-    def set_friends(self):
+        if self.network is None:
+            self.cancel()
+            self.set_friends(None)
+            self.set_recommendations(None)
+            self.Outputs.recommendations.send(None)
+            return
 
         if self.node_name is None or self.selected_node is None:
+            node = None
+        else:
+            node = self.selected_node_index
+        node_label = "Node" if self.node_name is None else self.node_name.name
+        self.start(run, self.recommender, self.network, node,
+                   self.scoring_mode, self.decay, tuple(self.layer_weights),
+                   self.loaded_index, self.precompute, self.output_all, self.all_table,
+                   self.node_names, node_label)
+
+    def on_done(self, result: Results):
+        self.recommender = result.recommender
+        self.loaded_index = None
+        if result.all_table is not None:
+            self.all_table = result.all_table
+        self.set_friends(result.friends)
+        self.set_recommendations(result)
+        self.Outputs.recommendations.send(result.table)
+
+    def on_exception(self, ex: Exception):
+        self.loaded_index = None
+        self.Error.computation_failed(ex)
+        self.set_friends(None)
+        self.set_recommendations(None)
+        self.Outputs.recommendations.send(None)
+
+    def on_partial_result(self, _):
+        pass
+
+    def onDeleteWidget(self):
+        self.shutdown()
+        self._filter_future = None
+        self._filter_executor.shutdown(wait=True)
+        super().onDeleteWidget()
+
+    def _names_page(self, nodes, key):
+        # Returns escaped names of the first shown nodes and a link for more
+        shown = self.n_shown.setdefault(key, PAGE_SIZE)
+        text = ", ".join(escape(str(name))
+                         for name in self.node_names[nodes[:shown]])
+        if len(nodes) > shown:
+            text += f' <a href="{key}">and {len(nodes) - shown} more</a>'
+        return text
+
+    def on_show_more(self, key):
+        self.n_shown[key] += PAGE_SIZE
+        if key == "friends":
+            self.set_friends(self.friends)
+        else:
+            self.set_recommendations(self.result)
+
+    def set_friends(self, friends):
+        if friends is not self.friends:
+            self.n_shown.pop("friends", None)
+        self.friends = friends
+        if friends is None or not len(friends):
             self.friends_list_label.setText("No friends")
             return
 
-        sorted_data = self.sort_node_weights()
-        neighbours_names = [self.nodes_model[row[1]] for row in sorted_data]
-
-        self.friends_list_label.setText(", ".join(neighbours_names))
+        with stage(RENDERING):
+            self.friends_list_label.setText(
+                self._names_page(friends, "friends"))
 
     def set_features(self):
         if self.node_name is None or self.selected_node is None:
@@ -137,7 +691,10 @@ class Recommendation(OWWidget):
         else:
             node_choices = self.network.nodes.X[self.selected_node_index]
             attributes = self.network.nodes.domain.attributes
-            chosen = np.flatnonzero(node_choices)
+            if sp.issparse(node_choices):
+                chosen = node_choices.indices[node_choices.data != 0]
+            else:
+                chosen = np.flatnonzero(node_choices)
             features_names = [attributes[i].name for i in chosen]
 
         self.features_list_label.setText(", ".join(features_names) or "No features")
@@ -171,53 +728,43 @@ class Recommendation(OWWidget):
 
         self.rec.setText(output)
 
-    def set_recommendations(self):
-        # get neighbour indicises from matrix
-        if self.node_name is None or self.selected_node is None:
+    def set_recommendations(self, result: Results):
+        if result is not self.result:
+            for key in [key for key in self.n_shown if key != "friends"]:
+                del self.n_shown[key]
+        self.result = result
+        if result is None or result.recommended is None:
             self.rec.setText("No recommendations")
             return
 
-        # TODO: list(set()) je tu zato, ker se sosedje ponavljajo
-        neighbours_indices = list(set(self.network.neighbours(self.selected_node_index)))
-        print("neighbours_indices", neighbours_indices)
-        neighbours_choices = self.network.nodes.X[neighbours_indices]
-        print("neighbours_choices", neighbours_choices)
-
-        counts = np.sum(neighbours_choices, axis=0)
-        sorted_features = np.argsort(counts)[::-1]
-        most_freq = sorted_features[:5]
-        print("most_freq", most_freq)
-        recommended_names = [self.network.nodes.domain.attributes[i].name for i in most_freq]
-        print("self.netowrk.nodes.get_column(self.node_name)", self.network.nodes.get_column(self.node_name))
-        recommenders_for_feature = [self.network.nodes.get_column(self.node_name)[neighbours_indices][neighbours_choices[:, i] == 1] for i in most_freq]
-
-        print("recommended_names", recommended_names)
-        print("recommenders_for_feature", recommenders_for_feature)
-
-        output = "<dl>"
-        for feature, recommenders in zip(recommended_names, recommenders_for_feature):
-            output += f"<dt>{feature}</dt>"
-            output += f"<dd> {', '.join(recommenders)}</dd>"
-        output += "</dl>"
-        self.rec.setText(output)
-
-
-
-    def sort_node_weights(self):
-        if self.node_name is None or self.selected_node is None:
-            return "No node selected"
-
-        self.weights = self.network.edges[0].edges.tocoo()
-        print(self.weights)
-        #print(self.weights.row, self.weights.col, self.weights.data)
-        rows_for_node = [(i, j, value) for i, j, value in zip(self.weights.row, self.weights.col, self.weights.data) if
-
-        # to je isto kot m = self.weights.row == self.selected_node_index
-        # kako iz mreže uteži dobit, a se da soritrat z argmax?
-                         i == self.selected_node_index]
-        sorted_data = sorted(rows_for_node, key=lambda x: x[2], reverse=True)
+        with stage(RENDERING):
+            attributes = self.network.nodes.domain.attributes
 
-        return sorted_data
+            output = "<dl>"
+            for i, (feature, recommenders) in enumerate(
+                    zip(result.recommended, result.recommenders)):
+                output += f"<dt>{escape(attributes[feature].name)}</dt>"
+                output += \
+                    f"<dd> {self._names_page(recommenders, f'feature-{i}')}</dd>"
+            output += "</dl>"
+            self.rec.setText(output)
+
+    def send_report(self):
+        if self.network is None:
+            return
+        self.report_items((
+            ("Node", self.selected_node),
+            ("Scoring", self.scoring_modes[self.scoring][0]),
+            ("Decay", self.decay if self.scoring_mode == TWO_HOP else None),
+            ("Edge type weights",
+             ", ".join(f"{layer.name or i + 1}: {weight:g}"
+                       for i, (layer, weight)
+                       in enumerate(zip(self.network.edges,
+                                        self.layer_weights)))
+             if len(self.layer_weights) > 1 else None)
+        ))
+        if tracing.enabled():
+            self.report_items("Timings", tracing.registry.report_items())
 
 
 def main():
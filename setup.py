@@ -63,7 +63,14 @@ ENTRY_POINTS = {
 
     # Register widget help
     "orange.canvas.help": (
-        'html-index = orangecontrib.example.widgets:WIDGET_HELP_PATH',)
+        'html-index = orangecontrib.example.widgets:WIDGET_HELP_PATH',),
+
+    # Command-line tools
+    'console_scripts': (
+        'orange-recommend = orangecontrib.example.cli:main',
+        'orange-recommend-service = orangecontrib.example.service:main',
+        'orange-recommend-evaluate = orangecontrib.example.evaluate:main',
+    ),
 }
 
 NAMESPACE_PACKAGES = ["orangecontrib"]